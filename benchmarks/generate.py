@@ -0,0 +1,75 @@
+import logging
+import os
+import random
+from typing import Iterator, NamedTuple
+
+
+log = logging.getLogger(__name__)
+
+
+class RepositorySpec(NamedTuple):
+    files: int = 1000
+    file_size: int = 1024
+    depth: int = 3
+    fanout: int = 10
+    churn: float = 0.01
+    history: int = 5
+    seed: int = 0
+
+
+PRESETS = {
+    'small': RepositorySpec(files=1000),
+    'medium': RepositorySpec(files=10_000, depth=4),
+    'large': RepositorySpec(files=100_000, depth=5),
+    'huge': RepositorySpec(files=1_000_000, file_size=256, depth=6, churn=0.001),
+}
+
+
+def get_directory_names(spec: RepositorySpec) -> list[str]:
+    directories = ['']
+    for level in range(spec.depth):
+        directories = [
+            os.path.join(directory, f"dir_{level}_{child}")
+            for directory in directories
+            for child in range(spec.fanout)
+        ]
+        if len(directories) * spec.fanout > spec.files:
+            break
+    return directories
+
+
+def iter_file_paths(spec: RepositorySpec) -> Iterator[str]:
+    directories = get_directory_names(spec)
+    for file_number in range(spec.files):
+        yield os.path.join(directories[file_number % len(directories)], f"file_{file_number}.txt")
+
+
+def make_content(rng: random.Random, size: int) -> bytes:
+    line = f"{rng.getrandbits(64):016x} ".encode() * 4 + b'\n'
+    return (line * (size // len(line) + 1))[:size]
+
+
+def generate_repository(directory: str, spec: RepositorySpec) -> int:
+    rng = random.Random(spec.seed)
+    written = 0
+    for relative_path in iter_file_paths(spec):
+        file_path = os.path.join(directory, relative_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as file:
+            written += file.write(make_content(rng, spec.file_size))
+    log.info(f"Generated {spec.files} files ({written} bytes) in {directory}")
+    return written
+
+
+def apply_churn(directory: str, spec: RepositorySpec, revision: int) -> list[str]:
+    rng = random.Random(spec.seed * 1_000_003 + revision)
+    changed_count = max(1, int(spec.files * spec.churn))
+    changed_numbers = set(rng.sample(range(spec.files), min(changed_count, spec.files)))
+    changed = []
+    for file_number, relative_path in enumerate(iter_file_paths(spec)):
+        if file_number not in changed_numbers:
+            continue
+        with open(os.path.join(directory, relative_path), 'ab') as file:
+            file.write(f"revision {revision}\n".encode())
+        changed.append(relative_path)
+    return changed
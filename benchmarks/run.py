@@ -0,0 +1,194 @@
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import NamedTuple
+
+from benchmarks import generate
+
+
+log = logging.getLogger(__name__)
+
+
+WIT_SCRIPT = Path(__file__).resolve().parents[1] / 'src' / 'wit.py'
+DEFAULT_THRESHOLD = 0.2
+RESULT_VERSION = 1
+
+
+class CommandResult(NamedTuple):
+    name: str
+    args: list[str]
+    seconds: float
+    peak_rss_kb: int
+    returncode: int
+
+
+class Regression(NamedTuple):
+    name: str
+    metric: str
+    baseline: float
+    current: float
+
+
+def get_peak_rss_kb(usage) -> int:
+    if sys.platform == 'darwin':
+        return usage.ru_maxrss // 1024
+    return usage.ru_maxrss
+
+
+def run_command(directory: str, name: str, *args: str) -> CommandResult:
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(WIT_SCRIPT), *args],
+        cwd=directory,
+        env={**os.environ, 'WIT_NO_DAEMON': '1'},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    result = CommandResult(
+        name=name,
+        args=list(args),
+        seconds=seconds,
+        peak_rss_kb=get_peak_rss_kb(usage),
+        returncode=process.returncode,
+    )
+    log.info(f"{name}: {seconds:.3f}s, {result.peak_rss_kb} KiB")
+    return result
+
+
+def run_scenario(directory: str, spec: generate.RepositorySpec) -> list[CommandResult]:
+    generate.generate_repository(directory, spec)
+    results = [
+        run_command(directory, 'init', 'init'),
+        run_command(directory, 'add', 'add', '.'),
+        run_command(directory, 'commit', 'commit', 'initial'),
+        run_command(directory, 'status_clean', 'status'),
+    ]
+    for revision in range(1, spec.history):
+        generate.apply_churn(directory, spec, revision)
+        results.append(run_command(directory, 'status_dirty', 'status'))
+        results.append(run_command(directory, 'add_churn', 'add', '.'))
+        results.append(run_command(directory, 'commit_churn', 'commit', f"revision {revision}"))
+    results.append(run_command(directory, 'log', 'log'))
+    results.append(run_command(directory, 'branch', 'branch', 'benchmark'))
+    if spec.history > 1:
+        first_commit_id = get_first_commit_id(directory)
+        if first_commit_id is not None:
+            results.append(run_command(directory, 'checkout_old', 'checkout', first_commit_id))
+    results.append(run_command(directory, 'checkout_branch', 'checkout', 'benchmark'))
+    return results
+
+
+def get_first_commit_id(directory: str) -> str | None:
+    completed = subprocess.run(
+        [sys.executable, str(WIT_SCRIPT), 'log'],
+        cwd=directory,
+        env={**os.environ, 'WIT_NO_DAEMON': '1'},
+        capture_output=True,
+        text=True,
+    )
+    commit_lines = [line for line in completed.stdout.splitlines() if line.startswith('commit ')]
+    if not commit_lines:
+        return None
+    return commit_lines[-1].split()[1]
+
+
+def summarize(results: list[CommandResult]) -> dict[str, dict[str, float]]:
+    summary = {}
+    for result in results:
+        entry = summary.setdefault(result.name, {'runs': 0, 'seconds': 0.0, 'peak_rss_kb': 0})
+        entry['runs'] += 1
+        entry['seconds'] += result.seconds
+        entry['peak_rss_kb'] = max(entry['peak_rss_kb'], result.peak_rss_kb)
+    for entry in summary.values():
+        entry['seconds'] /= entry['runs']
+    return summary
+
+
+def build_report(spec: generate.RepositorySpec, results: list[CommandResult]) -> dict:
+    return {
+        'version': RESULT_VERSION,
+        'spec': spec._asdict(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': [result._asdict() for result in results],
+        'summary': summarize(results),
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[Regression]:
+    regressions = []
+    for name, current in report['summary'].items():
+        previous = baseline.get('summary', {}).get(name)
+        if previous is None:
+            continue
+        for metric in ('seconds', 'peak_rss_kb'):
+            if previous[metric] and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append(Regression(name, metric, previous[metric], current[metric]))
+    return regressions
+
+
+def parse_arguments(options: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run')
+    parser.add_argument('--preset', choices=generate.PRESETS, default='small')
+    for field, default in generate.RepositorySpec._field_defaults.items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(default), dest=field)
+    parser.add_argument('--output', help="write the JSON results to this file")
+    parser.add_argument('--baseline', help="compare against a previous JSON results file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--work-dir', help="generate the repository here instead of a temporary folder")
+    parser.add_argument('--keep', action='store_true', help="keep the generated repository")
+    return parser.parse_args(options)
+
+
+def main(options: list[str] | None = None) -> int:
+    arguments = parse_arguments(sys.argv[1:] if options is None else options)
+    overrides = {
+        field: getattr(arguments, field)
+        for field in generate.RepositorySpec._fields
+        if getattr(arguments, field) is not None
+    }
+    spec = generate.PRESETS[arguments.preset]._replace(**overrides)
+    directory = arguments.work_dir or tempfile.mkdtemp(prefix='wit_benchmark_')
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+    try:
+        report = build_report(spec, run_scenario(directory, spec))
+    finally:
+        if not arguments.keep:
+            shutil.rmtree(directory, ignore_errors=True)
+    output = json.dumps(report, indent=2)
+    if arguments.output:
+        Path(arguments.output).write_text(output + '\n')
+    else:
+        print(output)
+    failed = [result['name'] for result in report['results'] if result['returncode'] != 0]
+    if failed:
+        log.error(f"Commands failed: {', '.join(failed)}")
+        return 1
+    if arguments.baseline:
+        regressions = compare(report, json.loads(Path(arguments.baseline).read_text()), arguments.threshold)
+        for regression in regressions:
+            log.error(
+                f"{regression.name} {regression.metric} regressed from "
+                f"{regression.baseline:.3f} to {regression.current:.3f}"
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=os.environ.get('WIT_LOG_LEVEL', 'INFO').upper())
+    sys.exit(main())
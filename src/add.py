@@ -1,17 +1,17 @@
 import logging
 import os
-import shutil
 
+import commit
+import config
 import errors
+import ignore
+import index
+import objects
+import repository
+import tracing
 import utils
 
 log = logging.getLogger(__name__)
-log.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-ch.setFormatter(formatter)
-log.addHandler(ch)
 
 
 def get_directory_path(full_path: str) -> str:
@@ -29,45 +29,102 @@ def find_staging_area_path(directory_path: str, paths: utils.Paths) -> str:
     return os.path.join(paths.staging, relative_path)
 
 
-def copy_file(source_path: str, destination_path: str) -> None:
+def copy_file(
+    source_path: str, destination_path: str, link_store: utils.Paths | None = None
+) -> index.IndexEntry:
     utils.create_path(os.path.dirname(destination_path))
-    shutil.copy(source_path, destination_path)
-    log.debug(f"Copying file {source_path} succeeded")
+    source_stat = os.stat(source_path)
+    if os.path.lexists(destination_path):
+        os.remove(destination_path)
+    if link_store is None:
+        object_id = objects.copy_file_hashed(source_path, destination_path)
+    else:
+        object_id = objects.store_file(link_store, source_path)
+        objects.export_object(link_store, object_id, destination_path, objects.EXPORT_LINK)
+    log.debug("Copying file %s succeeded", source_path)
+    tracing.count(tracing.FILES_HASHED)
+    tracing.count(tracing.FILES_COPIED)
+    tracing.count(tracing.BYTES_MOVED, source_stat.st_size)
+    return index.create_entry(source_stat, object_id)
 
 
-def copy_path(source_path: str, destination_path: str, wit_path: str) -> None:
+def copy_path(
+    source_path: str,
+    destination_path: str,
+    wit_path: str,
+    staged_entries: dict[str, index.IndexEntry] | None = None,
+    matcher: ignore.IgnoreMatcher | None = None,
+    link_store: utils.Paths | None = None,
+) -> None:
+    if staged_entries is None:
+        staged_entries = {}
+    if matcher is None:
+        matcher = ignore.IgnoreMatcher([])
+    wit_dir = os.path.dirname(wit_path)
     if os.path.isfile(source_path):
         log.debug(f"Copying the file {source_path} into {destination_path}")
-        copy_file(source_path, destination_path)
+        staged_entries[os.path.relpath(source_path, wit_dir)] = copy_file(
+            source_path, destination_path, link_store
+        )
         log.info("Successfully finished copying into the staging area")
         return
     for item in os.listdir(source_path):
         source_item_path = os.path.join(source_path, item)
         destination_item_path = os.path.join(destination_path, item)
-        if os.path.isdir(source_item_path) and source_item_path != wit_path:
-            log.debug(f"Copying all files in {source_item_path}")
-            copy_path(source_item_path, destination_item_path, wit_path)
+        is_directory = os.path.isdir(source_item_path)
+        if matcher.is_ignored(os.path.relpath(source_item_path, wit_dir), is_directory):
+            log.debug("Skipping the ignored item %s", source_item_path)
+            tracing.count(tracing.FILES_SKIPPED)
+            continue
+        if is_directory and source_item_path != wit_path:
+            log.debug("Copying all files in %s", source_item_path)
+            copy_path(
+                source_item_path, destination_item_path, wit_path, staged_entries, matcher, link_store
+            )
         if os.path.isfile(source_item_path):
-            log.debug(f"Copying the file {source_item_path}")
-            copy_file(source_item_path, destination_item_path)
+            log.debug("Copying the file %s", source_item_path)
+            staged_entries[os.path.relpath(source_item_path, wit_dir)] = copy_file(
+                source_item_path, destination_item_path, link_store
+            )
     log.info("Successfully finished copying into the staging area")
 
 
-def add(item_to_add: str) -> None | bool:
+def add(item_to_add: str, repo: repository.Repository | None = None) -> None | bool:
     full_path_item = os.path.abspath(os.path.expanduser(item_to_add))
     directory_path = get_directory_path(full_path_item)
     try:
-        paths = utils.get_paths(directory_path)
+        repo = repository.open_repository(repo, directory_path)
     except errors.WitDirectoryNotFoundError:
         log.error(
             "Unable to find a wit repository in any of the parent folders of the given item path, {directory_path}"
         )
         return
+    paths = repo.paths
     destination_path = find_staging_area_path(full_path_item, paths)
+    matcher = repo.matcher
+    relative_item_path = os.path.relpath(full_path_item, paths.wit_dir)
+    if relative_item_path != objects.ROOT and matcher.is_ignored_path(
+        relative_item_path, os.path.isdir(full_path_item)
+    ):
+        log.error(f"The given item path, {full_path_item}, is ignored by {ignore.IGNORE_FILE_NAME}")
+        return
     log.info("Copying the source file(s) and folder(s) into the staging area")
+    staged_entries = repo.read_index()
+    link_store = None
+    repository_config = repo.config
+    if (
+        config.get_storage_mode(repository_config) == config.STORAGE_LINK
+        and config.get_codec(repository_config).name == objects.CODEC_NONE
+    ):
+        link_store = paths
     try:
-        copy_path(full_path_item, destination_path, paths.wit)
+        with tracing.span(tracing.COPY):
+            copy_path(full_path_item, destination_path, paths.wit, staged_entries, matcher, link_store)
     except OSError as err:
         log.exception("Copying of at least one file failed.")
         raise err
+    finally:
+        repo.write_index(staged_entries)
+        objects.invalidate_tree_cache(paths, relative_item_path)
+    commit.resolve_merge_conflicts(paths, relative_item_path)
     return True
@@ -0,0 +1,97 @@
+import heapq
+import logging
+
+import commit_graph
+
+
+log = logging.getLogger(__name__)
+
+
+REACHED_FROM_FIRST = 1
+REACHED_FROM_SECOND = 2
+REACHED_FROM_BOTH = REACHED_FROM_FIRST | REACHED_FROM_SECOND
+STALE = 4
+
+
+def is_ancestor(graph: commit_graph.CommitGraph, ancestor: int, descendant: int) -> bool:
+    minimum_generation = graph.record(ancestor).generation
+    pending = [descendant]
+    visited = {descendant}
+    while pending:
+        position = pending.pop()
+        if position == ancestor:
+            return True
+        for parent_position in graph.record(position).parents:
+            if parent_position in visited:
+                continue
+            visited.add(parent_position)
+            if graph.record(parent_position).generation >= minimum_generation:
+                pending.append(parent_position)
+    return False
+
+
+def paint_history(
+    graph: commit_graph.CommitGraph, first: int, second: int, finished_flags: int
+) -> list[tuple[int, int]]:
+    flags = {first: REACHED_FROM_FIRST}
+    flags[second] = flags.get(second, 0) | REACHED_FROM_SECOND
+    pending = [(-graph.record(position).generation, position) for position in flags]
+    heapq.heapify(pending)
+    queued = set(flags)
+    unfinished = sum(1 for position in flags if flags[position] & finished_flags != finished_flags)
+    painted = []
+    while pending and unfinished:
+        _, position = heapq.heappop(pending)
+        queued.discard(position)
+        position_flags = flags[position]
+        if position_flags & finished_flags != finished_flags:
+            unfinished -= 1
+        painted.append((position, position_flags))
+        if position_flags & REACHED_FROM_BOTH == REACHED_FROM_BOTH:
+            position_flags |= STALE
+        for parent_position in graph.record(position).parents:
+            parent_flags = flags.get(parent_position, 0)
+            if parent_flags | position_flags == parent_flags:
+                continue
+            new_flags = parent_flags | position_flags
+            if parent_position not in flags:
+                heapq.heappush(pending, (-graph.record(parent_position).generation, parent_position))
+                queued.add(parent_position)
+                if new_flags & finished_flags != finished_flags:
+                    unfinished += 1
+            elif parent_position in queued and parent_flags & finished_flags != finished_flags:
+                if new_flags & finished_flags == finished_flags:
+                    unfinished -= 1
+            flags[parent_position] = new_flags
+    return painted
+
+
+def merge_bases(graph: commit_graph.CommitGraph, first: int, second: int) -> list[int]:
+    candidates = [
+        position
+        for position, flags in paint_history(graph, first, second, STALE)
+        if flags & (REACHED_FROM_BOTH | STALE) == REACHED_FROM_BOTH
+    ]
+    return [
+        candidate
+        for candidate in candidates
+        if not any(
+            other != candidate and is_ancestor(graph, candidate, other) for other in candidates
+        )
+    ]
+
+
+def merge_base(graph: commit_graph.CommitGraph, first: int, second: int) -> int | None:
+    bases = merge_bases(graph, first, second)
+    return bases[0] if bases else None
+
+
+def ahead_behind(graph: commit_graph.CommitGraph, first: int, second: int) -> tuple[int, int]:
+    ahead = 0
+    behind = 0
+    for _, flags in paint_history(graph, first, second, REACHED_FROM_BOTH):
+        if flags & REACHED_FROM_BOTH == REACHED_FROM_FIRST:
+            ahead += 1
+        elif flags & REACHED_FROM_BOTH == REACHED_FROM_SECOND:
+            behind += 1
+    return ahead, behind
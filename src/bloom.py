@@ -0,0 +1,33 @@
+import hashlib
+import struct
+from typing import Collection
+
+
+BITS_PER_PATH = 10
+HASH_COUNT = 7
+MAX_CHANGED_PATHS = 512
+SEEDS = struct.Struct('>II')
+
+
+def _bit_positions(relative_path: str, bit_count: int) -> list[int]:
+    first, second = SEEDS.unpack_from(hashlib.sha1(relative_path.encode()).digest())
+    return [(first + number * second) % bit_count for number in range(HASH_COUNT)]
+
+
+def create_filter(changed_paths: Collection[str]) -> bytes:
+    if len(changed_paths) > MAX_CHANGED_PATHS:
+        return b''
+    bits = bytearray(max((len(changed_paths) * BITS_PER_PATH + 7) // 8, 1))
+    for relative_path in changed_paths:
+        for position in _bit_positions(relative_path, len(bits) * 8):
+            bits[position >> 3] |= 1 << (position & 7)
+    return bytes(bits)
+
+
+def might_contain(bloom_filter: bytes | None, relative_path: str) -> bool:
+    if not bloom_filter:
+        return True
+    return all(
+        bloom_filter[position >> 3] & (1 << (position & 7))
+        for position in _bit_positions(relative_path, len(bloom_filter) * 8)
+    )
@@ -1,37 +1,99 @@
+import argparse
 import logging
 
 
+import ancestry
+import commit_graph
+import errors
+import refs
+import repository
 import utils
 
 
 log = logging.getLogger(__name__)
-log.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-ch.setFormatter(formatter)
-log.addHandler(ch)
 
 
-def branch_exists(branch, references):
-    log.info("Checking if the branch name already exists in references info")
-    for reference in references:
-        current_branch = reference.partition('=')[0].lower()
-        if branch == current_branch:
-            return True
-
-
-def branch(branch_name):
+def branch(branch_name, repo: repository.Repository | None = None):
     log.info("Creating a new branch")
-    paths = utils.get_paths()
-    current_head_id = utils.get_reference_id(paths, 'HEAD')
-    with open(paths.references, 'r') as references_file:
-        current_references = references_file.read().split()
-    if branch_exists(branch_name, current_references):
+    repo = repository.open_repository(repo)
+    references = repo.references
+    current_head_id = references.get(refs.HEAD)
+    if branch_name in references:
         log.error("The given branch name already, failed to create a new branch")
         return
-    with open(paths.references, 'a') as references_file:
-        references_file.write(f"{branch_name}={current_head_id}\n")
+    if not references.create_branch(branch_name, current_head_id):
+        log.error("Failed to create a new branch")
+        return
     log.info("Created a new branch successfully")
-    
 
+
+def branch_summary(
+    graph: commit_graph.CommitGraph, commit_id: str | None, base_id: str | None
+) -> str:
+    position = graph.find_position(commit_id) if commit_id is not None else None
+    if position is None:
+        return "no commits"
+    record = graph.record(position)
+    base_position = graph.find_position(base_id) if base_id is not None else None
+    summary = f"{record.commit_id[:7]} {graph.message(record)}"
+    if base_position is None or base_position == position:
+        return summary
+    ahead, behind = ancestry.ahead_behind(graph, position, base_position)
+    return f"{record.commit_id[:7]} [ahead {ahead}, behind {behind}] {graph.message(record)}"
+
+
+def list_branches(
+    verbose: bool = False, repo: repository.Repository | None = None
+) -> list[str] | None:
+    try:
+        repo = repository.open_repository(repo)
+    except errors.WitDirectoryNotFoundError:
+        log.error(
+            "Unable to find a wit repository in any of the parent folders of the current working directory"
+        )
+        return
+    paths = repo.paths
+    references = repo.references
+    branch_names = references.branches()
+    if branch_names is None:
+        return []
+    active_branch = utils.get_active_branch(paths)
+    lines = [
+        f"{'*' if branch_name == active_branch else ' '} {branch_name}"
+        for branch_name in branch_names
+    ]
+    if not verbose:
+        return lines
+    branch_ids = [references.get(branch_name) for branch_name in branch_names]
+    try:
+        graph = commit_graph.load_commit_graph(
+            paths, [commit_id for commit_id in branch_ids if commit_id is not None]
+        )
+    except (OSError, ValueError):
+        log.exception("Unable to read the commit graph")
+        return
+    try:
+        base_id = references.get(refs.MASTER) if refs.MASTER in references else None
+        width = max(len(line) for line in lines)
+        return [
+            f"{line.ljust(width)} {branch_summary(graph, commit_id, base_id)}"
+            for line, commit_id in zip(lines, branch_ids)
+        ]
+    finally:
+        graph.close()
+
+
+def run_branch(*options: str, repo: repository.Repository | None = None) -> None:
+    parser = argparse.ArgumentParser(prog='wit branch')
+    parser.add_argument('name', nargs='?', help="name of the branch to create")
+    parser.add_argument(
+        '--verbose', '-v', action='store_true', help="show ahead/behind counts against master"
+    )
+    arguments = parser.parse_args(options)
+    if arguments.name is not None:
+        branch(arguments.name, repo)
+        return
+    lines = list_branches(arguments.verbose, repo)
+    if lines is None:
+        return
+    print('\n'.join(lines))
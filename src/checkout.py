@@ -1,119 +1,204 @@
+import argparse
 import logging
 import os
-import shutil
 
+import commit_ids
+import config
 import errors
+import index
+import objects
+import refs
+import repository
 import status
+import tracing
 import utils
 
 
 log = logging.getLogger(__name__)
-log.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-ch.setFormatter(formatter)
-log.addHandler(ch)
 
 
-def replace_file(source_path: str, destination_path: str) -> None:
-    log.debug("Copying file {source_path} from source path into destination path, replacing if needed")
-    utils.create_path(os.path.dirname(destination_path))
-    if os.path.isfile(destination_path):
-        os.remove(destination_path)
-    shutil.copy(source_path, destination_path)
-    log.debug("File copy successful")
+def replace_file(
+    paths: utils.Paths,
+    object_id: str,
+    destination_path: str,
+    method: str = objects.EXPORT_COPY,
+    mode: int = objects.FILE_MODE,
+) -> None:
+    log.debug("Exporting object %s into %s, replacing if needed", object_id, destination_path)
+    objects.export_object(paths, object_id, destination_path, method, mode)
+    tracing.count(tracing.FILES_COPIED)
+    if tracing.is_enabled():
+        tracing.count(tracing.BYTES_MOVED, os.path.getsize(destination_path))
 
 
-def export_files(
-    source_path: str,
-    destination_path: str,
-    untracked_files: list[str],
-    source_files: list[str],
+def remove_file(file_path: str) -> None:
+    log.debug("Removing %s as it is not in the checked out commit", file_path)
+    if os.path.isfile(file_path):
+        os.remove(file_path)
+
+
+def remove_empty_directory(directory_path: str) -> None:
+    if os.path.isdir(directory_path) and not os.listdir(directory_path):
+        os.rmdir(directory_path)
+
+
+def get_export_methods(
+    paths: utils.Paths, repository_config: dict[str, str] | None = None
+) -> tuple[str, str]:
+    if repository_config is None:
+        repository_config = config.read_config(paths)
+    if config.get_storage_mode(repository_config) == config.STORAGE_LINK:
+        return objects.EXPORT_LINK, objects.EXPORT_CLONE
+    return objects.EXPORT_COPY, objects.EXPORT_COPY
+
+
+def get_overwritten_untracked(
+    paths: utils.Paths, changes: list[objects.TreeChange], untracked_items: set[str]
+) -> list[str]:
+    return [
+        change.relative_path
+        for change in changes
+        if change.kind == objects.BLOB
+        and change.new_id is not None
+        and os.path.join(paths.wit_dir, change.relative_path) in untracked_items
+    ]
+
+
+def apply_changes(
+    paths: utils.Paths,
+    tree_id: str | None,
+    changes: list[objects.TreeChange],
+    repo: repository.Repository | None = None,
+    repair: bool = False,
 ) -> None:
-    log.debug(f"Moving files and replacing folders from {source_path} to {destination_path}")
-    for file in source_files:
-        source_file_path = os.path.join(source_path, file)
-        destination_file_path = os.path.join(destination_path, file)
-        if os.path.isdir(source_file_path) and destination_file_path not in untracked_files:
-            replace_path(source_file_path, destination_file_path, untracked_files)
-        if os.path.isfile(source_file_path) and destination_file_path not in untracked_files:
-            replace_file(source_file_path, destination_file_path)
+    log.info(f"Applying {len(changes)} changed items to the working directory and staging area")
+    if repo is None:
+        repo = repository.Repository(paths.wit_dir)
+    with tracing.span(tracing.COPY):
+        _apply_changes(paths, tree_id, changes, repo, repair)
 
 
-def clear_destination(
-    destination_path: str,
-    untracked_items: list[str],
-    source_items: list[str],
-    destination_items: list[str],
+def _apply_changes(
+    paths: utils.Paths,
+    tree_id: str | None,
+    changes: list[objects.TreeChange],
+    repo: repository.Repository,
+    repair: bool,
 ) -> None:
-    log.debug("Clearing destination path of tracked items that aren't in the source items")
-    for item in destination_items:
-        destination_item_path = os.path.join(destination_path, item)
-        if item not in source_items and destination_item_path not in untracked_items:
-            if os.path.isfile(destination_item_path):
-                os.remove(destination_item_path)
-            if (
-                os.path.isdir(destination_item_path)
-                and os.listdir(destination_item_path) == []
-            ):
-                os.rmdir(destination_item_path)
-
-
-def replace_path(
-    source_path: str, destination_path: str, untracked_items: list[str] | None = None
+    staging_method, working_method = get_export_methods(paths, repo.config)
+    staged_entries = repo.read_index()
+    tree_cache = objects.read_tree_cache(paths)
+    for change in changes:
+        if change.kind == objects.BLOB and change.new_id is None:
+            remove_file(os.path.join(paths.wit_dir, change.relative_path))
+            remove_file(os.path.join(paths.staging, change.relative_path))
+            staged_entries.pop(change.relative_path, None)
+    for change in changes:
+        if change.kind == objects.TREE:
+            if change.new_id is None:
+                tree_cache.pop(change.relative_path, None)
+            else:
+                tree_cache[change.relative_path] = change.new_id
+            continue
+        if change.new_id is None:
+            continue
+        working_path = os.path.join(paths.wit_dir, change.relative_path)
+        replace_file(
+            paths,
+            change.new_id,
+            os.path.join(paths.staging, change.relative_path),
+            staging_method,
+            change.new_mode,
+        )
+        replace_file(paths, change.new_id, working_path, working_method, change.new_mode)
+        staged_entries[change.relative_path] = index.create_entry(
+            os.stat(working_path), change.new_id, change.new_mode
+        )
+    for change in reversed(changes):
+        if change.kind == objects.TREE and change.new_id is None:
+            remove_empty_directory(os.path.join(paths.wit_dir, change.relative_path))
+            remove_empty_directory(os.path.join(paths.staging, change.relative_path))
+    if repair:
+        restore_missing_files(paths, staged_entries, working_method)
+    if tree_id is not None:
+        tree_cache[objects.ROOT] = tree_id
+    repo.write_index(staged_entries)
+    objects.write_tree_cache(paths, tree_cache)
+
+
+def restore_missing_files(
+    paths: utils.Paths, staged_entries: dict[str, index.IndexEntry], method: str
 ) -> None:
-    log.info(
-        f"Replacing the content of the destination path {destination_path} "
-        f"with the content of the source path {source_path}, "
-        "ignoring untracked items"
-    )
-    if untracked_items is None:
-        untracked_items = []
-    source_files = os.listdir(source_path)
-    export_files(source_path, destination_path, untracked_items, source_files)
-    destination_items = os.listdir(destination_path)
-    clear_destination(
-        destination_path, untracked_items, source_files, destination_items
-    )
+    for relative_path, entry in staged_entries.items():
+        working_path = os.path.join(paths.wit_dir, relative_path)
+        if os.path.lexists(working_path):
+            continue
+        log.debug("Restoring the deleted tracked file %s", working_path)
+        replace_file(paths, entry.object_id, working_path, method, entry.mode)
+        staged_entries[relative_path] = index.create_entry(
+            os.stat(working_path), entry.object_id, entry.mode
+        )
 
 
-def get_commit_ids(paths: utils.Paths, commit_name: str) -> tuple[str, str] | None:
+def get_commit_ids(
+    paths: utils.Paths, commit_name: str, references: refs.RefStore | None = None
+) -> str | None:
     log.debug("Getting commit id from branch name or id")
-    if len(commit_name) == 40:
-        return commit_name
     try:
-        return utils.get_reference_id(paths, commit_name)
+        if references is None:
+            references = utils.get_references(paths)
+        if commit_name in references or not commit_ids.is_commit_id_prefix(commit_name):
+            if len(commit_name) == commit_ids.ID_LENGTH and commit_name not in references:
+                commit_id = commit_name
+            else:
+                commit_id = references.get(commit_name)
+        else:
+            commit_id = commit_ids.resolve_prefix(paths, commit_name)
     except errors.ReferenceFileError:
         log.critical("Corrupted references file")
-        return 
+        return
+    except errors.AmbiguousCommitIdError:
+        log.exception("Unable to retrieve the commit id as the given prefix is ambiguous")
+        return
     except errors.MissingBranchError:
         log.exception("Unable to retrieve the branch commit id as branch not found")
-        return 
+        return
+    if commit_id is not None and not os.path.isfile(objects.get_commit_meta_data_path(paths, commit_id)):
+        log.error(f"The commit {commit_id} does not exist")
+        return
+    return commit_id
 
 
-def get_checkout_commit_info(paths: utils.Paths, commit_name: str) -> tuple[str, str] | None:
-    log.info("Getting commit id and path")
-    commit_id = get_commit_ids(paths, commit_name)
+def get_checkout_commit_info(
+    paths: utils.Paths, commit_name: str, references: refs.RefStore | None = None
+) -> tuple[str | None, str] | None:
+    log.info("Getting commit id and tree")
+    commit_id = get_commit_ids(paths, commit_name, references)
     if commit_id is None:
-        log.error("Failed to get commit id and path")
+        log.error("Failed to get commit id and tree")
         return
-    source_image_path = os.path.join(paths.images, commit_id)
-    log.info("Got commit id and path")
-    return source_image_path, commit_id
+    tree_id = objects.get_commit_tree(paths, commit_id)
+    if tree_id is None:
+        log.error(f"The commit {commit_id} has no tree, refusing to check it out")
+        return
+    log.info("Got commit id and tree")
+    return tree_id, commit_id
 
 
-def get_checkout_status(main_path: str) -> list[str]:
+def get_checkout_status(
+    main_path: str, repo: repository.Repository | None = None
+) -> tuple[str, set[str]]:
     log.info("Getting the current repository untracked items")
+    CURRENT_COMMIT_ID = 0
     UNCOMITTED_CHANGES = 1
     UNSTAGED_CHANGES = 2
     UNTRACKED = 3
-    status_results = status.status()
+    status_results = status.status(repo=repo)
     if len(status_results[UNCOMITTED_CHANGES]) != 0:
         raise errors.StatusNotResolvedError(UNCOMITTED_CHANGES)
     if len(status_results[UNSTAGED_CHANGES]) != 0:
         raise errors.StatusNotResolvedError(UNSTAGED_CHANGES)
-    return status_results[UNTRACKED]
+    return status_results[CURRENT_COMMIT_ID], set(status_results[UNTRACKED])
 
 
 def update_active_branch(active_path: str, branch_name: str) -> None:
@@ -123,31 +208,57 @@ def update_active_branch(active_path: str, branch_name: str) -> None:
     log.info("Finished updating the active branch")
 
 
-def checkout(commit_name: str) -> str | None:
+def checkout(
+    commit_name: str, repo: repository.Repository | None = None, repair: bool = False
+) -> str | None:
     try:
-        paths = utils.get_paths()
+        repo = repository.open_repository(repo)
     except errors.WitDirectoryNotFoundError:
         log.error(
             "Unable to find a wit repository in any of the parent folders of the given item path, {directory_path}"
         )
         return
-    commit_info = get_checkout_commit_info(paths, commit_name)
+    paths = repo.paths
+    try:
+        references = repo.references
+    except errors.ReferenceFileError:
+        log.critical("Corrupted references file")
+        return
+    commit_info = get_checkout_commit_info(paths, commit_name, references)
     if commit_info is None:
         return
-    source_image_path, commit_id = commit_info
+    tree_id, commit_id = commit_info
     try:
-        untracked_items = get_checkout_status(paths.wit_dir)
+        current_commit_id, untracked_items = get_checkout_status(paths.wit_dir, repo)
     except errors.StatusNotResolvedError:
         log.exception("Unresolved status - cannot perform checkout")
         return
     log.info("Untracked items retrieval successful")
-    replace_path(source_image_path, paths.wit_dir, untracked_items)
-    replace_path(source_image_path, paths.staging)
-    if len(commit_name) == 40:
-        commit_name = 'None'
-    if not utils.update_references(paths, commit_id, commit_name):
+    current_tree_id = objects.get_commit_tree(paths, current_commit_id)
+    with tracing.span(tracing.COMPARE):
+        changes = list(objects.diff_trees(paths, current_tree_id, tree_id))
+    overwritten = get_overwritten_untracked(paths, changes, untracked_items)
+    if overwritten:
+        log.error(
+            f"Untracked working files would be overwritten by checkout: {', '.join(overwritten)}. "
+            "Move or add them first."
+        )
+        return
+    apply_changes(paths, tree_id, changes, repo, repair)
+    if commit_name not in references:
+        commit_name = refs.DETACHED
+    if not references.update(commit_id, commit_name):
         log.critical("Unable to update references.txt after performing checkout")
         return
     update_active_branch(paths.active, commit_name)
     return commit_id
 
+
+def run_checkout(*options: str, repo: repository.Repository | None = None) -> str | None:
+    parser = argparse.ArgumentParser(prog='wit checkout')
+    parser.add_argument('commit_name', help="branch name or commit id to check out")
+    parser.add_argument(
+        '--repair', action='store_true', help="also restore tracked files missing from the working directory"
+    )
+    arguments = parser.parse_args(options)
+    return checkout(arguments.commit_name, repo, arguments.repair)
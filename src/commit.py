@@ -1,82 +1,173 @@
 import datetime
+import hashlib
 import logging
 import os
-import random
-import shutil
-import string
 
+import commit_graph
+import commit_ids
+import config
 import errors
+import index
+import objects
+import refs
+import repository
+import tracing
 import utils
 
 log = logging.getLogger(__name__)
-log.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-ch.setFormatter(formatter)
-log.addHandler(ch)
 
 
-def remove_commit_folder(paths: utils.Paths, commit_id: str) -> None:
-    log.info(f"Removing commit folder {commit_id} due to previous error")
-    commit_path = os.path.join(paths.images, commit_id)
+MERGE_HEAD_NAME = 'MERGE_HEAD'
+MERGE_CONFLICTS_NAME = 'MERGE_CONFLICTS'
+
+
+def get_merge_head_path(paths: utils.Paths) -> str:
+    return os.path.join(paths.wit, MERGE_HEAD_NAME)
+
+
+def read_merge_head(paths: utils.Paths) -> str | None:
     try:
-        shutil.rmtree(commit_path)
+        with open(get_merge_head_path(paths), 'r') as merge_head_file:
+            return merge_head_file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_merge_head(paths: utils.Paths, commit_id: str) -> None:
+    with open(get_merge_head_path(paths), 'w') as merge_head_file:
+        merge_head_file.write(commit_id)
+
+
+def clear_merge_head(paths: utils.Paths) -> None:
+    for merge_path in (get_merge_head_path(paths), get_merge_conflicts_path(paths)):
+        try:
+            os.remove(merge_path)
+        except FileNotFoundError:
+            pass
+
+
+def get_merge_conflicts_path(paths: utils.Paths) -> str:
+    return os.path.join(paths.wit, MERGE_CONFLICTS_NAME)
+
+
+def read_merge_conflicts(paths: utils.Paths) -> list[str]:
+    try:
+        with open(get_merge_conflicts_path(paths), 'r') as conflicts_file:
+            return [line.rstrip('\n') for line in conflicts_file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def write_merge_conflicts(paths: utils.Paths, conflicts: list[str]) -> None:
+    if not conflicts:
+        try:
+            os.remove(get_merge_conflicts_path(paths))
+        except FileNotFoundError:
+            pass
+        return
+    with open(get_merge_conflicts_path(paths), 'w') as conflicts_file:
+        conflicts_file.write(''.join(f"{relative_path}\n" for relative_path in conflicts))
+
+
+def resolve_merge_conflicts(paths: utils.Paths, relative_path: str) -> None:
+    conflicts = read_merge_conflicts(paths)
+    if not conflicts:
+        return
+    relative_path = os.path.normpath(relative_path)
+    unresolved = [
+        conflict for conflict in conflicts
+        if relative_path != objects.ROOT
+        and conflict != relative_path
+        and not conflict.startswith(relative_path + os.sep)
+    ]
+    if len(unresolved) != len(conflicts):
+        log.info(f"Marked {len(conflicts) - len(unresolved)} merge conflicts as resolved")
+        write_merge_conflicts(paths, unresolved)
+
+
+def remove_commit(paths: utils.Paths, commit_id: str) -> None:
+    log.info(f"Removing commit {commit_id} due to previous error")
+    try:
+        os.remove(objects.get_commit_meta_data_path(paths, commit_id))
     except OSError:
-        log.error(f"Unable to remove the problematic commit folder, commit id {commit_id}")
+        log.error(f"Unable to remove the problematic commit meta data, commit id {commit_id}")
         return
-    log.info(f"Successfully removed the commit folder {commit_id}")
+    log.info(f"Successfully removed the commit {commit_id}")
 
 
-def create_commit_id() -> str:
+def create_commit_id(meta_data: str) -> str:
     log.info("Creating new commit id")
-    return "".join(random.choice(string.hexdigits) for _ in range(40))
+    return hashlib.sha1(meta_data.encode()).hexdigest()
 
 
-def create_commit_folder(paths: utils.Paths) -> str:
-    log.info("Creating new commit folder")
-    commit_id = create_commit_id()
-    log.info("New commit id created")
-    commit_path = os.path.join(paths.images, commit_id)
-    log.debug("Copying content into new commit folder")
+def create_commit_tree(
+    paths: utils.Paths,
+    staged_entries: dict[str, index.IndexEntry] | None = None,
+    repository_config: dict[str, str] | None = None,
+) -> str | None:
+    log.info("Creating the commit tree of the staging area")
+    tree_cache = objects.read_tree_cache(paths)
     try:
-        shutil.copytree(paths.staging, commit_path)
+        if staged_entries is None:
+            staged_entries = index.read_index(paths)
+        if repository_config is None:
+            repository_config = config.read_config(paths)
+        staged_ids = {
+            relative_path: entry.object_id for relative_path, entry in staged_entries.items()
+        }
+        staged_modes = {
+            relative_path: entry.mode for relative_path, entry in staged_entries.items()
+        }
+        codec = config.get_codec(repository_config)
+        with tracing.span(tracing.WALK):
+            tree_id = objects.build_tree(
+                paths, tree_cache, staged_ids, codec=codec, staged_modes=staged_modes
+            )
+        objects.write_tree_cache(paths, tree_cache)
     except OSError:
-        log.exception("Copying staging area content into new commit folder failed.")
-        if os.path.isdir(commit_path):
-            log.info("Removing new commit folder as copying failed")
-            remove_commit_folder(paths, commit_id)
+        log.exception("Storing staging area content in the object store failed.")
         return
-    log.info("Copying staging area content into new commit folder successful")
-    return commit_id
+    log.info("Storing staging area content in the object store successful")
+    return tree_id
 
 
-def create_commit_meta_data(paths: utils.Paths, commit_id: str, message: str) -> bool:
+def create_commit_meta_data(
+    paths: utils.Paths,
+    tree_id: str,
+    message: str,
+    references: refs.RefStore | None = None,
+    merge_parent: str | None = None,
+) -> str | None:
     log.info("Creating new commit meta data file")
     creation_time = datetime.datetime.now()
     formatted_creation_time = creation_time.strftime("%a %b %d %H:%M:%S %Y %z")
     try:
-        parent = utils.get_reference_id(paths)
+        if references is None:
+            references = utils.get_references(paths)
+        parent = references.get()
     except errors.ReferenceFileError:
         log.critical("Corrupted references file")
-        remove_commit_folder(paths, commit_id)
-        return False
+        return
     except errors.MissingBranchError:
         log.exception("Unable to retrieve the parent commit id as branch not found")
-        remove_commit_folder(paths, commit_id)
-        return False
-    message = (
-        f"parent={parent}\n" f"date={formatted_creation_time}\n" f"message={message}\n"
+        return
+    if merge_parent is not None:
+        parent = f"{parent},{merge_parent}"
+    meta_data = (
+        f"tree={tree_id}\n"
+        f"parent={parent}\n"
+        f"date={formatted_creation_time}\n"
+        f"message={message}\n"
     )
-    commit_file_path = os.path.join(paths.images, f"{commit_id}.txt")
+    commit_id = create_commit_id(meta_data)
     try:
-        with open(commit_file_path, "w") as commit_file:
-            commit_file.write(message)
+        utils.create_path(paths.images)
+        with open(objects.get_commit_meta_data_path(paths, commit_id), "w") as commit_file:
+            commit_file.write(meta_data)
     except OSError:
         log.exception("Unable to create commit metadata file")
-        remove_commit_folder(paths, commit_id)
-        return False
-    return True
+        return
+    return commit_id
 
 
 def get_active_branch(paths: utils.Paths) -> str | None:
@@ -87,15 +178,19 @@ def get_active_branch(paths: utils.Paths) -> str | None:
         log.exception("Unable to retrieve the active branch.")
 
 
-def check_current_commit_ids_match(paths: utils.Paths, branch_name: str) -> bool:
+def check_current_commit_ids_match(
+    paths: utils.Paths, branch_name: str, references: refs.RefStore | None = None
+) -> bool:
     log.info("Checking if the branch id matches the HEAD id")
     try:
-        current_head_id = utils.get_reference_id(paths, "HEAD")
+        if references is None:
+            references = utils.get_references(paths)
+        current_head_id = references.get(refs.HEAD)
     except (errors.ReferenceFileError, errors.MissingBranchError):
         log.critical("Corrupted references file")
         return False
     try:
-        current_branch_id = utils.get_reference_id(paths, branch_name)
+        current_branch_id = references.get(branch_name)
     except errors.ReferenceFileError:
         log.critical("Corrupted references file")
         return False
@@ -111,28 +206,52 @@ def check_current_commit_ids_match(paths: utils.Paths, branch_name: str) -> bool
     return True
 
 
-def commit(commit_message: str) -> str | None:
+def commit(commit_message: str, repo: repository.Repository | None = None) -> str | None:
     try:
-        paths = utils.get_paths()
+        repo = repository.open_repository(repo)
     except errors.WitDirectoryNotFoundError:
         log.error(
             "Unable to find a wit repository in any of the parent folders of the current working directory"
         )
         return
-    commit_id = create_commit_folder(paths)
-    if commit_id is None:
+    paths = repo.paths
+    conflicts = read_merge_conflicts(paths)
+    if conflicts:
+        log.error(
+            f"Unresolved merge conflicts in {', '.join(conflicts)}. "
+            "Add the resolved files or run wit merge --abort."
+        )
         return
-    if not create_commit_meta_data(paths, commit_id, commit_message):
+    try:
+        references = repo.references
+    except errors.ReferenceFileError:
+        log.critical("Corrupted references file")
+        return
+    try:
+        tree_id = create_commit_tree(paths, repo.read_index(), repo.config)
+    except OSError:
+        log.exception("Unable to read the staging area index")
+        return
+    if tree_id is None:
+        return
+    commit_id = create_commit_meta_data(
+        paths, tree_id, commit_message, references, read_merge_head(paths)
+    )
+    if commit_id is None:
         return
     branch_name = get_active_branch(paths)
     if branch_name is None:
-        remove_commit_folder(paths, commit_id)
+        remove_commit(paths, commit_id)
         return
-    if branch_name != "None":
-        if not check_current_commit_ids_match(paths, branch_name):
-            remove_commit_folder(paths, commit_id)
+    if branch_name != refs.DETACHED:
+        if not check_current_commit_ids_match(paths, branch_name, references):
+            remove_commit(paths, commit_id)
             return
-    if not utils.update_references(paths, commit_id, branch_name):
-        remove_commit_folder(paths, commit_id)
+    if not references.update(commit_id, branch_name):
+        remove_commit(paths, commit_id)
+        return
+    clear_merge_head(paths)
+    commit_ids.add_commit_id(paths, commit_id)
+    commit_graph.add_commit(paths, commit_id)
     return commit_id
 
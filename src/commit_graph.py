@@ -0,0 +1,379 @@
+import bisect
+import datetime
+import logging
+import mmap
+import os
+import struct
+from typing import Iterable, NamedTuple
+
+import bloom
+import objects
+import utils
+
+
+log = logging.getLogger(__name__)
+
+
+COMMIT_GRAPH_NAME = 'commit_graph'
+MESSAGES_NAME = 'commit_graph_messages'
+BLOOM_INDEX_NAME = 'commit_graph_bloom_index'
+BLOOM_DATA_NAME = 'commit_graph_blooms'
+LOOKUP_NAME = 'commit_graph_lookup'
+SIGNATURE = b'WCGR'
+VERSION = 1
+HEADER = struct.Struct('>4sII')
+RECORD = struct.Struct('>20s20sIIIqII')
+BLOOM_OFFSET = struct.Struct('>Q')
+LOOKUP_RECORD = struct.Struct('>20sI')
+NO_PARENT = 0xFFFFFFFF
+DATE_FORMATS = ("%a %b %d %H:%M:%S %Y %z", "%a %b %d %H:%M:%S %Y")
+
+
+class CommitRecord(NamedTuple):
+    position: int
+    commit_id: str
+    tree_id: str | None
+    parents: tuple[int, ...]
+    generation: int
+    timestamp: int
+    message_offset: int
+    message_length: int
+
+
+class _LookupIds:
+    def __init__(self, lookup: bytes | mmap.mmap, count: int):
+        self.lookup = lookup
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, position: int) -> bytes:
+        offset = position * LOOKUP_RECORD.size
+        return self.lookup[offset:offset + 20]
+
+
+class CommitGraph:
+    def __init__(
+        self,
+        graph_map: mmap.mmap,
+        messages: bytes | mmap.mmap,
+        bloom_index: bytes | mmap.mmap,
+        bloom_data: bytes | mmap.mmap,
+        lookup: bytes | mmap.mmap,
+    ):
+        self.graph_map = graph_map
+        self.messages = messages
+        self.bloom_index = bloom_index
+        self.bloom_data = bloom_data
+        self.lookup = lookup
+        signature, version, self.count = HEADER.unpack_from(graph_map, 0)
+        if signature != SIGNATURE or version != VERSION:
+            raise ValueError("Unrecognized commit graph format")
+        if HEADER.size + self.count * RECORD.size > len(graph_map):
+            raise ValueError("Truncated commit graph")
+        if self.count * BLOOM_OFFSET.size > len(bloom_index):
+            raise ValueError("Truncated changed path filter index")
+        if self.count * LOOKUP_RECORD.size != len(lookup):
+            raise ValueError("Commit graph lookup does not match the commit graph")
+        self.lookup_ids = _LookupIds(lookup, self.count)
+        if self.messages_end() > len(messages):
+            raise ValueError("Truncated commit graph messages")
+        if self.bloom_end(self.count) > len(bloom_data):
+            raise ValueError("Truncated changed path filters")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, position: int) -> CommitRecord:
+        raw_id, raw_tree_id, first, second, generation, timestamp, offset, length = RECORD.unpack_from(
+            self.graph_map, HEADER.size + position * RECORD.size
+        )
+        return CommitRecord(
+            position=position,
+            commit_id=raw_id.hex(),
+            tree_id=raw_tree_id.hex() if any(raw_tree_id) else None,
+            parents=tuple(parent for parent in (first, second) if parent != NO_PARENT),
+            generation=generation,
+            timestamp=timestamp,
+            message_offset=offset,
+            message_length=length,
+        )
+
+    def message(self, record: CommitRecord) -> str:
+        return self.messages[record.message_offset:record.message_offset + record.message_length].decode()
+
+    def messages_end(self) -> int:
+        if not self.count:
+            return 0
+        last = self.record(self.count - 1)
+        return last.message_offset + last.message_length
+
+    def bloom_end(self, count: int) -> int:
+        if not count:
+            return 0
+        return BLOOM_OFFSET.unpack_from(self.bloom_index, (count - 1) * BLOOM_OFFSET.size)[0]
+
+    def bloom_filter(self, position: int) -> bytes:
+        return bytes(self.bloom_data[self.bloom_end(position):self.bloom_end(position + 1)])
+
+    def find_position(self, commit_id: str) -> int | None:
+        try:
+            raw_id = bytes.fromhex(commit_id)
+        except ValueError:
+            return None
+        lookup_position = bisect.bisect_left(self.lookup_ids, raw_id)
+        if lookup_position == self.count or self.lookup_ids[lookup_position] != raw_id:
+            return None
+        return LOOKUP_RECORD.unpack_from(self.lookup, lookup_position * LOOKUP_RECORD.size)[1]
+
+    def close(self) -> None:
+        for mapped in (self.graph_map, self.messages, self.bloom_index, self.bloom_data, self.lookup):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+
+def get_commit_graph_path(paths: utils.Paths) -> str:
+    return os.path.join(paths.wit, COMMIT_GRAPH_NAME)
+
+
+def get_messages_path(paths: utils.Paths) -> str:
+    return os.path.join(paths.wit, MESSAGES_NAME)
+
+
+def get_bloom_index_path(paths: utils.Paths) -> str:
+    return os.path.join(paths.wit, BLOOM_INDEX_NAME)
+
+
+def get_bloom_data_path(paths: utils.Paths) -> str:
+    return os.path.join(paths.wit, BLOOM_DATA_NAME)
+
+
+def get_lookup_path(paths: utils.Paths) -> str:
+    return os.path.join(paths.wit, LOOKUP_NAME)
+
+
+def _graph_files_exist(paths: utils.Paths) -> bool:
+    return all(
+        os.path.isfile(file_path)
+        for file_path in (
+            get_commit_graph_path(paths),
+            get_messages_path(paths),
+            get_bloom_index_path(paths),
+            get_bloom_data_path(paths),
+            get_lookup_path(paths),
+        )
+    )
+
+
+def _map_file(file_path: str) -> bytes | mmap.mmap:
+    if not os.path.getsize(file_path):
+        return b''
+    with open(file_path, 'rb') as mapped_file:
+        return mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def get_changed_paths(paths: utils.Paths, meta_data: dict[str, str]) -> set[str]:
+    parents = objects.get_commit_parents(meta_data)
+    parent_tree_id = objects.get_commit_tree(paths, parents[0]) if parents else None
+    return {
+        change.relative_path
+        for change in objects.diff_trees(paths, parent_tree_id, meta_data.get('tree'))
+    }
+
+
+def get_commit_timestamp(meta_data: dict[str, str]) -> int:
+    date = meta_data.get('date', '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return int(datetime.datetime.strptime(date, date_format).timestamp())
+        except ValueError:
+            continue
+    return 0
+
+
+def _pack_record(
+    commit_id: str,
+    meta_data: dict[str, str],
+    parent_positions: list[int],
+    generation: int,
+    message_offset: int,
+    message_length: int,
+) -> bytes:
+    tree_id = meta_data.get('tree')
+    parent_positions = parent_positions + [NO_PARENT] * (2 - len(parent_positions))
+    return RECORD.pack(
+        bytes.fromhex(commit_id),
+        bytes.fromhex(tree_id) if tree_id not in (None, '', 'None') else bytes(20),
+        parent_positions[0],
+        parent_positions[1],
+        generation,
+        get_commit_timestamp(meta_data),
+        message_offset,
+        message_length,
+    )
+
+
+def _pack_lookup(positions: dict[str, int]) -> bytes:
+    return b''.join(
+        LOOKUP_RECORD.pack(bytes.fromhex(commit_id), positions[commit_id]) for commit_id in sorted(positions)
+    )
+
+
+def _order_commits(commit_meta_data: dict[str, dict[str, str]]) -> list[str]:
+    ordered = []
+    visited = set()
+    for root_id in sorted(commit_meta_data, key=lambda commit_id: get_commit_timestamp(commit_meta_data[commit_id])):
+        pending = [(root_id, False)]
+        while pending:
+            commit_id, parents_done = pending.pop()
+            if parents_done:
+                ordered.append(commit_id)
+                continue
+            if commit_id in visited:
+                continue
+            visited.add(commit_id)
+            pending.append((commit_id, True))
+            for parent_id in objects.get_commit_parents(commit_meta_data[commit_id]):
+                if parent_id in commit_meta_data and parent_id not in visited:
+                    pending.append((parent_id, False))
+    return ordered
+
+
+def write_commit_graph(paths: utils.Paths) -> None:
+    log.info("Writing the commit graph from the stored commits")
+    commit_meta_data = {}
+    if os.path.isdir(paths.images):
+        for name in os.listdir(paths.images):
+            commit_id = name[:-len('.txt')]
+            if name.endswith('.txt') and len(commit_id) == 40:
+                commit_meta_data[commit_id] = objects.read_commit_meta_data(paths, commit_id)
+    positions = {}
+    generations = []
+    records = []
+    messages = []
+    message_offset = 0
+    bloom_filters = []
+    bloom_offsets = []
+    bloom_offset = 0
+    for commit_id in _order_commits(commit_meta_data):
+        meta_data = commit_meta_data[commit_id]
+        parent_positions = [
+            positions[parent_id]
+            for parent_id in objects.get_commit_parents(meta_data)[:2]
+            if parent_id in positions
+        ]
+        generation = 1 + max((generations[position] for position in parent_positions), default=0)
+        message = meta_data.get('message', '').encode()
+        records.append(
+            _pack_record(commit_id, meta_data, parent_positions, generation, message_offset, len(message))
+        )
+        messages.append(message)
+        message_offset += len(message)
+        bloom_filter = bloom.create_filter(get_changed_paths(paths, meta_data))
+        bloom_filters.append(bloom_filter)
+        bloom_offset += len(bloom_filter)
+        bloom_offsets.append(BLOOM_OFFSET.pack(bloom_offset))
+        positions[commit_id] = len(generations)
+        generations.append(generation)
+    graph_files = [
+        (get_messages_path(paths), messages),
+        (get_bloom_data_path(paths), bloom_filters),
+        (get_bloom_index_path(paths), bloom_offsets),
+        (get_lookup_path(paths), [_pack_lookup(positions)]),
+        (get_commit_graph_path(paths), [HEADER.pack(SIGNATURE, VERSION, len(records))] + records),
+    ]
+    for file_path, chunks in graph_files:
+        with open(f"{file_path}.tmp", 'wb') as graph_file:
+            graph_file.write(b''.join(chunks))
+    for file_path, _ in graph_files:
+        os.replace(f"{file_path}.tmp", file_path)
+
+
+def _open_commit_graph(paths: utils.Paths) -> CommitGraph:
+    with open(get_commit_graph_path(paths), 'rb') as graph_file:
+        graph_map = mmap.mmap(graph_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return CommitGraph(
+        graph_map,
+        _map_file(get_messages_path(paths)),
+        _map_file(get_bloom_index_path(paths)),
+        _map_file(get_bloom_data_path(paths)),
+        _map_file(get_lookup_path(paths)),
+    )
+
+
+def read_commit_graph(paths: utils.Paths) -> CommitGraph:
+    if not _graph_files_exist(paths):
+        write_commit_graph(paths)
+    try:
+        return _open_commit_graph(paths)
+    except ValueError:
+        log.warning("Rewriting the unreadable commit graph")
+    write_commit_graph(paths)
+    return _open_commit_graph(paths)
+
+
+def load_commit_graph(paths: utils.Paths, commit_ids: Iterable[str]) -> CommitGraph:
+    graph = read_commit_graph(paths)
+    if any(graph.find_position(commit_id) is None for commit_id in commit_ids):
+        log.warning("Commits are missing from the commit graph, rewriting it")
+        graph.close()
+        write_commit_graph(paths)
+        graph = read_commit_graph(paths)
+    return graph
+
+
+def add_commit(paths: utils.Paths, commit_id: str) -> None:
+    log.debug(f"Adding {commit_id} to the commit graph")
+    if not _graph_files_exist(paths):
+        write_commit_graph(paths)
+        return
+    meta_data = objects.read_commit_meta_data(paths, commit_id)
+    graph = read_commit_graph(paths)
+    try:
+        if graph.find_position(commit_id) is not None:
+            return
+        parent_positions = [graph.find_position(parent_id) for parent_id in objects.get_commit_parents(meta_data)]
+        count = len(graph)
+        message_offset = graph.messages_end()
+        bloom_offset = graph.bloom_end(count)
+        lookup = [
+            LOOKUP_RECORD.unpack_from(graph.lookup, position * LOOKUP_RECORD.size) for position in range(count)
+        ]
+        if None not in parent_positions:
+            generation = 1 + max(
+                (graph.record(position).generation for position in parent_positions), default=0
+            )
+    finally:
+        graph.close()
+    if None in parent_positions:
+        log.warning("The commit graph is missing parent commits, rewriting it")
+        write_commit_graph(paths)
+        return
+    message = meta_data.get('message', '').encode()
+    bloom_filter = bloom.create_filter(get_changed_paths(paths, meta_data))
+    bisect.insort(lookup, (bytes.fromhex(commit_id), count))
+    with open(get_messages_path(paths), 'r+b') as messages_file:
+        messages_file.truncate(message_offset)
+        messages_file.seek(message_offset)
+        messages_file.write(message)
+    with open(get_bloom_data_path(paths), 'r+b') as bloom_data_file:
+        bloom_data_file.truncate(bloom_offset)
+        bloom_data_file.seek(bloom_offset)
+        bloom_data_file.write(bloom_filter)
+    with open(get_bloom_index_path(paths), 'r+b') as bloom_index_file:
+        bloom_index_file.seek(count * BLOOM_OFFSET.size)
+        bloom_index_file.write(BLOOM_OFFSET.pack(bloom_offset + len(bloom_filter)))
+        bloom_index_file.truncate()
+    lookup_path = get_lookup_path(paths)
+    with open(f"{lookup_path}.tmp", 'wb') as lookup_file:
+        lookup_file.write(b''.join(LOOKUP_RECORD.pack(*entry) for entry in lookup))
+    os.replace(f"{lookup_path}.tmp", lookup_path)
+    with open(get_commit_graph_path(paths), 'r+b') as graph_file:
+        graph_file.seek(HEADER.size + count * RECORD.size)
+        graph_file.write(
+            _pack_record(commit_id, meta_data, parent_positions[:2], generation, message_offset, len(message))
+        )
+        graph_file.truncate()
+        graph_file.seek(0)
+        graph_file.write(HEADER.pack(SIGNATURE, VERSION, count + 1))
@@ -0,0 +1,127 @@
+import bisect
+import logging
+import mmap
+import os
+import struct
+
+import errors
+import objects
+import utils
+
+
+log = logging.getLogger(__name__)
+
+
+COMMIT_IDS_NAME = 'commit_ids'
+SIGNATURE = b'WCID'
+HEADER = struct.Struct('>4sI')
+ID_LENGTH = 40
+MIN_PREFIX_LENGTH = 4
+MAX_UNSORTED_IDS = 256
+
+
+class _SortedIds:
+    def __init__(self, ids_map: mmap.mmap, count: int):
+        self.ids_map = ids_map
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, position: int) -> str:
+        offset = HEADER.size + position * ID_LENGTH
+        return self.ids_map[offset:offset + ID_LENGTH].decode()
+
+
+def get_commit_ids_path(paths: utils.Paths) -> str:
+    return os.path.join(paths.wit, COMMIT_IDS_NAME)
+
+
+def is_commit_id_prefix(name: str) -> bool:
+    return MIN_PREFIX_LENGTH <= len(name) < ID_LENGTH and all(
+        character in '0123456789abcdefABCDEF' for character in name
+    )
+
+
+def write_commit_ids(paths: utils.Paths, commit_ids: list[str]) -> None:
+    log.info(f"Writing the sorted index of {len(commit_ids)} commit ids")
+    commit_ids_path = get_commit_ids_path(paths)
+    temp_path = f"{commit_ids_path}.tmp"
+    with open(temp_path, 'wb') as commit_ids_file:
+        commit_ids_file.write(HEADER.pack(SIGNATURE, len(commit_ids)))
+        commit_ids_file.write(''.join(sorted(commit_ids)).encode())
+    os.replace(temp_path, commit_ids_path)
+
+
+def rebuild_commit_ids(paths: utils.Paths) -> None:
+    log.info("Rebuilding the commit id index from the stored commits")
+    commit_ids = []
+    if os.path.isdir(paths.images):
+        commit_ids = [
+            name[:-len('.txt')]
+            for name in os.listdir(paths.images)
+            if name.endswith('.txt') and len(name) == ID_LENGTH + len('.txt')
+        ]
+    write_commit_ids(paths, commit_ids)
+
+
+def read_commit_ids(paths: utils.Paths) -> tuple[_SortedIds, list[str]]:
+    commit_ids_path = get_commit_ids_path(paths)
+    if not os.path.isfile(commit_ids_path):
+        rebuild_commit_ids(paths)
+    with open(commit_ids_path, 'rb') as commit_ids_file:
+        ids_map = mmap.mmap(commit_ids_file.fileno(), 0, access=mmap.ACCESS_READ)
+    signature, sorted_count = HEADER.unpack_from(ids_map, 0)
+    if signature != SIGNATURE:
+        raise ValueError("Unrecognized commit id index format")
+    unsorted_start = HEADER.size + sorted_count * ID_LENGTH
+    unsorted_data = ids_map[unsorted_start:].decode()
+    unsorted_ids = [
+        unsorted_data[offset:offset + ID_LENGTH] for offset in range(0, len(unsorted_data), ID_LENGTH)
+    ]
+    return _SortedIds(ids_map, sorted_count), unsorted_ids
+
+
+def add_commit_id(paths: utils.Paths, commit_id: str) -> None:
+    log.debug(f"Adding {commit_id} to the commit id index")
+    commit_ids_path = get_commit_ids_path(paths)
+    if not os.path.isfile(commit_ids_path):
+        rebuild_commit_ids(paths)
+        return
+    sorted_ids, unsorted_ids = read_commit_ids(paths)
+    if len(unsorted_ids) < MAX_UNSORTED_IDS:
+        with open(commit_ids_path, 'ab') as commit_ids_file:
+            commit_ids_file.write(commit_id.encode())
+        return
+    all_ids = [sorted_ids[position] for position in range(len(sorted_ids))]
+    write_commit_ids(paths, all_ids + unsorted_ids + [commit_id])
+
+
+def find_commit_ids(paths: utils.Paths, prefix: str, limit: int = 2) -> list[str]:
+    sorted_ids, unsorted_ids = read_commit_ids(paths)
+    matches = []
+    position = bisect.bisect_left(sorted_ids, prefix)
+    while position < len(sorted_ids) and len(matches) < limit:
+        commit_id = sorted_ids[position]
+        if not commit_id.startswith(prefix):
+            break
+        matches.append(commit_id)
+        position += 1
+    for commit_id in unsorted_ids:
+        if commit_id.startswith(prefix) and commit_id not in matches:
+            matches.append(commit_id)
+    return [
+        commit_id
+        for commit_id in matches
+        if os.path.isfile(objects.get_commit_meta_data_path(paths, commit_id))
+    ][:limit]
+
+
+def resolve_prefix(paths: utils.Paths, prefix: str) -> str:
+    log.info(f"Resolving the commit id prefix {prefix}")
+    matches = find_commit_ids(paths, prefix.lower())
+    if not matches:
+        raise errors.MissingBranchError(prefix)
+    if len(matches) > 1:
+        raise errors.AmbiguousCommitIdError(prefix, matches)
+    return matches[0]
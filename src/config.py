@@ -0,0 +1,66 @@
+import logging
+import os
+
+import objects
+import utils
+
+
+log = logging.getLogger(__name__)
+
+
+CONFIG_NAME = 'config'
+STORAGE_COPY = 'copy'
+STORAGE_LINK = 'link'
+DEFAULTS = {
+    'storage': STORAGE_COPY,
+    'compression': objects.CODEC_NONE,
+    'compression_level': str(objects.DEFAULT_COMPRESSION_LEVEL),
+}
+
+
+def get_config_path(paths: utils.Paths) -> str:
+    return os.path.join(paths.wit, CONFIG_NAME)
+
+
+def read_config(paths: utils.Paths) -> dict[str, str]:
+    log.info("Reading the repository config")
+    config = dict(DEFAULTS)
+    if not os.path.isfile(get_config_path(paths)):
+        return config
+    with open(get_config_path(paths), 'r') as config_file:
+        for line in config_file:
+            key, separator, value = line.strip().partition('=')
+            if separator and not key.startswith('#'):
+                config[key.strip()] = value.strip()
+    return config
+
+
+def write_config(paths: utils.Paths, config: dict[str, str]) -> None:
+    log.info("Writing the repository config")
+    config_path = get_config_path(paths)
+    temp_path = f"{config_path}.tmp"
+    with open(temp_path, 'w') as config_file:
+        for key, value in config.items():
+            config_file.write(f"{key}={value}\n")
+    os.replace(temp_path, config_path)
+
+
+def get_storage_mode(config: dict[str, str]) -> str:
+    storage_mode = config.get('storage', STORAGE_COPY)
+    if storage_mode not in (STORAGE_COPY, STORAGE_LINK):
+        log.warning(f"Unknown storage mode {storage_mode}, falling back to {STORAGE_COPY}")
+        return STORAGE_COPY
+    return storage_mode
+
+
+def get_codec(config: dict[str, str]) -> objects.Codec:
+    codec_name = config.get('compression', objects.CODEC_NONE)
+    if codec_name not in objects.CODEC_SUFFIXES:
+        log.warning(f"Unknown compression codec {codec_name}, storing objects uncompressed")
+        return objects.RAW
+    try:
+        level = int(config.get('compression_level', objects.DEFAULT_COMPRESSION_LEVEL))
+    except ValueError:
+        log.warning("The compression level must be a number, using the default level")
+        level = objects.DEFAULT_COMPRESSION_LEVEL
+    return objects.Codec(codec_name, min(max(level, 0), 9))
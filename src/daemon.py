@@ -0,0 +1,159 @@
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import logging
+import os
+import socketserver
+import threading
+
+import errors
+import repository
+import tracing
+import wit
+
+
+log = logging.getLogger(__name__)
+
+
+STOP_REQUEST = 'stop'
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    def __init__(self, repo: repository.Repository, socket_path: str):
+        self.repo = repo
+        self.request_lock = threading.Lock()
+        super().__init__(socket_path, DaemonRequestHandler)
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            log.warning("Ignoring a malformed daemon request")
+            return
+        if request.get('command') == STOP_REQUEST:
+            log.info("Stopping the wit daemon")
+            threading.Thread(target=self.server.shutdown).start()
+            response = {'stdout': '', 'stderr': '', 'exit_code': 0}
+        else:
+            with self.server.request_lock:
+                response = execute(
+                    self.server.repo,
+                    request.get('cwd', self.server.repo.paths.wit_dir),
+                    request.get('args', []),
+                    request.get('log_level', wit.DEFAULT_LOG_LEVEL),
+                    request.get('trace', False),
+                )
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+def execute(
+    repo: repository.Repository, cwd: str, args: list[str], log_level: str, trace: bool = False
+) -> dict:
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    handler = logging.StreamHandler(stderr)
+    handler.setFormatter(logging.Formatter(wit.LOG_FORMAT))
+    root_logger = logging.getLogger()
+    previous_level = root_logger.level
+    previous_directory = os.getcwd()
+    root_logger.addHandler(handler)
+    root_logger.setLevel(log_level.upper())
+    exit_code = 0
+    if trace:
+        tracing.start(' '.join(args))
+    try:
+        os.chdir(cwd)
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            run_command(repo, *args)
+    except SystemExit as exit_error:
+        if isinstance(exit_error.code, int):
+            exit_code = exit_error.code
+        elif exit_error.code is not None:
+            stderr.write(f"{exit_error.code}\n")
+            exit_code = 1
+    except errors.RepositoryLockError:
+        log.exception(f"Unable to run {' '.join(args)} while another wit process is using the repository")
+    except Exception:
+        log.exception(f"The daemon failed to run {' '.join(args)}")
+        exit_code = 1
+    finally:
+        os.chdir(previous_directory)
+        root_logger.removeHandler(handler)
+        root_logger.setLevel(previous_level)
+        stopped = tracing.stop()
+    return {
+        'stdout': stdout.getvalue(),
+        'stderr': stderr.getvalue(),
+        'exit_code': exit_code,
+        'trace': stopped.to_dict() if stopped is not None else None,
+    }
+
+
+def run_command(repo: repository.Repository, command: str | None = None, *args: str):
+    if command not in wit.COMMANDS or command == 'daemon':
+        log.error(f"Unknown daemon command {command}")
+        return
+    accepted_number_of_args = wit._accepted_number_of_args(command)
+    if len(args) not in accepted_number_of_args:
+        log.error(
+            f"{command} command takes {accepted_number_of_args.start} to {accepted_number_of_args.stop - 1} "
+            f"arguments, {len(args)} were given."
+        )
+        return
+    function = wit.get_command_function(command)
+    with tracing.span(command), repo.locks.acquire(wit.get_command_lock(command, args)):
+        if 'repo' in inspect.signature(function).parameters:
+            return function(*args, repo=repo)
+        return function(*args)
+
+
+def serve(repo: repository.Repository) -> None:
+    socket_path = wit.get_daemon_socket_path(repo.paths.wit)
+    if os.path.exists(socket_path):
+        if wit.forward_to_daemon(socket_path, ['status']) is not None:
+            log.error(f"A wit daemon is already serving {repo.paths.wit_dir}")
+            return
+        os.remove(socket_path)
+    try:
+        server = DaemonServer(repo, socket_path)
+    except OSError:
+        log.exception(f"Unable to listen on {socket_path}")
+        return
+    log.info(f"Serving {repo.paths.wit_dir} on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Interrupted, stopping the wit daemon")
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def stop(repo: repository.Repository) -> bool:
+    socket_path = wit.get_daemon_socket_path(repo.paths.wit)
+    if wit.send_daemon_request(socket_path, {'command': STOP_REQUEST}) is None:
+        log.error(f"No wit daemon is serving {repo.paths.wit_dir}")
+        return False
+    return True
+
+
+def run_daemon(*options: str) -> None:
+    parser = argparse.ArgumentParser(prog='wit daemon')
+    parser.add_argument('action', nargs='?', choices=['start', STOP_REQUEST], default='start')
+    arguments = parser.parse_args(options)
+    try:
+        repo = repository.Repository()
+    except errors.WitDirectoryNotFoundError:
+        log.error(
+            "Unable to find a wit repository in any of the parent folders of the current working directory"
+        )
+        return
+    if arguments.action == STOP_REQUEST:
+        stop(repo)
+        return
+    serve(repo)
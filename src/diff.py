@@ -0,0 +1,306 @@
+import argparse
+import collections
+import difflib
+import itertools
+import logging
+import os
+import sys
+from typing import Iterable, Iterator, NamedTuple
+
+import checkout
+import errors
+import index
+import objects
+import repository
+import utils
+
+
+log = logging.getLogger(__name__)
+
+
+CONTEXT_LINES = 3
+WINDOW_LINES = 4096
+NULL_PATH = '/dev/null'
+
+
+class FileVersion(NamedTuple):
+    object_id: str | None = None
+    file_path: str | None = None
+
+
+class FileChange(NamedTuple):
+    relative_path: str
+    old: FileVersion | None
+    new: FileVersion | None
+
+
+def _stored_version(object_id: str | None) -> FileVersion | None:
+    if object_id is None:
+        return None
+    return FileVersion(object_id=object_id)
+
+
+def get_commit_changes(paths: utils.Paths, old_commit_id: str, new_commit_id: str) -> list[FileChange]:
+    log.info(f"Comparing the trees of {old_commit_id} and {new_commit_id}")
+    return [
+        FileChange(change.relative_path, _stored_version(change.old_id), _stored_version(change.new_id))
+        for change in objects.diff_trees(
+            paths, objects.get_commit_tree(paths, old_commit_id), objects.get_commit_tree(paths, new_commit_id)
+        )
+        if change.kind == objects.BLOB and change.old_id != change.new_id
+    ]
+
+
+def get_staged_changes(
+    paths: utils.Paths, tree_id: str | None, staged_ids: dict[str, str]
+) -> dict[str, str | None]:
+    staged_tree_id = objects.read_tree_cache(paths).get(objects.ROOT)
+    if staged_tree_id is not None and objects.object_exists(paths, staged_tree_id):
+        log.debug("Comparing the commit tree with the cached staging area tree")
+        return {
+            change.relative_path: change.old_id
+            for change in objects.diff_trees(paths, tree_id, staged_tree_id)
+            if change.kind == objects.BLOB
+        }
+    log.debug("Comparing the commit snapshot with the staging area index")
+    snapshot = objects.get_tree_files(paths, tree_id)
+    return {
+        relative_path: snapshot.get(relative_path)
+        for relative_path in snapshot.keys() | staged_ids.keys()
+        if snapshot.get(relative_path) != staged_ids.get(relative_path)
+    }
+
+
+def get_working_changes(
+    paths: utils.Paths, staged_entries: dict[str, index.IndexEntry], refreshed: set[str]
+) -> dict[str, FileVersion | None]:
+    index_mtime_ns = index.get_index_mtime_ns(paths)
+    changes = {}
+    for relative_path, entry in staged_entries.items():
+        file_path = os.path.join(paths.wit_dir, relative_path)
+        try:
+            file_stat = os.stat(file_path)
+        except FileNotFoundError:
+            changes[relative_path] = None
+            continue
+        if index.is_unchanged(entry, file_stat, index_mtime_ns):
+            continue
+        if entry.mtime_ns and file_stat.st_size != entry.size:
+            changes[relative_path] = FileVersion(file_path=file_path)
+            continue
+        object_id = objects.hash_file(file_path)
+        if object_id == entry.object_id:
+            staged_entries[relative_path] = index.create_entry(file_stat, object_id, entry.mode)
+            refreshed.add(relative_path)
+            continue
+        changes[relative_path] = FileVersion(object_id=object_id, file_path=file_path)
+    return changes
+
+
+def get_changes(
+    repo: repository.Repository, old_commit_id: str | None = None, new_commit_id: str | None = None
+) -> list[FileChange]:
+    paths = repo.paths
+    if new_commit_id is not None:
+        return get_commit_changes(paths, old_commit_id, new_commit_id)
+    staged_entries = repo.read_index()
+    refreshed = set()
+    working_changes = get_working_changes(paths, staged_entries, refreshed)
+    if refreshed:
+        log.debug(f"Refreshing the index stat data of {len(refreshed)} unchanged files")
+        repo.write_index(staged_entries)
+    staged_changes = {}
+    if old_commit_id is not None:
+        staged_changes = get_staged_changes(
+            paths,
+            objects.get_commit_tree(paths, old_commit_id),
+            {relative_path: entry.object_id for relative_path, entry in staged_entries.items()},
+        )
+    changes = []
+    for relative_path in sorted(working_changes.keys() | staged_changes.keys()):
+        staged_entry = staged_entries.get(relative_path)
+        staged = None
+        if staged_entry is not None:
+            staged = FileVersion(staged_entry.object_id, os.path.join(paths.staging, relative_path))
+        old = _stored_version(staged_changes[relative_path]) if relative_path in staged_changes else staged
+        new = working_changes.get(relative_path, staged)
+        if old is None and new is None:
+            continue
+        if old is not None and new is not None and new.object_id == old.object_id:
+            continue
+        changes.append(FileChange(relative_path, old, new))
+    return changes
+
+
+def iter_version_blocks(paths: utils.Paths, version: FileVersion | None) -> Iterator[bytes]:
+    if version is None:
+        return
+    if version.file_path is None:
+        yield from objects.iter_object_blocks(paths, version.object_id)
+        return
+    with open(version.file_path, 'rb') as version_file:
+        while block := version_file.read(objects.BLOCK_SIZE):
+            yield block
+
+
+def iter_lines(blocks: Iterable[bytes]) -> Iterator[bytes]:
+    pending = []
+    for block in blocks:
+        lines = block.split(b'\n')
+        if len(lines) == 1:
+            pending.append(block)
+            continue
+        pending.append(lines[0])
+        yield b''.join(pending) + b'\n'
+        for line in lines[1:-1]:
+            yield line + b'\n'
+        pending = [lines[-1]]
+    remainder = b''.join(pending)
+    if remainder:
+        yield remainder
+
+
+def _format_range(start: int, stop: int) -> str:
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    if not length:
+        return f"{start},0"
+    return f"{start + 1},{length}"
+
+
+def _format_line(prefix: str, line: bytes) -> Iterator[str]:
+    yield prefix + line.rstrip(b'\n').decode(errors='replace')
+    if not line.endswith(b'\n'):
+        yield '\\ No newline at end of file'
+
+
+def _iter_group_lines(
+    old_window: list[bytes], new_window: list[bytes], old_offset: int, new_offset: int
+) -> Iterator[str]:
+    matcher = difflib.SequenceMatcher(None, old_window, new_window, autojunk=False)
+    for group in matcher.get_grouped_opcodes(CONTEXT_LINES):
+        old_range = _format_range(group[0][1] + old_offset, group[-1][2] + old_offset)
+        new_range = _format_range(group[0][3] + new_offset, group[-1][4] + new_offset)
+        yield f"@@ -{old_range} +{new_range} @@"
+        for tag, old_start, old_end, new_start, new_end in group:
+            if tag == 'equal':
+                for line in old_window[old_start:old_end]:
+                    yield from _format_line(' ', line)
+                continue
+            for line in old_window[old_start:old_end]:
+                yield from _format_line('-', line)
+            for line in new_window[new_start:new_end]:
+                yield from _format_line('+', line)
+
+
+def _find_window_cut(old_window: list[bytes], new_window: list[bytes]) -> tuple[int, int]:
+    matcher = difflib.SequenceMatcher(None, old_window, new_window, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in reversed(matcher.get_opcodes()):
+        if tag == 'equal' and old_end - old_start > 2 * CONTEXT_LINES:
+            return old_end - CONTEXT_LINES, new_end - CONTEXT_LINES
+    return len(old_window), len(new_window)
+
+
+def iter_hunks(old_lines: Iterator[bytes], new_lines: Iterator[bytes]) -> Iterator[str]:
+    context = collections.deque(maxlen=CONTEXT_LINES)
+    skipped = 0
+    old_window = []
+    new_window = []
+    for old_line, new_line in itertools.zip_longest(old_lines, new_lines):
+        if old_line != new_line:
+            if old_line is not None:
+                old_window.append(old_line)
+            if new_line is not None:
+                new_window.append(new_line)
+            break
+        context.append(old_line)
+        skipped += 1
+    else:
+        return
+    old_window[:0] = context
+    new_window[:0] = context
+    old_offset = new_offset = skipped - len(context)
+    while True:
+        old_window.extend(itertools.islice(old_lines, WINDOW_LINES - len(old_window)))
+        new_window.extend(itertools.islice(new_lines, WINDOW_LINES - len(new_window)))
+        last_window = len(old_window) < WINDOW_LINES and len(new_window) < WINDOW_LINES
+        if last_window:
+            old_cut, new_cut = len(old_window), len(new_window)
+        else:
+            old_cut, new_cut = _find_window_cut(old_window, new_window)
+        yield from _iter_group_lines(old_window[:old_cut], new_window[:new_cut], old_offset, new_offset)
+        if last_window:
+            return
+        del old_window[:old_cut]
+        del new_window[:new_cut]
+        old_offset += old_cut
+        new_offset += new_cut
+
+
+def iter_file_diff(paths: utils.Paths, change: FileChange) -> Iterator[str]:
+    yield f"diff --wit a/{change.relative_path} b/{change.relative_path}"
+    old_blocks = iter_version_blocks(paths, change.old)
+    new_blocks = iter_version_blocks(paths, change.new)
+    old_first = next(old_blocks, b'')
+    new_first = next(new_blocks, b'')
+    if b'\0' in old_first or b'\0' in new_first:
+        yield f"Binary files a/{change.relative_path} and b/{change.relative_path} differ"
+        return
+    yield f"--- {'a/' + change.relative_path if change.old is not None else NULL_PATH}"
+    yield f"+++ {'b/' + change.relative_path if change.new is not None else NULL_PATH}"
+    yield from iter_hunks(
+        iter_lines(itertools.chain([old_first], old_blocks)),
+        iter_lines(itertools.chain([new_first], new_blocks)),
+    )
+
+
+def iter_diff(paths: utils.Paths, changes: Iterable[FileChange]) -> Iterator[str]:
+    for change in changes:
+        yield from iter_file_diff(paths, change)
+
+
+def diff(
+    old_name: str | None = None,
+    new_name: str | None = None,
+    repo: repository.Repository | None = None,
+) -> Iterator[str] | None:
+    try:
+        repo = repository.open_repository(repo)
+    except errors.WitDirectoryNotFoundError:
+        log.error(
+            "Unable to find a wit repository in any of the parent folders of the current working directory"
+        )
+        return
+    paths = repo.paths
+    commit_ids = []
+    for commit_name in (old_name, new_name):
+        if commit_name is None:
+            break
+        commit_id = checkout.get_commit_ids(paths, commit_name, repo.references)
+        if commit_id is None:
+            return
+        commit_ids.append(commit_id)
+    try:
+        changes = get_changes(repo, *commit_ids)
+    except OSError:
+        log.exception("Unable to compare the requested versions")
+        return
+    return iter_diff(paths, changes)
+
+
+def run_diff(*options: str, repo: repository.Repository | None = None) -> None:
+    parser = argparse.ArgumentParser(prog='wit diff')
+    parser.add_argument('old', nargs='?', help="commit to compare from, the staging area by default")
+    parser.add_argument('new', nargs='?', help="commit to compare to, the working directory by default")
+    arguments = parser.parse_args(options)
+    lines = diff(arguments.old, arguments.new, repo)
+    if lines is None:
+        return
+    try:
+        for line in lines:
+            print(line)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        log.debug("The diff output was closed before the diff ended")
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
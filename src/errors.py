@@ -36,4 +36,43 @@ class StatusNotResolvedError(WitError):
         self.status_problem = StatusNotResolvedError.STATUS_ISSUE[status_type]
 
     def __str__(self) -> str:
-        return f"The current status is unresolved. There are {self.status_problem}"
\ No newline at end of file
+        return f"The current status is unresolved. There are {self.status_problem}"
+
+
+class ReferenceLockError(WitError):
+    def __init__(self, lock_path: str, holder: int | None = None):
+        self.lock_path = lock_path
+        self.holder = holder
+
+    def __str__(self) -> str:
+        holder = f" held by process {self.holder}" if self.holder is not None else ""
+        return (
+            f"Timed out waiting for the references lock file, {self.lock_path},{holder} to be released. "
+            "Remove it if no wit process is running."
+        )
+
+
+class AmbiguousCommitIdError(WitError):
+    def __init__(self, prefix: str, candidates: list[str]):
+        self.prefix = prefix
+        self.candidates = candidates
+
+    def __str__(self) -> str:
+        return f"The commit id prefix {self.prefix} is ambiguous, it matches: {', '.join(self.candidates)}"
+
+
+class RepositoryLockError(WitError):
+    def __init__(self, lock_path: str, mode: str):
+        self.lock_path = lock_path
+        self.mode = mode
+
+    def __str__(self) -> str:
+        return f"Timed out waiting for the {self.mode} repository lock, {self.lock_path}, to be released."
+
+
+class LockUpgradeError(WitError):
+    def __init__(self, lock_path: str):
+        self.lock_path = lock_path
+
+    def __str__(self) -> str:
+        return f"Unable to take an exclusive lock on {self.lock_path} while holding a shared lock."
@@ -1,4 +1,9 @@
+import contextlib
 import flask
+import functools
+import hashlib
+import itertools
+import json
 import os
 
 import add
@@ -6,28 +11,117 @@ import branch
 import checkout
 import commit
 import errors
-import status
+import locks
+import objects
+import repository
+import status_cache
 import utils
+import wit
 
 app = flask.Flask(__name__)
+repositories: dict[str, repository.Repository] = {}
+status_caches: dict[str, status_cache.StatusCache] = {}
+EVENTS_KEEPALIVE = 15.0
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def get_repository() -> repository.Repository:
+    working_directory = os.getcwd()
+    if working_directory not in repositories:
+        repositories[working_directory] = repository.Repository(working_directory)
+    return repositories[working_directory]
+
+
+def get_status_cache() -> status_cache.StatusCache:
+    working_directory = os.getcwd()
+    if working_directory not in status_caches:
+        status_caches[working_directory] = status_cache.StatusCache(get_repository())
+    return status_caches[working_directory]
+
+
+def with_repository_lock(mode: str):
+    def decorator(route):
+        @functools.wraps(route)
+        def locked_route(*args, **kwargs):
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(get_repository().locks.acquire(mode))
+                response = route(*args, **kwargs)
+                if isinstance(response, flask.Response) and response.is_streamed:
+                    response.call_on_close(stack.pop_all().close)
+                return response
+        return locked_route
+    return decorator
+
+
+@app.errorhandler(errors.RepositoryLockError)
+def repository_locked(error):
+    return flask.Response(str(error), status=503, headers={'Retry-After': '1'})
+
+
+def get_page_arguments() -> tuple[int, int]:
+    page = flask.request.args.get('page', 1, type=int)
+    page_size = flask.request.args.get('page_size', status_cache.DEFAULT_PAGE_SIZE, type=int)
+    return page, page_size
 
 
 @app.route('/', methods=['GET', 'POST']) 
 def index():
-    commit_id, to_commit, unstaged, untracked = status.status()
+    snapshot = get_status_cache().get_snapshot()
+    page, page_size = get_page_arguments()
     return flask.render_template(
         'index.html',
-        commit_id=commit_id,
-        to_commit=to_commit,
-        unstaged=unstaged,
-        untracked=untracked,
+        version=snapshot.version,
+        commit_id=snapshot.commit_id,
+        to_commit=status_cache.get_page(snapshot.to_commit, page, page_size),
+        unstaged=status_cache.get_page(snapshot.unstaged, page, page_size),
+        untracked=status_cache.get_page(snapshot.untracked, page, page_size),
     )
-    
+
+
+@app.route('/status/<list_name>')
+def status_page(list_name):
+    if list_name not in status_cache.FILE_LISTS:
+        return flask.Response(status=404)
+    snapshot = get_status_cache().get_snapshot()
+    page = status_cache.get_page(getattr(snapshot, list_name), *get_page_arguments())
+    return flask.jsonify(
+        version=snapshot.version,
+        items=list(page.items),
+        page=page.page,
+        page_size=page.page_size,
+        pages=page.pages,
+        total=page.total,
+    )
+
+
+@app.route('/events')
+def status_events():
+    cache = get_status_cache()
+    cache.get_snapshot()
+    last_event_id = flask.request.headers.get('Last-Event-ID', flask.request.args.get('version'))
+    version = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    def stream():
+        nonlocal version
+        with cache.subscribe():
+            while True:
+                delta = cache.wait_for_delta(version, EVENTS_KEEPALIVE)
+                if delta is None:
+                    yield ": keepalive\n\n"
+                    continue
+                version = delta['version']
+                yield f"id: {version}\nevent: status\ndata: {json.dumps(delta)}\n\n"
+
+    return flask.Response(
+        stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'}
+    )
+
 
 @app.route('/add', methods=['GET', 'POST'])
 def add_page():
     path = flask.request.form.get('file_path')
-    added = add.add(path)
+    with get_status_cache().updating():
+        added = add.add(path, get_repository())
     if added:
         return flask.redirect("../")
     return flask.Response(status=400)
@@ -36,16 +130,18 @@ def add_page():
 @app.route('/commit', methods=['GET', 'POST'])
 def commit_page():
     message = flask.request.form.get('commit_message')
-    commit_id = commit.commit(message)
+    with get_status_cache().updating():
+        commit_id = commit.commit(message, get_repository())
     if commit_id:
         return flask.redirect("../")
     
 
 @app.route('/branches', methods=['GET', 'POST']) 
+@with_repository_lock(locks.SHARED)
 def branch_page():
-    paths = utils.get_paths(os.getcwd())
-    active = utils.get_active_branch(paths)
-    branches = utils.get_branches(paths)
+    repo = get_repository()
+    active = utils.get_active_branch(repo.paths)
+    branches = repo.references.branches()
     branches.remove(active)
     return flask.render_template(
         'branch.html',
@@ -57,7 +153,8 @@ def branch_page():
 @app.route('/newbranch', methods=['GET', 'POST'])
 def new_branch():
     new_branch_name = flask.request.form.get('new_name')
-    branch.branch(new_branch_name)
+    with get_status_cache().updating():
+        branch.branch(new_branch_name, get_repository())
     return flask.redirect("../branches")
 
 
@@ -65,18 +162,72 @@ def new_branch():
 def checkout_page():
     branch_name = flask.request.form.get('branch_name')
     try:
-        commit_id = checkout.checkout(branch_name)
+        with get_status_cache().updating():
+            commit_id = checkout.checkout(branch_name, get_repository())
     except errors.StatusNotResolvedError:
         return flask.Response(status=400)
-    paths = utils.get_paths(os.getcwd())
-    commit_path = os.path.join(paths.images, commit_id)
-    files = utils.get_directory_files(commit_path, paths.wit_dir)
+    if commit_id is None:
+        return flask.Response(status=400)
     return flask.render_template(
         'checkout.html',
         branch=branch_name,
-        branch_files=files,
+        commit_id=commit_id,
     )
 
 
+def get_browse_etag(commit_id: str, relative_path: str, page: int, page_size: int) -> str:
+    return hashlib.sha1(f"{commit_id}\0{relative_path}\0{page}\0{page_size}".encode()).hexdigest()
+
+
+@app.route('/browse/<commit_name>/', defaults={'relative_path': objects.ROOT})
+@app.route('/browse/<commit_name>/<path:relative_path>')
+@with_repository_lock(locks.SHARED)
+def browse_page(commit_name, relative_path):
+    repo = get_repository()
+    try:
+        references = repo.references
+    except errors.ReferenceFileError:
+        return flask.Response(status=500)
+    commit_id = checkout.get_commit_ids(repo.paths, commit_name, references)
+    if commit_id is None or not os.path.isfile(objects.get_commit_meta_data_path(repo.paths, commit_id)):
+        return flask.Response(status=404)
+    page, page_size = get_page_arguments()
+    etag = get_browse_etag(commit_id, relative_path, page, page_size)
+    if etag in flask.request.if_none_match:
+        response = flask.Response(status=304)
+    else:
+        tree_id = objects.get_commit_tree(repo.paths, commit_id)
+        entry = objects.get_tree_entry(repo.paths, tree_id, relative_path)
+        if entry is None:
+            return flask.Response(status=404)
+        kind, object_id, _ = entry
+        if kind == objects.BLOB:
+            blocks = objects.iter_object_blocks(repo.paths, object_id)
+            first_block = next(blocks, b'')
+            mimetype = 'application/octet-stream' if b'\0' in first_block else 'text/plain'
+            response = flask.Response(itertools.chain([first_block], blocks), mimetype=mimetype)
+        else:
+            entries = objects.list_directory(repo.paths, tree_id, relative_path)
+            listing = status_cache.get_page(tuple(entries), page, page_size)
+            response = flask.make_response(
+                flask.render_template(
+                    'browse.html',
+                    commit_name=commit_name,
+                    commit_id=commit_id,
+                    relative_path='' if relative_path == objects.ROOT else relative_path.strip('/'),
+                    listing=listing,
+                    tree_kind=objects.TREE,
+                )
+            )
+    response.set_etag(etag)
+    if commit_name == commit_id:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
 if __name__ == '__main__':
-    app.run(host='localhost', port=5000)
\ No newline at end of file
+    wit.configure_logging()
+    app.run(host='localhost', port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,139 @@
+import argparse
+import heapq
+import itertools
+import logging
+import os
+import time
+from typing import Iterator
+
+import bloom
+import checkout
+import commit_graph
+import errors
+import objects
+import refs
+import repository
+import utils
+
+
+log = logging.getLogger(__name__)
+
+
+DATE_FORMAT = "%a %b %d %H:%M:%S %Y"
+
+
+def iter_history(
+    graph: commit_graph.CommitGraph, commit_id: str
+) -> Iterator[commit_graph.CommitRecord]:
+    start_position = graph.find_position(commit_id)
+    if start_position is None:
+        return
+    start = graph.record(start_position)
+    pending = [(-start.timestamp, -start.position, start)]
+    queued = {start.position}
+    while pending:
+        _, _, record = heapq.heappop(pending)
+        yield record
+        for parent_position in record.parents:
+            if parent_position not in queued:
+                queued.add(parent_position)
+                parent = graph.record(parent_position)
+                heapq.heappush(pending, (-parent.timestamp, -parent.position, parent))
+
+
+def touches_path(
+    paths: utils.Paths,
+    graph: commit_graph.CommitGraph,
+    record: commit_graph.CommitRecord,
+    relative_path: str,
+) -> bool:
+    if not bloom.might_contain(graph.bloom_filter(record.position), relative_path):
+        return False
+    entry = objects.get_tree_entry(paths, record.tree_id, relative_path)
+    parent_entries = [
+        objects.get_tree_entry(paths, graph.record(parent_position).tree_id, relative_path)
+        for parent_position in record.parents
+    ]
+    if not parent_entries:
+        return entry is not None
+    return all(parent_entry != entry for parent_entry in parent_entries)
+
+
+def filter_history(
+    paths: utils.Paths,
+    graph: commit_graph.CommitGraph,
+    records: Iterator[commit_graph.CommitRecord],
+    relative_paths: list[str],
+) -> Iterator[commit_graph.CommitRecord]:
+    for record in records:
+        if any(touches_path(paths, graph, record, relative_path) for relative_path in relative_paths):
+            yield record
+
+
+def get_relative_path(paths: utils.Paths, path: str) -> str:
+    return os.path.relpath(os.path.abspath(path), paths.wit_dir)
+
+
+def log_message(graph: commit_graph.CommitGraph, record: commit_graph.CommitRecord) -> str:
+    return (
+        f"commit {record.commit_id}\n"
+        f"Date:   {time.strftime(DATE_FORMAT, time.localtime(record.timestamp))}\n"
+        f"\n"
+        f"    {graph.message(record)}\n"
+    )
+
+
+def history(
+    commit_name: str | None = None,
+    max_count: int | None = None,
+    file_paths: list[str] | None = None,
+    repo: repository.Repository | None = None,
+) -> list[str] | None:
+    try:
+        repo = repository.open_repository(repo)
+    except errors.WitDirectoryNotFoundError:
+        log.error(
+            "Unable to find a wit repository in any of the parent folders of the current working directory"
+        )
+        return
+    paths = repo.paths
+    if commit_name is None:
+        try:
+            commit_id = repo.references.get(refs.HEAD)
+        except (errors.ReferenceFileError, errors.MissingBranchError):
+            log.critical("Corrupted references file")
+            return
+        if commit_id is None:
+            return []
+    else:
+        commit_id = checkout.get_commit_ids(paths, commit_name, repo.references)
+        if commit_id is None:
+            return
+    try:
+        graph = commit_graph.load_commit_graph(paths, [commit_id])
+    except (OSError, ValueError):
+        log.exception("Unable to read the commit graph")
+        return
+    try:
+        records = iter_history(graph, commit_id)
+        if file_paths:
+            relative_paths = [get_relative_path(paths, file_path) for file_path in file_paths]
+            records = filter_history(paths, graph, records, relative_paths)
+        return [log_message(graph, record) for record in itertools.islice(records, max_count)]
+    finally:
+        graph.close()
+
+
+def run_log(*options: str, repo: repository.Repository | None = None) -> None:
+    file_paths = []
+    if '--' in options:
+        separator = options.index('--')
+        options, file_paths = options[:separator], list(options[separator + 1:])
+    parser = argparse.ArgumentParser(prog='wit log')
+    parser.add_argument('commit', nargs='?', help="branch name or commit id to list the history of")
+    parser.add_argument('--max-count', '-n', type=int, help="number of commits to list")
+    arguments = parser.parse_args(options)
+    entries = history(arguments.commit, arguments.max_count, file_paths, repo)
+    if entries is None:
+        return
+    print('\n'.join(entries), end='')
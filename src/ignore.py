@@ -0,0 +1,81 @@
+import fnmatch
+import logging
+import os
+import re
+
+import utils
+
+
+log = logging.getLogger(__name__)
+
+
+IGNORE_FILE_NAME = '.witignore'
+NEVER_MATCHES = re.compile(r'(?!)')
+
+
+class IgnoreMatcher:
+    def __init__(self, patterns: list[str]):
+        name_patterns = []
+        path_patterns = []
+        directory_name_patterns = []
+        directory_path_patterns = []
+        for pattern in patterns:
+            directory_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            anchored = '/' in pattern
+            pattern = pattern.lstrip('/')
+            if not pattern:
+                continue
+            if directory_only:
+                (directory_path_patterns if anchored else directory_name_patterns).append(pattern)
+            else:
+                (path_patterns if anchored else name_patterns).append(pattern)
+        self.name_pattern = _compile(name_patterns)
+        self.path_pattern = _compile(path_patterns)
+        self.directory_name_pattern = _compile(directory_name_patterns)
+        self.directory_path_pattern = _compile(directory_path_patterns)
+
+    def is_ignored(self, relative_path: str, is_directory: bool = False) -> bool:
+        relative_path = relative_path.replace(os.sep, '/')
+        name = relative_path.rpartition('/')[2]
+        if self.name_pattern.match(name) or self.path_pattern.match(relative_path):
+            return True
+        if is_directory:
+            return bool(
+                self.directory_name_pattern.match(name)
+                or self.directory_path_pattern.match(relative_path)
+            )
+        return False
+
+    def is_ignored_path(self, relative_path: str, is_directory: bool = False) -> bool:
+        if self.is_ignored(relative_path, is_directory):
+            return True
+        parent = os.path.dirname(relative_path)
+        while parent:
+            if self.is_ignored(parent, True):
+                return True
+            parent = os.path.dirname(parent)
+        return False
+
+
+def _compile(patterns: list[str]) -> re.Pattern:
+    if not patterns:
+        return NEVER_MATCHES
+    return re.compile('|'.join(f"(?:{fnmatch.translate(pattern)})" for pattern in patterns))
+
+
+def read_patterns(ignore_file_path: str) -> list[str]:
+    patterns = []
+    if not os.path.isfile(ignore_file_path):
+        return patterns
+    with open(ignore_file_path, 'r') as ignore_file:
+        for line in ignore_file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                patterns.append(line)
+    return patterns
+
+
+def load_matcher(paths: utils.Paths) -> IgnoreMatcher:
+    log.info("Compiling the .witignore patterns")
+    return IgnoreMatcher(read_patterns(os.path.join(paths.wit_dir, IGNORE_FILE_NAME)))
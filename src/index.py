@@ -0,0 +1,119 @@
+import logging
+import os
+import struct
+import tempfile
+from typing import NamedTuple
+
+import objects
+import utils
+
+
+log = logging.getLogger(__name__)
+
+
+INDEX_NAME = 'index'
+SIGNATURE = b'WITX'
+VERSION = 2
+HEADER = struct.Struct('>4sII')
+ENTRY = struct.Struct('>QqQ20sIH')
+
+
+class IndexEntry(NamedTuple):
+    size: int
+    mtime_ns: int
+    inode: int
+    object_id: str
+    mode: int = objects.FILE_MODE
+
+
+def get_index_path(paths: utils.Paths) -> str:
+    return os.path.join(paths.wit, INDEX_NAME)
+
+
+def create_entry(stat_result: os.stat_result, object_id: str, mode: int | None = None) -> IndexEntry:
+    return IndexEntry(
+        size=stat_result.st_size,
+        mtime_ns=stat_result.st_mtime_ns,
+        inode=stat_result.st_ino,
+        object_id=object_id,
+        mode=objects.get_file_mode(stat_result.st_mode) if mode is None else mode,
+    )
+
+
+def create_unknown_entry(object_id: str, mode: int = objects.FILE_MODE) -> IndexEntry:
+    return IndexEntry(size=0, mtime_ns=0, inode=0, object_id=object_id, mode=mode)
+
+
+def is_unchanged(entry: IndexEntry, stat_result: os.stat_result, index_mtime_ns: int) -> bool:
+    if entry.mtime_ns >= index_mtime_ns:
+        return False
+    return (
+        entry.size == stat_result.st_size
+        and entry.mtime_ns == stat_result.st_mtime_ns
+        and entry.inode == stat_result.st_ino
+    )
+
+
+def get_index_mtime_ns(paths: utils.Paths) -> int:
+    try:
+        return os.stat(get_index_path(paths)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def rebuild_index(paths: utils.Paths) -> dict[str, IndexEntry]:
+    log.info("No index found, rebuilding it from the staging area")
+    entries = {}
+    for path, folders, files in os.walk(paths.staging):
+        for file in files:
+            file_path = os.path.join(path, file)
+            relative_path = os.path.relpath(file_path, paths.staging)
+            entries[relative_path] = create_unknown_entry(
+                objects.hash_file(file_path), objects.get_file_mode(os.stat(file_path).st_mode)
+            )
+    return entries
+
+
+def read_index(paths: utils.Paths) -> dict[str, IndexEntry]:
+    log.info("Reading the staging area index")
+    index_path = get_index_path(paths)
+    if not os.path.isfile(index_path):
+        return rebuild_index(paths)
+    with open(index_path, 'rb') as index_file:
+        data = index_file.read()
+    signature, version, entry_count = HEADER.unpack_from(data, 0)
+    if signature != SIGNATURE or version != VERSION:
+        log.warning("Unrecognized index format, rebuilding it from the staging area")
+        return rebuild_index(paths)
+    entries = {}
+    offset = HEADER.size
+    for _ in range(entry_count):
+        size, mtime_ns, inode, object_id, mode, path_length = ENTRY.unpack_from(data, offset)
+        offset += ENTRY.size
+        relative_path = data[offset:offset + path_length].decode()
+        offset += path_length
+        entries[relative_path] = IndexEntry(size, mtime_ns, inode, object_id.hex(), mode)
+    return entries
+
+
+def write_index(paths: utils.Paths, entries: dict[str, IndexEntry]) -> None:
+    log.info("Writing the staging area index")
+    index_path = get_index_path(paths)
+    temp_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(index_path), prefix='index_')
+    with os.fdopen(temp_descriptor, 'wb') as index_file:
+        index_file.write(HEADER.pack(SIGNATURE, VERSION, len(entries)))
+        for relative_path in sorted(entries):
+            entry = entries[relative_path]
+            encoded_path = relative_path.encode()
+            index_file.write(
+                ENTRY.pack(
+                    entry.size,
+                    entry.mtime_ns,
+                    entry.inode,
+                    bytes.fromhex(entry.object_id),
+                    entry.mode,
+                    len(encoded_path),
+                )
+            )
+            index_file.write(encoded_path)
+    os.replace(temp_path, index_path)
@@ -0,0 +1,180 @@
+import contextlib
+import logging
+import os
+import threading
+import time
+from typing import Iterator
+
+import errors
+import utils
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+log = logging.getLogger(__name__)
+
+
+LOCK_FILE_NAME = 'lock'
+LOCK_TIMEOUT = 10.0
+LOCK_POLL_INTERVAL = 0.01
+SHARED = 'shared'
+EXCLUSIVE = 'exclusive'
+
+
+class ReadWriteLock:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    def acquire_read(self, timeout: float) -> bool:
+        with self.condition:
+            if not self.condition.wait_for(
+                lambda: not self.writer and not self.waiting_writers, timeout
+            ):
+                return False
+            self.readers += 1
+            return True
+
+    def release_read(self) -> None:
+        with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    def acquire_write(self, timeout: float) -> bool:
+        with self.condition:
+            self.waiting_writers += 1
+            try:
+                acquired = self.condition.wait_for(lambda: not self.writer and not self.readers, timeout)
+            finally:
+                self.waiting_writers -= 1
+            if acquired:
+                self.writer = True
+            else:
+                self.condition.notify_all()
+            return acquired
+
+    def release_write(self) -> None:
+        with self.condition:
+            self.writer = False
+            self.condition.notify_all()
+
+
+def _lock_file(lock_path: str, mode: str, deadline: float) -> int | None:
+    if fcntl is None:
+        return None
+    lock_descriptor = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    operation = fcntl.LOCK_SH if mode == SHARED else fcntl.LOCK_EX
+    while True:
+        try:
+            fcntl.flock(lock_descriptor, operation | fcntl.LOCK_NB)
+            return lock_descriptor
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                os.close(lock_descriptor)
+                raise errors.RepositoryLockError(lock_path, mode) from None
+            time.sleep(LOCK_POLL_INTERVAL)
+        except OSError:
+            os.close(lock_descriptor)
+            raise
+
+
+def _unlock_file(lock_descriptor: int | None) -> None:
+    if lock_descriptor is None:
+        return
+    try:
+        fcntl.flock(lock_descriptor, fcntl.LOCK_UN)
+    finally:
+        os.close(lock_descriptor)
+
+
+class LockManager:
+    def __init__(self, wit_path: str, timeout: float = LOCK_TIMEOUT):
+        self.lock_path = os.path.join(wit_path, LOCK_FILE_NAME)
+        self.timeout = timeout
+        self.threads_lock = ReadWriteLock()
+        self.held = threading.local()
+
+    def _held_mode(self) -> str | None:
+        return getattr(self.held, 'mode', None)
+
+    @contextlib.contextmanager
+    def shared(self, timeout: float | None = None) -> Iterator[None]:
+        if self._held_mode() is not None:
+            yield
+            return
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        if not self.threads_lock.acquire_read(max(deadline - time.monotonic(), 0)):
+            raise errors.RepositoryLockError(self.lock_path, SHARED)
+        try:
+            lock_descriptor = _lock_file(self.lock_path, SHARED, deadline)
+            try:
+                self.held.mode = SHARED
+                yield
+            finally:
+                self.held.mode = None
+                _unlock_file(lock_descriptor)
+        finally:
+            self.threads_lock.release_read()
+
+    @contextlib.contextmanager
+    def exclusive(self, timeout: float | None = None) -> Iterator[None]:
+        held_mode = self._held_mode()
+        if held_mode == EXCLUSIVE:
+            yield
+            return
+        if held_mode == SHARED:
+            raise errors.LockUpgradeError(self.lock_path)
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        if not self.threads_lock.acquire_write(max(deadline - time.monotonic(), 0)):
+            raise errors.RepositoryLockError(self.lock_path, EXCLUSIVE)
+        try:
+            lock_descriptor = _lock_file(self.lock_path, EXCLUSIVE, deadline)
+            try:
+                self.held.mode = EXCLUSIVE
+                yield
+            finally:
+                self.held.mode = None
+                _unlock_file(lock_descriptor)
+        finally:
+            self.threads_lock.release_write()
+
+    def acquire(
+        self, mode: str | None, timeout: float | None = None
+    ) -> contextlib.AbstractContextManager:
+        if mode is None:
+            return contextlib.nullcontext()
+        if mode == EXCLUSIVE:
+            return self.exclusive(timeout)
+        return self.shared(timeout)
+
+
+_managers: dict[str, LockManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_lock_manager(wit_path: str) -> LockManager:
+    wit_path = os.path.abspath(wit_path)
+    with _managers_lock:
+        if wit_path not in _managers:
+            _managers[wit_path] = LockManager(wit_path)
+        return _managers[wit_path]
+
+
+@contextlib.contextmanager
+def lock_repository(path: str, mode: str | None) -> Iterator[None]:
+    if mode is None:
+        yield
+        return
+    try:
+        wit_path = utils.get_wit_path(path)
+    except errors.WitDirectoryNotFoundError:
+        yield
+        return
+    with get_lock_manager(wit_path).acquire(mode):
+        yield
@@ -0,0 +1,386 @@
+import argparse
+import difflib
+import logging
+import os
+from typing import NamedTuple
+
+import ancestry
+import checkout
+import commit
+import commit_graph
+import config
+import errors
+import index
+import objects
+import refs
+import repository
+import utils
+
+
+log = logging.getLogger(__name__)
+
+
+OURS_LABEL = 'HEAD'
+CONFLICT_START = '<<<<<<<'
+CONFLICT_SEPARATOR = '======='
+CONFLICT_END = '>>>>>>>'
+
+
+class TreeMerge(NamedTuple):
+    paths: utils.Paths
+    codec: objects.Codec
+    their_label: str
+    conflicts: list[str]
+
+
+def _apply_side_changes(
+    base_lines: list[bytes],
+    side_lines: list[bytes],
+    changes: list[tuple[int, int, int, int]],
+    start: int,
+    end: int,
+) -> list[bytes]:
+    merged = []
+    position = start
+    for base_start, base_end, side_start, side_end in changes:
+        merged.extend(base_lines[position:base_start])
+        merged.extend(side_lines[side_start:side_end])
+        position = base_end
+    merged.extend(base_lines[position:end])
+    return merged
+
+
+def _changed_regions(base_lines: list[bytes], side_lines: list[bytes], side: int) -> list[tuple]:
+    matcher = difflib.SequenceMatcher(None, base_lines, side_lines, autojunk=False)
+    return [
+        (base_start, base_end, side, side_start, side_end)
+        for tag, base_start, base_end, side_start, side_end in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def _ensure_newline(lines: list[bytes]) -> list[bytes]:
+    if lines and not lines[-1].endswith(b'\n'):
+        return lines[:-1] + [lines[-1] + b'\n']
+    return lines
+
+
+def merge_lines(
+    base_lines: list[bytes], our_lines: list[bytes], their_lines: list[bytes], their_label: str
+) -> tuple[list[bytes], bool]:
+    regions = sorted(
+        _changed_regions(base_lines, our_lines, 0) + _changed_regions(base_lines, their_lines, 1)
+    )
+    merged = []
+    clean = True
+    position = 0
+    index = 0
+    while index < len(regions):
+        start, end = regions[index][0], regions[index][1]
+        cluster = [regions[index]]
+        index += 1
+        while index < len(regions) and regions[index][0] <= end:
+            end = max(end, regions[index][1])
+            cluster.append(regions[index])
+            index += 1
+        merged.extend(base_lines[position:start])
+        position = end
+        side_lines = (our_lines, their_lines)
+        versions = [
+            _apply_side_changes(
+                base_lines,
+                side_lines[side],
+                [region[:2] + region[3:] for region in cluster if region[2] == side],
+                start,
+                end,
+            )
+            for side in (0, 1)
+        ]
+        sides = {region[2] for region in cluster}
+        if len(sides) == 1:
+            merged.extend(versions[sides.pop()])
+        elif versions[0] == versions[1]:
+            merged.extend(versions[0])
+        else:
+            clean = False
+            merged.append(f"{CONFLICT_START} {OURS_LABEL}\n".encode())
+            merged.extend(_ensure_newline(versions[0]))
+            merged.append(f"{CONFLICT_SEPARATOR}\n".encode())
+            merged.extend(_ensure_newline(versions[1]))
+            merged.append(f"{CONFLICT_END} {their_label}\n".encode())
+    merged.extend(base_lines[position:])
+    return merged, clean
+
+
+def merge_blobs(
+    tree_merge: TreeMerge, base_id: str | None, our_id: str, their_id: str
+) -> tuple[str, bool]:
+    paths = tree_merge.paths
+    base_data = objects.read_object(paths, base_id) if base_id is not None else b''
+    our_data = objects.read_object(paths, our_id)
+    their_data = objects.read_object(paths, their_id)
+    if any(b'\0' in data for data in (base_data, our_data, their_data)):
+        return our_id, False
+    merged_lines, clean = merge_lines(
+        base_data.splitlines(keepends=True),
+        our_data.splitlines(keepends=True),
+        their_data.splitlines(keepends=True),
+        tree_merge.their_label,
+    )
+    return objects.store_bytes(paths, b''.join(merged_lines), tree_merge.codec), clean
+
+
+def merge_entry(
+    tree_merge: TreeMerge,
+    relative_path: str,
+    base: objects.TreeEntry | None,
+    ours: objects.TreeEntry | None,
+    theirs: objects.TreeEntry | None,
+) -> objects.TreeEntry | None:
+    if ours == theirs or theirs == base:
+        return ours
+    if ours == base:
+        return theirs
+    base_kind, base_id, base_mode = base if base is not None else (None, None, None)
+    if ours is not None and theirs is not None and ours[0] == theirs[0]:
+        if ours[0] == objects.TREE:
+            tree_id = merge_trees(
+                tree_merge,
+                base_id if base_kind == objects.TREE else None,
+                ours[1],
+                theirs[1],
+                relative_path,
+            )
+            if tree_id is None:
+                return None
+            return objects.TreeEntry(objects.TREE, tree_id, objects.TREE_MODE)
+        blob_id, clean = merge_blobs(
+            tree_merge, base_id if base_kind == objects.BLOB else None, ours[1], theirs[1]
+        )
+        if not clean:
+            tree_merge.conflicts.append(relative_path)
+        mode = theirs.mode if ours.mode == base_mode else ours.mode
+        return objects.TreeEntry(objects.BLOB, blob_id, mode)
+    tree_merge.conflicts.append(relative_path)
+    return ours if ours is not None else theirs
+
+
+def merge_trees(
+    tree_merge: TreeMerge,
+    base_tree_id: str | None,
+    our_tree_id: str | None,
+    their_tree_id: str | None,
+    relative_directory: str = objects.ROOT,
+) -> str | None:
+    if our_tree_id == their_tree_id or their_tree_id == base_tree_id:
+        return our_tree_id
+    if our_tree_id == base_tree_id:
+        return their_tree_id
+    log.debug("Merging the diverged directory %s", relative_directory)
+    paths = tree_merge.paths
+    base_entries = objects.read_tree(paths, base_tree_id) if base_tree_id is not None else {}
+    our_entries = objects.read_tree(paths, our_tree_id) if our_tree_id is not None else {}
+    their_entries = objects.read_tree(paths, their_tree_id) if their_tree_id is not None else {}
+    merged_entries = {}
+    for name in sorted(base_entries.keys() | our_entries.keys() | their_entries.keys()):
+        entry = merge_entry(
+            tree_merge,
+            objects.join_relative(relative_directory, name),
+            base_entries.get(name),
+            our_entries.get(name),
+            their_entries.get(name),
+        )
+        if entry is not None:
+            merged_entries[name] = entry
+    if not merged_entries:
+        return None
+    return objects.write_tree(paths, merged_entries, tree_merge.codec)
+
+
+def find_merge_base(paths: utils.Paths, our_commit_id: str, their_commit_id: str) -> str | None:
+    graph = commit_graph.load_commit_graph(paths, [our_commit_id, their_commit_id])
+    try:
+        base_position = ancestry.merge_base(
+            graph, graph.find_position(our_commit_id), graph.find_position(their_commit_id)
+        )
+        return graph.record(base_position).commit_id if base_position is not None else None
+    finally:
+        graph.close()
+
+
+def update_tree(
+    repo: repository.Repository,
+    current_tree_id: str | None,
+    tree_id: str | None,
+    untracked_items: set[str],
+) -> bool:
+    changes = list(objects.diff_trees(repo.paths, current_tree_id, tree_id))
+    overwritten = checkout.get_overwritten_untracked(repo.paths, changes, untracked_items)
+    if overwritten:
+        log.error(
+            f"Untracked working files would be overwritten by merge: {', '.join(overwritten)}. "
+            "Move or add them first."
+        )
+        return False
+    checkout.apply_changes(repo.paths, tree_id, changes, repo)
+    return True
+
+
+def stage_our_versions(
+    repo: repository.Repository, our_tree_id: str | None, conflicts: list[str]
+) -> None:
+    paths = repo.paths
+    staging_method, _ = checkout.get_export_methods(paths, repo.config)
+    staged_entries = repo.read_index()
+    for relative_path in conflicts:
+        entry = objects.get_tree_entry(paths, our_tree_id, relative_path)
+        if entry is not None and entry.kind == objects.TREE:
+            continue
+        log.debug("Keeping the conflicted file %s out of the staging area", relative_path)
+        objects.invalidate_tree_cache(paths, relative_path)
+        staging_path = os.path.join(paths.staging, relative_path)
+        if entry is None:
+            checkout.remove_file(staging_path)
+            staged_entries.pop(relative_path, None)
+            continue
+        checkout.replace_file(paths, entry.object_id, staging_path, staging_method, entry.mode)
+        staged_entries[relative_path] = index.create_unknown_entry(entry.object_id, entry.mode)
+    repo.write_index(staged_entries)
+
+
+def abort_merge(repo: repository.Repository | None = None) -> bool | None:
+    try:
+        repo = repository.open_repository(repo)
+    except errors.WitDirectoryNotFoundError:
+        log.error(
+            "Unable to find a wit repository in any of the parent folders of the current working directory"
+        )
+        return
+    paths = repo.paths
+    their_commit_id = commit.read_merge_head(paths)
+    if their_commit_id is None:
+        log.error("There is no merge in progress to abort")
+        return
+    try:
+        our_commit_id = repo.references.get(refs.HEAD)
+        base_commit_id = find_merge_base(paths, our_commit_id, their_commit_id)
+    except (errors.ReferenceFileError, errors.MissingBranchError):
+        log.critical("Corrupted references file")
+        return
+    except (OSError, ValueError):
+        log.exception("Unable to read the commit graph")
+        return
+    our_tree_id = objects.get_commit_tree(paths, our_commit_id)
+    tree_merge = TreeMerge(
+        paths=paths,
+        codec=config.get_codec(repo.config),
+        their_label=their_commit_id,
+        conflicts=[],
+    )
+    merged_tree_id = merge_trees(
+        tree_merge,
+        objects.get_commit_tree(paths, base_commit_id),
+        our_tree_id,
+        objects.get_commit_tree(paths, their_commit_id),
+    )
+    log.info(f"Aborting the merge of {their_commit_id}")
+    changes = list(objects.diff_trees(paths, merged_tree_id, our_tree_id))
+    for relative_path in commit.read_merge_conflicts(paths):
+        if not any(change.relative_path == relative_path for change in changes):
+            entry = objects.get_tree_entry(paths, our_tree_id, relative_path)
+            if entry is not None and entry.kind == objects.BLOB:
+                changes.append(
+                    objects.TreeChange(objects.BLOB, relative_path, None, entry.object_id, entry.mode)
+                )
+    checkout.apply_changes(paths, our_tree_id, changes, repo)
+    commit.clear_merge_head(paths)
+    return True
+
+
+def merge(branch_name: str, repo: repository.Repository | None = None) -> str | None:
+    try:
+        repo = repository.open_repository(repo)
+    except errors.WitDirectoryNotFoundError:
+        log.error(
+            "Unable to find a wit repository in any of the parent folders of the current working directory"
+        )
+        return
+    paths = repo.paths
+    try:
+        references = repo.references
+    except errors.ReferenceFileError:
+        log.critical("Corrupted references file")
+        return
+    their_commit_id = checkout.get_commit_ids(paths, branch_name, references)
+    if their_commit_id is None:
+        return
+    try:
+        our_commit_id, untracked_items = checkout.get_checkout_status(paths.wit_dir, repo)
+    except errors.StatusNotResolvedError:
+        log.exception("Unresolved status - cannot perform merge")
+        return
+    if our_commit_id is None:
+        log.error("Unable to merge into a branch without commits")
+        return
+    if commit.read_merge_head(paths) is not None:
+        log.error("A merge is already in progress, commit it or run wit merge --abort first")
+        return
+    try:
+        base_commit_id = find_merge_base(paths, our_commit_id, their_commit_id)
+    except (OSError, ValueError):
+        log.exception("Unable to read the commit graph")
+        return
+    if base_commit_id == their_commit_id:
+        log.info(f"Already up to date with {branch_name}")
+        return our_commit_id
+    our_tree_id = objects.get_commit_tree(paths, our_commit_id)
+    their_tree_id = objects.get_commit_tree(paths, their_commit_id)
+    active_branch = utils.get_active_branch(paths)
+    if base_commit_id == our_commit_id:
+        log.info(f"Fast-forwarding to {branch_name}")
+        if not update_tree(repo, our_tree_id, their_tree_id, untracked_items):
+            return
+        if not references.update(their_commit_id, active_branch):
+            log.critical("Unable to update references.txt after performing merge")
+            return
+        return their_commit_id
+    tree_merge = TreeMerge(
+        paths=paths,
+        codec=config.get_codec(repo.config),
+        their_label=branch_name,
+        conflicts=[],
+    )
+    try:
+        merged_tree_id = merge_trees(
+            tree_merge, objects.get_commit_tree(paths, base_commit_id), our_tree_id, their_tree_id
+        )
+    except OSError:
+        log.exception("Merging the trees failed")
+        return
+    if not update_tree(repo, our_tree_id, merged_tree_id, untracked_items):
+        return
+    commit.write_merge_head(paths, their_commit_id)
+    if tree_merge.conflicts:
+        stage_our_versions(repo, our_tree_id, tree_merge.conflicts)
+        commit.write_merge_conflicts(paths, tree_merge.conflicts)
+        log.error(
+            f"Merge conflicts in {', '.join(tree_merge.conflicts)}. "
+            "Resolve them, add the files and commit the result, or run wit merge --abort."
+        )
+        return
+    target = f"branch '{branch_name}'" if branch_name in references else branch_name
+    destination = active_branch if active_branch != refs.DETACHED else refs.HEAD
+    return commit.commit(f"Merge {target} into {destination}", repo)
+
+
+def run_merge(*options: str, repo: repository.Repository | None = None) -> None:
+    parser = argparse.ArgumentParser(prog='wit merge')
+    parser.add_argument('branch', nargs='?', help="branch or commit to merge into the active branch")
+    parser.add_argument('--abort', action='store_true', help="abandon a conflicted merge")
+    arguments = parser.parse_args(options)
+    if arguments.abort:
+        abort_merge(repo)
+        return
+    if arguments.branch is None:
+        parser.error("a branch to merge is required")
+    merge(arguments.branch, repo)
@@ -0,0 +1,515 @@
+import hashlib
+import logging
+import lzma
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Iterable, Iterator, NamedTuple
+import zlib
+
+import pack
+import tracing
+import utils
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+log = logging.getLogger(__name__)
+
+
+BLOCK_SIZE = 64 * 1024
+FANOUT_LENGTH = 2
+BLOB = 'blob'
+TREE = 'tree'
+ROOT = '.'
+TREE_CACHE_NAME = 'tree_cache'
+READ_ONLY_MODE = 0o444
+FICLONE = 0x40049409
+EXPORT_COPY = 'copy'
+EXPORT_LINK = 'link'
+EXPORT_CLONE = 'clone'
+CODEC_NONE = 'none'
+CODEC_ZLIB = 'zlib'
+CODEC_LZMA = 'lzma'
+CODEC_SUFFIXES = {CODEC_NONE: '', CODEC_ZLIB: '.zz', CODEC_LZMA: '.xz'}
+DEFAULT_COMPRESSION_LEVEL = 6
+FILE_MODE = 0o100644
+EXECUTABLE_MODE = 0o100755
+TREE_MODE = 0o40000
+
+
+class TreeChange(NamedTuple):
+    kind: str
+    relative_path: str
+    old_id: str | None
+    new_id: str | None
+    new_mode: int = FILE_MODE
+
+
+class TreeEntry(NamedTuple):
+    kind: str
+    object_id: str
+    mode: int = FILE_MODE
+
+
+class Codec(NamedTuple):
+    name: str = CODEC_NONE
+    level: int = DEFAULT_COMPRESSION_LEVEL
+
+
+RAW = Codec()
+
+
+def iter_loose_object_ids(paths: utils.Paths) -> Iterator[tuple[str, str]]:
+    if not os.path.isdir(paths.objects):
+        return
+    for fanout in os.listdir(paths.objects):
+        fanout_path = os.path.join(paths.objects, fanout)
+        if len(fanout) != FANOUT_LENGTH or not os.path.isdir(fanout_path):
+            continue
+        for name in os.listdir(fanout_path):
+            if name.startswith('tmp_'):
+                continue
+            object_id, _, suffix = name.partition('.')
+            yield fanout + object_id, os.path.join(fanout_path, name)
+
+
+def get_object_path(paths: utils.Paths, object_id: str, codec_name: str = CODEC_NONE) -> str:
+    return os.path.join(
+        paths.objects,
+        object_id[:FANOUT_LENGTH],
+        object_id[FANOUT_LENGTH:] + CODEC_SUFFIXES[codec_name],
+    )
+
+
+def find_object_path(paths: utils.Paths, object_id: str) -> tuple[str, str] | None:
+    for codec_name in CODEC_SUFFIXES:
+        object_path = get_object_path(paths, object_id, codec_name)
+        if os.path.isfile(object_path):
+            return object_path, codec_name
+    return None
+
+
+def object_exists(paths: utils.Paths, object_id: str) -> bool:
+    return (
+        find_object_path(paths, object_id) is not None
+        or pack.find_packed_object(paths.objects, object_id) is not None
+    )
+
+
+def hash_file(file_path: str) -> str:
+    file_hash = hashlib.sha1()
+    with open(file_path, 'rb') as source_file:
+        while block := source_file.read(BLOCK_SIZE):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def copy_file_hashed(source_path: str, destination_path: str) -> str:
+    file_hash = hashlib.sha1()
+    with open(source_path, 'rb') as source_file, open(destination_path, 'wb') as destination_file:
+        while block := source_file.read(BLOCK_SIZE):
+            file_hash.update(block)
+            destination_file.write(block)
+    shutil.copymode(source_path, destination_path)
+    return file_hash.hexdigest()
+
+
+def _iter_file_blocks(file_path: str) -> Iterator[bytes]:
+    with open(file_path, 'rb') as source_file:
+        while block := source_file.read(BLOCK_SIZE):
+            yield block
+
+
+def _iter_compressed_blocks(blocks: Iterable[bytes], codec: Codec) -> Iterator[bytes]:
+    if codec.name == CODEC_NONE:
+        yield from blocks
+        return
+    if codec.name == CODEC_ZLIB:
+        compressor = zlib.compressobj(codec.level)
+    else:
+        compressor = lzma.LZMACompressor(preset=codec.level)
+    for block in blocks:
+        yield compressor.compress(block)
+    yield compressor.flush()
+
+
+def _iter_zlib_blocks(object_file: BinaryIO) -> Iterator[bytes]:
+    decompressor = zlib.decompressobj()
+    while block := object_file.read(BLOCK_SIZE):
+        yield decompressor.decompress(block, BLOCK_SIZE)
+        while decompressor.unconsumed_tail:
+            yield decompressor.decompress(decompressor.unconsumed_tail, BLOCK_SIZE)
+    yield decompressor.flush()
+
+
+def _iter_lzma_blocks(object_file: BinaryIO) -> Iterator[bytes]:
+    decompressor = lzma.LZMADecompressor()
+    while not decompressor.eof:
+        block = b''
+        if decompressor.needs_input:
+            block = object_file.read(BLOCK_SIZE)
+            if not block:
+                raise lzma.LZMAError("Compressed object data ended unexpectedly")
+        yield decompressor.decompress(block, BLOCK_SIZE)
+
+
+def iter_object_blocks(paths: utils.Paths, object_id: str) -> Iterator[bytes]:
+    object_location = find_object_path(paths, object_id)
+    if object_location is None:
+        blocks = pack.iter_packed_object_blocks(paths.objects, object_id, BLOCK_SIZE)
+        if blocks is None:
+            raise FileNotFoundError(f"Object {object_id} is not in the object store")
+        yield from blocks
+        return
+    object_path, codec_name = object_location
+    with open(object_path, 'rb') as object_file:
+        if codec_name == CODEC_ZLIB:
+            yield from _iter_zlib_blocks(object_file)
+        elif codec_name == CODEC_LZMA:
+            yield from _iter_lzma_blocks(object_file)
+        else:
+            while block := object_file.read(BLOCK_SIZE):
+                yield block
+
+
+def _write_object(
+    paths: utils.Paths, object_id: str, blocks: Iterable[bytes], codec: Codec
+) -> None:
+    object_path = get_object_path(paths, object_id, codec.name)
+    utils.create_path(os.path.dirname(object_path))
+    temp_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(object_path), prefix='tmp_')
+    try:
+        with os.fdopen(temp_descriptor, 'wb') as temp_file:
+            for block in _iter_compressed_blocks(blocks, codec):
+                temp_file.write(block)
+        os.chmod(temp_path, READ_ONLY_MODE)
+        os.replace(temp_path, object_path)
+    except OSError:
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def store_file(paths: utils.Paths, file_path: str, codec: Codec = RAW) -> str:
+    object_id = hash_file(file_path)
+    if not object_exists(paths, object_id):
+        _write_object(paths, object_id, _iter_file_blocks(file_path), codec)
+    return object_id
+
+
+def store_bytes(paths: utils.Paths, data: bytes, codec: Codec = RAW) -> str:
+    object_id = hashlib.sha1(data).hexdigest()
+    if not object_exists(paths, object_id):
+        _write_object(paths, object_id, [data], codec)
+    return object_id
+
+
+def clone_file(source_path: str, destination_path: str) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(source_path, 'rb') as source_file, open(destination_path, 'wb') as destination_file:
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    except OSError:
+        if os.path.isfile(destination_path):
+            os.remove(destination_path)
+        return False
+    return True
+
+
+def link_file(source_path: str, destination_path: str) -> bool:
+    try:
+        os.link(source_path, destination_path)
+    except OSError:
+        return False
+    return True
+
+
+def get_file_mode(st_mode: int) -> int:
+    return EXECUTABLE_MODE if st_mode & 0o111 else FILE_MODE
+
+
+def set_file_mode(file_path: str, mode: int) -> None:
+    permissions = os.stat(file_path).st_mode & 0o777
+    if mode == EXECUTABLE_MODE:
+        permissions |= (permissions & 0o444) >> 2
+    else:
+        permissions &= ~0o111
+    os.chmod(file_path, permissions)
+
+
+def export_object(
+    paths: utils.Paths,
+    object_id: str,
+    destination_path: str,
+    method: str = EXPORT_COPY,
+    mode: int = FILE_MODE,
+) -> None:
+    utils.create_path(os.path.dirname(destination_path))
+    if os.path.lexists(destination_path):
+        os.remove(destination_path)
+    object_location = find_object_path(paths, object_id)
+    if object_location is not None and object_location[1] == CODEC_NONE:
+        object_path = object_location[0]
+        if (
+            method == EXPORT_LINK
+            and get_file_mode(os.stat(object_path).st_mode) == mode
+            and link_file(object_path, destination_path)
+        ):
+            return
+        if method in (EXPORT_LINK, EXPORT_CLONE) and clone_file(object_path, destination_path):
+            set_file_mode(destination_path, mode)
+            return
+        shutil.copyfile(object_path, destination_path)
+        set_file_mode(destination_path, mode)
+        return
+    with open(destination_path, 'wb') as destination_file:
+        for block in iter_object_blocks(paths, object_id):
+            destination_file.write(block)
+    set_file_mode(destination_path, mode)
+
+
+def object_size_exceeds(paths: utils.Paths, object_id: str, limit: int) -> bool:
+    object_location = find_object_path(paths, object_id)
+    if object_location is not None and object_location[1] == CODEC_NONE:
+        return os.path.getsize(object_location[0]) > limit
+    size = 0
+    for block in iter_object_blocks(paths, object_id):
+        size += len(block)
+        if size > limit:
+            return True
+    return False
+
+
+def read_object(paths: utils.Paths, object_id: str) -> bytes:
+    return b''.join(iter_object_blocks(paths, object_id))
+
+
+def join_relative(relative_directory: str, name: str) -> str:
+    if relative_directory == ROOT:
+        return name
+    return os.path.join(relative_directory, name)
+
+
+def write_tree(
+    paths: utils.Paths, entries: dict[str, tuple[str, str] | TreeEntry], codec: Codec = RAW
+) -> str:
+    tree_lines = []
+    for name, entry in sorted(entries.items()):
+        kind, object_id, mode = TreeEntry(*entry)
+        if kind == TREE:
+            mode = TREE_MODE
+        tree_lines.append(f"{mode:o} {kind} {object_id} {name}\n")
+    return store_bytes(paths, "".join(tree_lines).encode(), codec)
+
+
+def read_tree(paths: utils.Paths, tree_id: str) -> dict[str, TreeEntry]:
+    entries = {}
+    for line in read_object(paths, tree_id).decode().splitlines():
+        if line.startswith((BLOB + ' ', TREE + ' ')):
+            kind, object_id, name = line.split(' ', 2)
+            mode = TREE_MODE if kind == TREE else FILE_MODE
+        else:
+            mode, kind, object_id, name = line.split(' ', 3)
+            mode = int(mode, 8)
+        entries[name] = TreeEntry(kind, object_id, mode)
+    return entries
+
+
+def get_tree_entry(
+    paths: utils.Paths, tree_id: str | None, relative_path: str
+) -> TreeEntry | None:
+    entry = TreeEntry(TREE, tree_id, TREE_MODE) if tree_id is not None else None
+    for name in os.path.normpath(relative_path).split(os.sep):
+        if name == ROOT:
+            continue
+        if entry is None or entry[0] != TREE:
+            return None
+        entry = read_tree(paths, entry[1]).get(name)
+    return entry
+
+
+def list_directory(
+    paths: utils.Paths, tree_id: str | None, relative_path: str = ROOT
+) -> list[tuple[str, str, str]] | None:
+    entry = get_tree_entry(paths, tree_id, relative_path)
+    if entry is None or entry[0] != TREE:
+        return None
+    return sorted(
+        (
+            (name, kind, object_id)
+            for name, (kind, object_id, _) in read_tree(paths, entry[1]).items()
+        ),
+        key=lambda item: (item[1] != TREE, item[0]),
+    )
+
+
+def walk_tree(
+    paths: utils.Paths, tree_id: str, relative_directory: str = ROOT
+) -> Iterator[tuple[str, str, dict[str, TreeEntry]]]:
+    entries = read_tree(paths, tree_id)
+    yield relative_directory, tree_id, entries
+    for name, (kind, object_id, _) in entries.items():
+        if kind == TREE:
+            yield from walk_tree(paths, object_id, join_relative(relative_directory, name))
+
+
+def diff_trees(
+    paths: utils.Paths,
+    old_tree_id: str | None,
+    new_tree_id: str | None,
+    relative_directory: str = ROOT,
+) -> Iterator[TreeChange]:
+    if old_tree_id == new_tree_id:
+        return
+    old_entries = read_tree(paths, old_tree_id) if old_tree_id is not None else {}
+    new_entries = read_tree(paths, new_tree_id) if new_tree_id is not None else {}
+    for name in sorted(old_entries.keys() | new_entries.keys()):
+        old_kind, old_id, old_mode = old_entries.get(name, (None, None, None))
+        new_kind, new_id, new_mode = new_entries.get(name, (None, None, FILE_MODE))
+        if (old_kind, old_id, old_mode) == (new_kind, new_id, new_mode):
+            continue
+        relative_path = join_relative(relative_directory, name)
+        old_blob = (old_id, old_mode) if old_kind == BLOB else (None, None)
+        new_blob = (new_id, new_mode) if new_kind == BLOB else (None, FILE_MODE)
+        if old_blob != new_blob:
+            yield TreeChange(BLOB, relative_path, old_blob[0], new_blob[0], new_blob[1])
+        old_subtree_id = old_id if old_kind == TREE else None
+        new_subtree_id = new_id if new_kind == TREE else None
+        if old_subtree_id != new_subtree_id:
+            yield TreeChange(TREE, relative_path, old_subtree_id, new_subtree_id)
+            yield from diff_trees(paths, old_subtree_id, new_subtree_id, relative_path)
+
+
+def build_tree(
+    paths: utils.Paths,
+    tree_cache: dict[str, str],
+    staged_ids: dict[str, str],
+    relative_directory: str = ROOT,
+    codec: Codec = RAW,
+    staged_modes: dict[str, int] | None = None,
+) -> str | None:
+    if staged_modes is None:
+        staged_modes = {}
+    cached_tree_id = tree_cache.get(relative_directory)
+    if cached_tree_id is not None and object_exists(paths, cached_tree_id):
+        return cached_tree_id
+    log.debug("Building the tree of the staged directory %s", relative_directory)
+    entries = {}
+    with os.scandir(os.path.join(paths.staging, relative_directory)) as directory_entries:
+        for entry in directory_entries:
+            if entry.is_dir(follow_symlinks=False):
+                subtree_id = build_tree(
+                    paths,
+                    tree_cache,
+                    staged_ids,
+                    join_relative(relative_directory, entry.name),
+                    codec,
+                    staged_modes,
+                )
+                if subtree_id is not None:
+                    entries[entry.name] = TreeEntry(TREE, subtree_id, TREE_MODE)
+            elif entry.is_file():
+                relative_path = join_relative(relative_directory, entry.name)
+                staged_id = staged_ids.get(relative_path)
+                if staged_id is None or not object_exists(paths, staged_id):
+                    staged_id = store_file(paths, entry.path, codec)
+                    tracing.count(tracing.FILES_HASHED)
+                mode = staged_modes.get(relative_path)
+                if mode is None:
+                    mode = get_file_mode(entry.stat().st_mode)
+                entries[entry.name] = TreeEntry(BLOB, staged_id, mode)
+    if not entries and relative_directory != ROOT:
+        return None
+    tree_id = write_tree(paths, entries, codec)
+    tree_cache[relative_directory] = tree_id
+    return tree_id
+
+
+def get_tree_files(paths: utils.Paths, tree_id: str | None) -> dict[str, str]:
+    snapshot = {}
+    if tree_id is None:
+        return snapshot
+    for relative_directory, _, entries in walk_tree(paths, tree_id):
+        for name, (kind, object_id, _) in entries.items():
+            if kind == BLOB:
+                snapshot[join_relative(relative_directory, name)] = object_id
+    return snapshot
+
+
+def get_commit_meta_data_path(paths: utils.Paths, commit_id: str) -> str:
+    return os.path.join(paths.images, f"{commit_id}.txt")
+
+
+def read_commit_meta_data(paths: utils.Paths, commit_id: str) -> dict[str, str]:
+    meta_data = {}
+    with open(get_commit_meta_data_path(paths, commit_id), 'r') as commit_file:
+        for line in commit_file:
+            key, _, value = line.rstrip('\n').partition('=')
+            meta_data.setdefault(key, value)
+    return meta_data
+
+
+def get_commit_parents(meta_data: dict[str, str]) -> list[str]:
+    parents = meta_data.get('parent')
+    if parents in (None, '', 'None'):
+        return []
+    return parents.split(',')
+
+
+def get_commit_tree(paths: utils.Paths, commit_id: str | None) -> str | None:
+    if commit_id is None or not os.path.isfile(get_commit_meta_data_path(paths, commit_id)):
+        return None
+    return read_commit_meta_data(paths, commit_id).get('tree')
+
+
+def read_snapshot(paths: utils.Paths, commit_id: str | None) -> dict[str, str]:
+    log.info(f"Reading the snapshot of commit {commit_id}")
+    return get_tree_files(paths, get_commit_tree(paths, commit_id))
+
+
+def read_tree_cache(paths: utils.Paths) -> dict[str, str]:
+    tree_cache = {}
+    tree_cache_path = os.path.join(paths.wit, TREE_CACHE_NAME)
+    if not os.path.isfile(tree_cache_path):
+        return tree_cache
+    with open(tree_cache_path, 'r') as tree_cache_file:
+        for line in tree_cache_file:
+            tree_id, _, relative_directory = line.rstrip('\n').partition(' ')
+            tree_cache[relative_directory] = tree_id
+    return tree_cache
+
+
+def write_tree_cache(paths: utils.Paths, tree_cache: dict[str, str]) -> None:
+    tree_cache_path = os.path.join(paths.wit, TREE_CACHE_NAME)
+    temp_path = f"{tree_cache_path}.tmp"
+    with open(temp_path, 'w') as tree_cache_file:
+        for relative_directory, tree_id in sorted(tree_cache.items()):
+            tree_cache_file.write(f"{tree_id} {relative_directory}\n")
+    os.replace(temp_path, tree_cache_path)
+
+
+def invalidate_tree_cache(paths: utils.Paths, relative_path: str) -> None:
+    log.debug(f"Invalidating the cached trees containing {relative_path}")
+    relative_path = os.path.normpath(relative_path)
+    if relative_path == ROOT:
+        write_tree_cache(paths, {})
+        return
+    tree_cache = read_tree_cache(paths)
+    invalidated = {ROOT}
+    parent = os.path.dirname(relative_path)
+    while parent:
+        invalidated.add(parent)
+        parent = os.path.dirname(parent)
+    invalidated.add(relative_path)
+    tree_cache = {
+        relative_directory: tree_id
+        for relative_directory, tree_id in tree_cache.items()
+        if relative_directory not in invalidated
+        and not relative_directory.startswith(relative_path + os.sep)
+    }
+    write_tree_cache(paths, tree_cache)
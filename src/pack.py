@@ -0,0 +1,281 @@
+import bisect
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from typing import Iterable, Iterator, NamedTuple
+import zlib
+
+
+log = logging.getLogger(__name__)
+
+
+PACK_DIRECTORY_NAME = 'pack'
+PACK_SUFFIX = '.pack'
+INDEX_SUFFIX = '.idx'
+PACK_SIGNATURE = b'WPCK'
+INDEX_SIGNATURE = b'WIDX'
+VERSION = 1
+HEADER = struct.Struct('>4sII')
+INDEX_RECORD = struct.Struct('>20sQ')
+ENTRY_HEADER = struct.Struct('>BQ')
+FULL = 1
+DELTA = 2
+COPY_OPERATION = struct.Struct('>cII')
+INSERT_OPERATION = struct.Struct('>cI')
+COPY = b'C'
+INSERT = b'I'
+DELTA_BLOCK_SIZE = 16
+MIN_COPY_LENGTH = 32
+STREAM_BLOCK_SIZE = 64 * 1024
+
+_open_packs: dict[str, tuple[int, list['PackFile']]] = {}
+
+
+class PackedObject(NamedTuple):
+    object_id: str
+    data: bytes | Iterable[bytes]
+    base_id: str | None = None
+
+
+class _IndexIds:
+    def __init__(self, index_map: mmap.mmap, count: int):
+        self.index_map = index_map
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, position: int) -> bytes:
+        offset = HEADER.size + position * INDEX_RECORD.size
+        return self.index_map[offset:offset + 20]
+
+
+class PackFile:
+    def __init__(self, pack_path: str):
+        self.pack_path = pack_path
+        with open(pack_path, 'rb') as pack_file:
+            self.pack_map = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(pack_path[:-len(PACK_SUFFIX)] + INDEX_SUFFIX, 'rb') as index_file:
+            self.index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        signature, version, count = HEADER.unpack_from(self.index_map, 0)
+        if signature != INDEX_SIGNATURE or version != VERSION:
+            raise ValueError(f"Unrecognized pack index format for {pack_path}")
+        self.ids = _IndexIds(self.index_map, count)
+
+    def find_offset(self, object_id: str) -> int | None:
+        binary_id = bytes.fromhex(object_id)
+        position = bisect.bisect_left(self.ids, binary_id)
+        if position == len(self.ids) or self.ids[position] != binary_id:
+            return None
+        _, offset = INDEX_RECORD.unpack_from(self.index_map, HEADER.size + position * INDEX_RECORD.size)
+        return offset
+
+    def read_entry_header(self, offset: int) -> tuple[int, str | None, int, int]:
+        entry_type, payload_length = ENTRY_HEADER.unpack_from(self.pack_map, offset)
+        offset += ENTRY_HEADER.size
+        base_id = None
+        if entry_type == DELTA:
+            base_id = self.pack_map[offset:offset + 20].hex()
+            offset += 20
+        return entry_type, base_id, offset, payload_length
+
+    def iter_payload_blocks(
+        self, payload_offset: int, payload_length: int, block_size: int = STREAM_BLOCK_SIZE
+    ) -> Iterator[bytes]:
+        decompressor = zlib.decompressobj()
+        end = payload_offset + payload_length
+        for offset in range(payload_offset, end, block_size):
+            pending = self.pack_map[offset:min(offset + block_size, end)]
+            while pending:
+                block = decompressor.decompress(pending, block_size)
+                if block:
+                    yield block
+                pending = decompressor.unconsumed_tail
+        block = decompressor.flush()
+        if block:
+            yield block
+        if not decompressor.eof:
+            raise ValueError(f"Compressed pack entry in {self.pack_path} ended unexpectedly")
+
+    def read_entry(self, offset: int) -> tuple[int, str | None, bytes]:
+        entry_type, base_id, payload_offset, payload_length = self.read_entry_header(offset)
+        return entry_type, base_id, b''.join(self.iter_payload_blocks(payload_offset, payload_length))
+
+    def object_ids(self) -> list[str]:
+        return [self.ids[position].hex() for position in range(len(self.ids))]
+
+
+def get_pack_directory(objects_path: str) -> str:
+    return os.path.join(objects_path, PACK_DIRECTORY_NAME)
+
+
+def get_packs(objects_path: str) -> list[PackFile]:
+    pack_directory = get_pack_directory(objects_path)
+    try:
+        directory_mtime_ns = os.stat(pack_directory).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    cached = _open_packs.get(pack_directory)
+    if cached is not None and cached[0] == directory_mtime_ns:
+        return cached[1]
+    packs = []
+    for name in sorted(os.listdir(pack_directory)):
+        index_name = name[:-len(PACK_SUFFIX)] + INDEX_SUFFIX
+        if name.endswith(PACK_SUFFIX) and os.path.isfile(os.path.join(pack_directory, index_name)):
+            packs.append(PackFile(os.path.join(pack_directory, name)))
+    _open_packs[pack_directory] = (directory_mtime_ns, packs)
+    return packs
+
+
+def find_packed_object(objects_path: str, object_id: str) -> tuple[PackFile, int] | None:
+    for pack_file in get_packs(objects_path):
+        offset = pack_file.find_offset(object_id)
+        if offset is not None:
+            return pack_file, offset
+    return None
+
+
+def read_packed_object(objects_path: str, object_id: str) -> bytes | None:
+    location = find_packed_object(objects_path, object_id)
+    if location is None:
+        return None
+    pack_file, offset = location
+    entry_type, base_id, payload = pack_file.read_entry(offset)
+    if entry_type == FULL:
+        return payload
+    base = read_packed_object(objects_path, base_id)
+    if base is None:
+        raise ValueError(f"The delta base {base_id} of object {object_id} is missing")
+    return apply_delta(base, payload)
+
+
+def iter_packed_object_blocks(
+    objects_path: str, object_id: str, block_size: int = STREAM_BLOCK_SIZE
+) -> Iterator[bytes] | None:
+    location = find_packed_object(objects_path, object_id)
+    if location is None:
+        return None
+    pack_file, offset = location
+    entry_type, _, payload_offset, payload_length = pack_file.read_entry_header(offset)
+    if entry_type == FULL:
+        return pack_file.iter_payload_blocks(payload_offset, payload_length, block_size)
+    data = read_packed_object(objects_path, object_id)
+    return (data[start:start + block_size] for start in range(0, len(data), block_size))
+
+
+def create_delta(base: bytes, target: bytes) -> bytes:
+    block_offsets = {}
+    for offset in range(0, len(base) - DELTA_BLOCK_SIZE + 1, DELTA_BLOCK_SIZE):
+        block_offsets.setdefault(base[offset:offset + DELTA_BLOCK_SIZE], offset)
+    operations = []
+    insert_start = 0
+    position = 0
+    while position <= len(target) - DELTA_BLOCK_SIZE:
+        base_offset = block_offsets.get(target[position:position + DELTA_BLOCK_SIZE])
+        if base_offset is None:
+            position += 1
+            continue
+        length = DELTA_BLOCK_SIZE
+        while (
+            position + length < len(target)
+            and base_offset + length < len(base)
+            and target[position + length] == base[base_offset + length]
+        ):
+            length += 1
+        while (
+            position > insert_start
+            and base_offset > 0
+            and target[position - 1] == base[base_offset - 1]
+        ):
+            position -= 1
+            base_offset -= 1
+            length += 1
+        if length < MIN_COPY_LENGTH:
+            position += 1
+            continue
+        if position > insert_start:
+            operations.append(INSERT_OPERATION.pack(INSERT, position - insert_start))
+            operations.append(target[insert_start:position])
+        operations.append(COPY_OPERATION.pack(COPY, base_offset, length))
+        position += length
+        insert_start = position
+    if insert_start < len(target):
+        operations.append(INSERT_OPERATION.pack(INSERT, len(target) - insert_start))
+        operations.append(target[insert_start:])
+    return b''.join(operations)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    result = []
+    offset = 0
+    while offset < len(delta):
+        operation = delta[offset:offset + 1]
+        if operation == COPY:
+            _, base_offset, length = COPY_OPERATION.unpack_from(delta, offset)
+            offset += COPY_OPERATION.size
+            result.append(base[base_offset:base_offset + length])
+        elif operation == INSERT:
+            _, length = INSERT_OPERATION.unpack_from(delta, offset)
+            offset += INSERT_OPERATION.size
+            result.append(delta[offset:offset + length])
+            offset += length
+        else:
+            raise ValueError("Corrupted delta data")
+    return b''.join(result)
+
+
+def write_pack(objects_path: str, packed_objects: Iterable[PackedObject]) -> str:
+    log.info("Writing a new pack file")
+    pack_directory = get_pack_directory(objects_path)
+    os.makedirs(pack_directory, exist_ok=True)
+    pack_hash = hashlib.sha1()
+    offsets = {}
+    temp_descriptor, temp_pack_path = tempfile.mkstemp(dir=pack_directory, prefix='tmp_')
+    with os.fdopen(temp_descriptor, 'wb') as pack_file:
+        pack_file.write(HEADER.pack(PACK_SIGNATURE, VERSION, 0))
+        offset = HEADER.size
+        for packed_object in packed_objects:
+            entry_type = FULL if packed_object.base_id is None else DELTA
+            base = bytes.fromhex(packed_object.base_id) if packed_object.base_id is not None else b''
+            pack_file.write(ENTRY_HEADER.pack(entry_type, 0) + base)
+            pack_hash.update(bytes.fromhex(packed_object.object_id) + base)
+            blocks = [packed_object.data] if isinstance(packed_object.data, bytes) else packed_object.data
+            compressor = zlib.compressobj()
+            payload_length = 0
+            for block in blocks:
+                compressed = compressor.compress(block)
+                pack_file.write(compressed)
+                pack_hash.update(compressed)
+                payload_length += len(compressed)
+            compressed = compressor.flush()
+            pack_file.write(compressed)
+            pack_hash.update(compressed)
+            payload_length += len(compressed)
+            pack_file.seek(offset)
+            pack_file.write(ENTRY_HEADER.pack(entry_type, payload_length))
+            pack_file.seek(0, os.SEEK_END)
+            offsets[bytes.fromhex(packed_object.object_id)] = offset
+            offset += ENTRY_HEADER.size + len(base) + payload_length
+        pack_file.seek(0)
+        pack_file.write(HEADER.pack(PACK_SIGNATURE, VERSION, len(offsets)))
+    pack_name = f"pack-{pack_hash.hexdigest()}"
+    pack_path = os.path.join(pack_directory, pack_name + PACK_SUFFIX)
+    os.replace(temp_pack_path, pack_path)
+    temp_descriptor, temp_index_path = tempfile.mkstemp(dir=pack_directory, prefix='tmp_')
+    with os.fdopen(temp_descriptor, 'wb') as index_file:
+        index_file.write(HEADER.pack(INDEX_SIGNATURE, VERSION, len(offsets)))
+        for binary_id in sorted(offsets):
+            index_file.write(INDEX_RECORD.pack(binary_id, offsets[binary_id]))
+    os.replace(temp_index_path, os.path.join(pack_directory, pack_name + INDEX_SUFFIX))
+    log.info(f"Wrote {len(offsets)} objects into {pack_name}")
+    return pack_path
+
+
+def remove_pack(pack_path: str) -> None:
+    pack_directory = os.path.dirname(pack_path)
+    _open_packs.pop(pack_directory, None)
+    os.remove(pack_path[:-len(PACK_SUFFIX)] + INDEX_SUFFIX)
+    os.remove(pack_path)
@@ -0,0 +1,184 @@
+import contextlib
+import logging
+import os
+import time
+from typing import Iterator
+
+import errors
+import tracing
+
+
+log = logging.getLogger(__name__)
+
+
+HEAD = 'HEAD'
+MASTER = 'master'
+DETACHED = 'None'
+LOCK_SUFFIX = '.lock'
+LOCK_TIMEOUT = 10.0
+LOCK_POLL_INTERVAL = 0.005
+
+
+def is_process_alive(pid: int) -> bool:
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RefStore:
+    def __init__(self, references_path: str):
+        self.references_path = references_path
+        self.lock_path = references_path + LOCK_SUFFIX
+        self.references: dict[str, str] = {}
+        self.exists = False
+        self.reload()
+
+    def reload(self) -> None:
+        log.debug("Parsing references.txt")
+        self.references = {}
+        self.exists = os.path.isfile(self.references_path)
+        if not self.exists:
+            return
+        with open(self.references_path, 'r') as references_file:
+            lines = references_file.read().split()
+        if len(lines) < 2:
+            raise errors.ReferenceFileError("The reference file must have at least 2 lines - HEAD and master.")
+        for line in lines:
+            name, separator, commit_id = line.partition('=')
+            if not separator:
+                raise errors.ReferenceFileError(f"The line {line} must be of the format: name=commit_id")
+            self.references[name] = commit_id
+        names = list(self.references)
+        if names[0] != HEAD:
+            raise errors.ReferenceFileError(
+                "The first line of the reference file must be of the format: HEAD=commit_id"
+            )
+        if names[1] != MASTER:
+            raise errors.ReferenceFileError(
+                "The second line of the reference file must be of the format: master=commit_id"
+            )
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.references
+
+    def get(self, name: str = HEAD) -> str | None:
+        if not self.exists:
+            return None
+        try:
+            return self.references[name]
+        except KeyError:
+            raise errors.MissingBranchError(name) from None
+
+    def branches(self) -> list[str] | None:
+        if not self.exists:
+            return None
+        return [name for name in self.references if name != HEAD]
+
+    def _read_lock_holder(self) -> int | None:
+        try:
+            with open(self.lock_path, 'r') as lock_file:
+                return int(lock_file.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _is_stale_lock(self, holder: int | None) -> bool:
+        if holder is not None:
+            return not is_process_alive(holder)
+        try:
+            return time.time() - os.path.getmtime(self.lock_path) > LOCK_TIMEOUT
+        except OSError:
+            return False
+
+    def _break_stale_lock(self) -> bool:
+        holder = self._read_lock_holder()
+        if not self._is_stale_lock(holder) or self._read_lock_holder() != holder:
+            return False
+        log.warning(f"Removing the stale references lock file {self.lock_path} left by process {holder}")
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    @contextlib.contextmanager
+    def lock(self) -> Iterator[None]:
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                lock_descriptor = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if self._break_stale_lock():
+                    continue
+                if time.monotonic() >= deadline:
+                    raise errors.ReferenceLockError(self.lock_path, self._read_lock_holder())
+                time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            try:
+                os.write(lock_descriptor, str(os.getpid()).encode())
+            finally:
+                os.close(lock_descriptor)
+            yield
+        finally:
+            os.remove(self.lock_path)
+
+    def _write(self) -> None:
+        temp_path = f"{self.references_path}.tmp"
+        with open(temp_path, 'w') as references_file:
+            for name, commit_id in self.references.items():
+                references_file.write(f"{name}={commit_id}\n")
+        os.replace(temp_path, self.references_path)
+        self.exists = True
+
+    def update(self, head_commit_id: str, branch_name: str) -> bool:
+        log.info("Updating the references file")
+        try:
+            with tracing.span(tracing.REF_UPDATE), self.lock():
+                self.reload()
+                if not self.exists:
+                    log.debug("No existing references file found, creating new references.txt")
+                    self.references = {HEAD: head_commit_id, MASTER: head_commit_id}
+                    if branch_name.lower() != MASTER:
+                        log.warning(
+                            f"The first commit should be made to the master branch and not {branch_name}"
+                        )
+                        self.references[branch_name] = head_commit_id
+                elif branch_name != DETACHED and branch_name not in self.references:
+                    log.error(
+                        f"Branch {branch_name} not found in references content provided. Unable to update branch info."
+                    )
+                    return False
+                else:
+                    self.references[HEAD] = head_commit_id
+                    if branch_name != DETACHED:
+                        self.references[branch_name] = head_commit_id
+                self._write()
+        except (OSError, errors.WitError):
+            log.exception("Updating failed - unable to update references.txt")
+            return False
+        log.info("Updated references.txt successfully")
+        return True
+
+    def create_branch(self, branch_name: str, commit_id: str) -> bool:
+        log.info(f"Creating the branch {branch_name}")
+        try:
+            with tracing.span(tracing.REF_UPDATE), self.lock():
+                self.reload()
+                if not self.exists:
+                    log.error("No commits yet, unable to create a branch")
+                    return False
+                if branch_name in self.references:
+                    log.error(f"The branch {branch_name} already exists")
+                    return False
+                self.references[branch_name] = commit_id
+                self._write()
+        except (OSError, errors.WitError):
+            log.exception("Creating the branch failed - unable to update references.txt")
+            return False
+        return True
@@ -0,0 +1,125 @@
+import logging
+import os
+
+import errors
+import objects
+import pack
+import utils
+
+
+log = logging.getLogger(__name__)
+
+
+MAX_DELTA_DEPTH = 10
+MAX_DELTA_OBJECT_SIZE = 8 * 1024 * 1024
+
+
+def get_history(paths: utils.Paths) -> list[str]:
+    log.info("Ordering the commits from the newest to the oldest")
+    tips = list(utils.get_references(paths).references.values())
+    commit_ids = [
+        name[:-len('.txt')] for name in os.listdir(paths.images) if name.endswith('.txt')
+    ] if os.path.isdir(paths.images) else []
+    history = []
+    visited = set()
+    pending = list(reversed(tips + sorted(commit_ids)))
+    while pending:
+        commit_id = pending.pop()
+        if commit_id in visited or not os.path.isfile(objects.get_commit_meta_data_path(paths, commit_id)):
+            continue
+        visited.add(commit_id)
+        history.append(commit_id)
+        pending.extend(objects.get_commit_parents(objects.read_commit_meta_data(paths, commit_id)))
+    return history
+
+
+def get_path_versions(paths: utils.Paths, history: list[str]) -> dict[str, list[str]]:
+    log.info("Collecting the versions of every path, newest first")
+    path_versions = {}
+    for commit_id in history:
+        meta_data = objects.read_commit_meta_data(paths, commit_id)
+        parents = objects.get_commit_parents(meta_data)
+        parent_tree_id = objects.get_commit_tree(paths, parents[0] if parents else None)
+        for change in objects.diff_trees(paths, parent_tree_id, meta_data.get('tree')):
+            if change.kind == objects.BLOB and change.new_id is not None:
+                path_versions.setdefault(change.relative_path, []).append(change.new_id)
+    return path_versions
+
+
+def iter_packed_objects(
+    paths: utils.Paths, object_ids: set[str], path_versions: dict[str, list[str]]
+):
+    written = set()
+    depths = {}
+    for versions in path_versions.values():
+        previous_id = None
+        previous_data = None
+        for object_id in versions:
+            if object_id in written or object_id not in object_ids:
+                previous_id, previous_data = None, None
+                if object_id in written and not objects.object_size_exceeds(
+                    paths, object_id, MAX_DELTA_OBJECT_SIZE
+                ):
+                    previous_id = object_id
+                continue
+            if objects.object_size_exceeds(paths, object_id, MAX_DELTA_OBJECT_SIZE):
+                depths[object_id] = 0
+                written.add(object_id)
+                yield pack.PackedObject(object_id, objects.iter_object_blocks(paths, object_id))
+                previous_id, previous_data = None, None
+                continue
+            data = objects.read_object(paths, object_id)
+            if previous_id is not None and previous_data is None:
+                previous_data = objects.read_object(paths, previous_id)
+            base_id = None
+            payload = data
+            if previous_data is not None and depths.get(previous_id, 0) < MAX_DELTA_DEPTH:
+                delta = pack.create_delta(previous_data, data)
+                if len(delta) < len(data) // 2:
+                    base_id = previous_id
+                    payload = delta
+            depths[object_id] = depths[base_id] + 1 if base_id is not None else 0
+            written.add(object_id)
+            yield pack.PackedObject(object_id, payload, base_id)
+            previous_id, previous_data = object_id, data
+    for object_id in sorted(object_ids - written):
+        yield pack.PackedObject(object_id, objects.iter_object_blocks(paths, object_id))
+
+
+def gc() -> bool | None:
+    try:
+        paths = utils.get_paths()
+    except errors.WitDirectoryNotFoundError:
+        log.error(
+            "Unable to find a wit repository in any of the parent folders of the current working directory"
+        )
+        return
+    loose_objects = dict(objects.iter_loose_object_ids(paths))
+    old_packs = pack.get_packs(paths.objects)
+    object_ids = set(loose_objects)
+    for pack_file in old_packs:
+        object_ids.update(pack_file.object_ids())
+    if not object_ids:
+        log.info("No objects to pack")
+        return True
+    try:
+        path_versions = get_path_versions(paths, get_history(paths))
+    except errors.ReferenceFileError:
+        log.critical("Corrupted references file")
+        return
+    try:
+        new_pack_path = pack.write_pack(paths.objects, iter_packed_objects(paths, object_ids, path_versions))
+    except (OSError, ValueError):
+        log.exception("Packing the objects failed, leaving the loose objects in place")
+        return
+    for pack_file in old_packs:
+        if pack_file.pack_path != new_pack_path:
+            pack.remove_pack(pack_file.pack_path)
+    for object_path in loose_objects.values():
+        os.remove(object_path)
+    for fanout in os.listdir(paths.objects):
+        fanout_path = os.path.join(paths.objects, fanout)
+        if fanout != pack.PACK_DIRECTORY_NAME and os.path.isdir(fanout_path) and not os.listdir(fanout_path):
+            os.rmdir(fanout_path)
+    log.info(f"Packed {len(object_ids)} objects and removed {len(loose_objects)} loose objects")
+    return True
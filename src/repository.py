@@ -0,0 +1,88 @@
+import logging
+import os
+from typing import Any, Callable
+
+import config
+import ignore
+import index
+import locks
+import refs
+import utils
+
+
+log = logging.getLogger(__name__)
+
+
+StatKey = tuple[int, int, int] | None
+
+
+def get_stat_key(file_path: str) -> StatKey:
+    try:
+        file_stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+
+class Repository:
+    def __init__(self, path: str | None = None):
+        self.paths = utils.get_paths(path)
+        self._cache: dict[str, tuple[StatKey, Any]] = {}
+
+    def _cached(self, name: str, file_path: str, load: Callable[[], Any]) -> Any:
+        stat_key = get_stat_key(file_path)
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+        log.debug(f"Loading the repository {name}")
+        value = load()
+        self._cache[name] = (stat_key, value)
+        return value
+
+    @property
+    def locks(self) -> locks.LockManager:
+        return locks.get_lock_manager(self.paths.wit)
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+
+    def refresh(self) -> None:
+        self.references
+        self.config
+        self.matcher
+        self._cached('index', index.get_index_path(self.paths), lambda: index.read_index(self.paths))
+
+    @property
+    def references(self) -> refs.RefStore:
+        return self._cached(
+            'references', self.paths.references, lambda: utils.get_references(self.paths)
+        )
+
+    @property
+    def config(self) -> dict[str, str]:
+        return self._cached(
+            'config', config.get_config_path(self.paths), lambda: config.read_config(self.paths)
+        )
+
+    @property
+    def matcher(self) -> ignore.IgnoreMatcher:
+        return self._cached(
+            'matcher',
+            os.path.join(self.paths.wit_dir, ignore.IGNORE_FILE_NAME),
+            lambda: ignore.load_matcher(self.paths),
+        )
+
+    def read_index(self) -> dict[str, index.IndexEntry]:
+        return dict(
+            self._cached('index', index.get_index_path(self.paths), lambda: index.read_index(self.paths))
+        )
+
+    def write_index(self, entries: dict[str, index.IndexEntry]) -> None:
+        index.write_index(self.paths, entries)
+        self._cache['index'] = (get_stat_key(index.get_index_path(self.paths)), dict(entries))
+
+
+def open_repository(repo: Repository | None = None, path: str | None = None) -> Repository:
+    if repo is not None:
+        return repo
+    return Repository(path)
@@ -1,52 +1,86 @@
-import filecmp
+import argparse
+import concurrent.futures
 import logging
 import os
-import pathlib
-from typing import NamedTuple, Set
-
+from typing import NamedTuple
 
 import errors
+import ignore
+import index
+import objects
+import refs
+import repository
+import tracing
 import utils
 
 
 StatusTuple = tuple[str, list[str], list[str], list[str]]
+PENDING_HASHES_PER_JOB = 4
 
 
 log = logging.getLogger(__name__)
-log.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-ch.setFormatter(formatter)
-log.addHandler(ch)
 
 
-class ComparedDirectories(NamedTuple):
-    match: list[str]
-    mismatch: list[str]
-    error: list[str]
-    only_dir1: list[str]
-    only_dir2: list[str]
+class StagedIndex(NamedTuple):
+    entries: dict[str, index.IndexEntry]
+    mtime_ns: int
+    refreshed: set[str]
+    files: dict[str, dict[str, index.IndexEntry]]
+    directories: dict[str, set[str]]
+
 
+class StatusWalk(NamedTuple):
+    paths: utils.Paths
+    staged: StagedIndex
+    tree_cache: dict[str, str]
+    matcher: ignore.IgnoreMatcher
+    changes_to_commit: list[str]
+    changes_not_to_commit: list[str]
+    untracked: list[str]
+    to_hash: list[tuple[str, os.stat_result]]
 
-def status() -> StatusTuple:
+
+def status(jobs: int = 1, repo: repository.Repository | None = None) -> StatusTuple:
     try:
-        base_paths = utils.get_paths()
+        repo = repository.open_repository(repo)
     except errors.WitDirectoryNotFoundError:
         log.error(
             "Unable to find a wit repository in any of the parent folders of the current working directory"
         )
         return
-    current_commit_info = get_current_commit_info(base_paths)
+    base_paths = repo.paths
+    try:
+        references = repo.references
+    except errors.ReferenceFileError:
+        log.critical("Corrupted references file")
+        return
+    current_commit_info = get_current_commit_info(base_paths, references)
     if current_commit_info is None:
         return
-    current_commit_id, current_commit_path = current_commit_info
-    staging_vs_commit = compare_directories(base_paths.staging, current_commit_path, [])
-    original_vs_staging = compare_directories(base_paths.wit_dir, base_paths.staging, [base_paths.wit])
-    changes_to_commit = staging_vs_commit.mismatch + staging_vs_commit.only_dir1
-    changes_not_to_commit = original_vs_staging.mismatch
-    untracked = original_vs_staging.only_dir1
-    return current_commit_id, changes_to_commit, changes_not_to_commit, untracked
+    current_commit_id, current_tree_id = current_commit_info
+    walk = StatusWalk(
+        paths=base_paths,
+        staged=get_staged_index(base_paths, repo.read_index()),
+        tree_cache=objects.read_tree_cache(base_paths),
+        matcher=repo.matcher,
+        changes_to_commit=[],
+        changes_not_to_commit=[],
+        untracked=[],
+        to_hash=[],
+    )
+    with tracing.span(tracing.WALK):
+        walk_directory(walk, objects.ROOT, current_tree_id, False, True)
+    with tracing.span(tracing.COMPARE):
+        compare_hashed_files(walk, jobs)
+    if walk.staged.refreshed:
+        log.debug(f"Refreshing the index stat data of {len(walk.staged.refreshed)} unchanged files")
+        repo.write_index(walk.staged.entries)
+    return (
+        current_commit_id,
+        _relative_to_full_paths(walk.changes_to_commit, base_paths.wit_dir),
+        _relative_to_full_paths(walk.changes_not_to_commit, base_paths.wit_dir),
+        _relative_to_full_paths(walk.untracked, base_paths.wit_dir),
+    )
 
 
 def status_message(
@@ -63,114 +97,182 @@ def status_message(
     )
 
 
-def get_current_commit_info(base_paths: utils.Paths) -> tuple[str, str, str, str] | None:
+def get_current_commit_info(
+    base_paths: utils.Paths, references: refs.RefStore | None = None
+) -> tuple[str, str | None] | None:
     log.info("Getting current HEAD commit info")
     try:
-        current_commit_id = utils.get_reference_id(base_paths)
+        if references is None:
+            references = utils.get_references(base_paths)
+        current_commit_id = references.get(refs.HEAD)
     except (errors.ReferenceFileError, errors.MissingBranchError):
         log.critical("Corrupted references file")
         return None
-    current_commit_path = os.path.join(base_paths.images, current_commit_id)
+    current_tree_id = objects.get_commit_tree(base_paths, current_commit_id)
     log.info("Successfully got current HEAD commit info")
-    return current_commit_id, current_commit_path
-
-
-def compare_directories(
-    dir1: str, dir2: str, ignoredirs: list[str]
-) -> ComparedDirectories:
-    log.info(f"Comparing directories '{dir1}' and '{dir2}'")
-    all_directories = os.walk(dir1)
-    matches = []
-    mismatches = []
-    errors = []
-    only_dir1 = []
-    only_dir2 = []
-    for directory in all_directories:
-        subdir1, subdir2, relative_path = get_subdirs(directory, dir1, dir2)
-        if _should_ignore(subdir1, ignoredirs):
-            continue
-        comparison_results = compare_directory_files(subdir1, subdir2, relative_path)
-        if comparison_results:
-            matches.extend(comparison_results.match)
-            mismatches.extend(comparison_results.mismatch)
-            errors.extend(comparison_results.error)
-            only_dir1.extend(comparison_results.only_dir1)
-            only_dir2.extend(comparison_results.only_dir2)
-    log.info(f"Compared directories '{dir1}' and '{dir2}' successfully")
-    return ComparedDirectories(
-        match=matches, 
-        mismatch=mismatches, 
-        error=errors, 
-        only_dir1=only_dir1, 
-        only_dir2=only_dir2,
+    return current_commit_id, current_tree_id
+
+
+def get_staged_index(
+    base_paths: utils.Paths, entries: dict[str, index.IndexEntry] | None = None
+) -> StagedIndex:
+    log.info("Grouping the staging area index by directory")
+    if entries is None:
+        entries = index.read_index(base_paths)
+    files = {}
+    directories = {}
+    for relative_path, entry in entries.items():
+        relative_directory, name = os.path.split(relative_path)
+        relative_directory = relative_directory or objects.ROOT
+        files.setdefault(relative_directory, {})[name] = entry
+        while relative_directory != objects.ROOT:
+            parent, name = os.path.split(relative_directory)
+            parent = parent or objects.ROOT
+            directories.setdefault(parent, set()).add(name)
+            relative_directory = parent
+    return StagedIndex(
+        entries=entries,
+        mtime_ns=index.get_index_mtime_ns(base_paths),
+        refreshed=set(),
+        files=files,
+        directories=directories,
     )
 
 
-def get_subdirs(
-    dir1_walked: list[str | list[str]], dir1_path: str, dir2_path: str
-) -> tuple[str, str, str]:
-    log.debug(f"Getting full subdirectory paths for {dir1_walked[0]} in {dir1_path} and {dir2_path}")
-    subdir1 = os.path.abspath(dir1_walked[0])
-    relative_path = os.path.relpath(subdir1, dir1_path)
-    subdir2 = os.path.abspath(os.path.join(dir2_path, relative_path))
-    log.debug("Successfully got full subdirectory paths")
-    return subdir1, subdir2, relative_path
+def walk_directory(
+    walk: StatusWalk,
+    relative_directory: str,
+    head_tree_id: str | None,
+    staged_matches_head: bool,
+    working_exists: bool,
+) -> None:
+    staged_files = walk.staged.files.get(relative_directory, {})
+    staged_directories = walk.staged.directories.get(relative_directory, set())
+    if not staged_matches_head and head_tree_id is not None:
+        staged_matches_head = walk.tree_cache.get(relative_directory) == head_tree_id
+    head_entries = {}
+    if not staged_matches_head:
+        if head_tree_id is not None:
+            head_entries = objects.read_tree(walk.paths, head_tree_id)
+        for name, entry in staged_files.items():
+            if head_entries.get(name) != (objects.BLOB, entry.object_id, entry.mode):
+                walk.changes_to_commit.append(objects.join_relative(relative_directory, name))
+    seen_directories = set()
+    if working_exists:
+        working_directory = os.path.normpath(os.path.join(walk.paths.wit_dir, relative_directory))
+        with os.scandir(working_directory) as directory_entries:
+            for directory_entry in directory_entries:
+                name = directory_entry.name
+                relative_path = objects.join_relative(relative_directory, name)
+                if directory_entry.is_dir(follow_symlinks=False):
+                    if directory_entry.path == walk.paths.wit:
+                        continue
+                    if name not in staged_directories and walk.matcher.is_ignored(relative_path, True):
+                        continue
+                    seen_directories.add(name)
+                    walk_directory(
+                        walk,
+                        relative_path,
+                        _get_subtree_id(head_entries, name),
+                        staged_matches_head,
+                        True,
+                    )
+                elif directory_entry.is_file():
+                    staged_entry = staged_files.get(name)
+                    if staged_entry is None and walk.matcher.is_ignored(relative_path):
+                        continue
+                    compare_working_file(walk, relative_path, directory_entry, staged_entry)
+    if staged_matches_head:
+        return
+    for name in staged_directories - seen_directories:
+        walk_directory(
+            walk,
+            objects.join_relative(relative_directory, name),
+            _get_subtree_id(head_entries, name),
+            False,
+            False,
+        )
+
+
+def compare_working_file(
+    walk: StatusWalk,
+    relative_path: str,
+    directory_entry: os.DirEntry,
+    entry: index.IndexEntry | None,
+) -> None:
+    if entry is None:
+        walk.untracked.append(relative_path)
+        return
+    file_stat = directory_entry.stat()
+    if index.is_unchanged(entry, file_stat, walk.staged.mtime_ns):
+        tracing.count(tracing.FILES_SKIPPED)
+        return
+    walk.to_hash.append((relative_path, file_stat))
+
+
+def compare_hashed_files(walk: StatusWalk, jobs: int = 1) -> None:
+    log.debug(f"Hashing {len(walk.to_hash)} working files with changed stat data using {jobs} jobs")
+    if jobs > 1 and len(walk.to_hash) > 1:
+        compare_hashed_files_parallel(walk, jobs)
+        return
+    for relative_path, file_stat in walk.to_hash:
+        try:
+            object_id = objects.hash_file(os.path.join(walk.paths.wit_dir, relative_path))
+        except OSError:
+            log.warning(f"Unable to read {relative_path} while comparing it to the staging area")
+            continue
+        record_hashed_file(walk, relative_path, file_stat, object_id)
+
+
+def compare_hashed_files_parallel(walk: StatusWalk, jobs: int) -> None:
+    pending = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        for relative_path, file_stat in walk.to_hash:
+            if len(pending) >= jobs * PENDING_HASHES_PER_JOB:
+                _collect_hashed_files(walk, pending, concurrent.futures.FIRST_COMPLETED)
+            future = executor.submit(objects.hash_file, os.path.join(walk.paths.wit_dir, relative_path))
+            pending[future] = (relative_path, file_stat)
+        _collect_hashed_files(walk, pending, concurrent.futures.ALL_COMPLETED)
 
 
-def _should_ignore(directory: str, toignore: list[str]):
-    for ignoredir in toignore:
-        if pathlib.Path(ignoredir) in pathlib.Path(directory).parents or directory == ignoredir:
-            return True
-    return False
+def _collect_hashed_files(
+    walk: StatusWalk,
+    pending: dict[concurrent.futures.Future, tuple[str, os.stat_result]],
+    return_when: str,
+) -> None:
+    done, _ = concurrent.futures.wait(pending, return_when=return_when)
+    for future in done:
+        relative_path, file_stat = pending.pop(future)
+        try:
+            object_id = future.result()
+        except OSError:
+            log.warning(f"Unable to read {relative_path} while comparing it to the staging area")
+            continue
+        record_hashed_file(walk, relative_path, file_stat, object_id)
 
 
-def compare_directory_files(
-    dir1: str, dir2: str, relative_path: str
-) -> ComparedDirectories | None:
-    log.debug(f"Comparing files between {dir1} and {dir2}")
-    if not os.path.isdir(dir1):
-        log.warning(f"Parameter dir1, {dir1} is not a directory path")
+def record_hashed_file(
+    walk: StatusWalk, relative_path: str, file_stat: os.stat_result, object_id: str
+) -> None:
+    tracing.count(tracing.FILES_HASHED)
+    tracing.count(tracing.BYTES_MOVED, file_stat.st_size)
+    entry = walk.staged.entries[relative_path]
+    if entry.object_id != object_id:
+        walk.changes_not_to_commit.append(relative_path)
         return
-    dir1_files = get_files_from_directory(dir1)
-    log.debug(f"Got all files from {dir1}")
-    if not os.path.isdir(dir2):
-        log.warning(f"Parameter dir2, {dir2} is not a directory path")
-        dir1_file_paths = _filename_to_path(list(dir1_files), relative_path)
-        return ComparedDirectories(
-        match=[],
-        mismatch=[],
-        error=[],
-        only_dir1=dir1_file_paths,
-        only_dir2=[],
-    )
-    dir2_files = get_files_from_directory(dir2)
-    log.debug(f"Got all files from {dir2}")
-    common = dir1_files & dir2_files
-    comparison_results = list(filecmp.cmpfiles(dir1, dir2, common, shallow=False))
-    comparison_results.append(list(dir1_files - dir2_files))
-    comparison_results.append(list(dir2_files - dir1_files))
-    for i, comparison_type in enumerate(comparison_results):
-        comparison_results[i] = _filename_to_path(comparison_type, relative_path)
-    log.debug("Finished comparing files between {dir1} and {dir2}")
-    return ComparedDirectories(
-        match=comparison_results[0],
-        mismatch=comparison_results[1],
-        error=comparison_results[2],
-        only_dir1=comparison_results[3],
-        only_dir2=comparison_results[4],
-    )
+    walk.staged.entries[relative_path] = index.create_entry(file_stat, object_id, entry.mode)
+    walk.staged.refreshed.add(relative_path)
 
 
-def get_files_from_directory(directory: str) -> Set:
-    log.debug(f"Getting all files in the directory {directory}")
-    return {file for file in os.listdir(directory) if os.path.isfile(os.path.join(directory, file))}
+def _get_subtree_id(head_entries: dict[str, objects.TreeEntry], name: str) -> str | None:
+    kind, object_id, _ = head_entries.get(name, (None, None, None))
+    if kind != objects.TREE:
+        return None
+    return object_id
 
 
-def _filename_to_path(files: list[str], path: str) -> list[str]:
-    log.debug("Getting full paths for files")
-    for i, file in enumerate(files):
-        files[i] = os.path.abspath(os.path.join(path, file))
-    return files
+def _relative_to_full_paths(relative_paths: list[str], wit_dir: str) -> list[str]:
+    return [os.path.join(wit_dir, relative_path) for relative_path in sorted(relative_paths)]
 
 
 def remove_from_staging(relative_file_path: str) -> None:
@@ -188,9 +290,24 @@ def remove_from_staging(relative_file_path: str) -> None:
     except OSError:
         log.exception("Failed to remove file from staging area")
         return
+    staged_entries = index.read_index(paths)
+    staged_entries.pop(os.path.normpath(relative_file_path), None)
+    index.write_index(paths, staged_entries)
+    objects.invalidate_tree_cache(paths, relative_file_path)
     log.info("Successfully removed file from staging area")
 
 
-def run_status() -> None:
-    current_status = status.status()
-    print(status.status_message(*current_status))
\ No newline at end of file
+def parse_jobs(options: tuple[str, ...]) -> int:
+    parser = argparse.ArgumentParser(prog='wit status')
+    parser.add_argument(
+        '--jobs', '-j', type=int, default=1, help="number of threads hashing changed files"
+    )
+    return max(parser.parse_args(options).jobs, 1)
+
+
+def run_status(*options: str, repo: repository.Repository | None = None) -> None:
+    jobs = parse_jobs(options) if options else 1
+    current_status = status(jobs=jobs, repo=repo)
+    if current_status is None:
+        return
+    print(status_message(*current_status))
\ No newline at end of file
@@ -0,0 +1,229 @@
+import collections
+import contextlib
+import logging
+import os
+import threading
+from typing import Iterator, NamedTuple
+
+import errors
+import ignore
+import index
+import locks
+import objects
+import repository
+import status
+
+
+log = logging.getLogger(__name__)
+
+
+POLL_INTERVAL = 1.0
+HISTORY_LENGTH = 32
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+FILE_LISTS = ('to_commit', 'unstaged', 'untracked')
+
+
+class StatusSnapshot(NamedTuple):
+    version: int
+    commit_id: str | None
+    to_commit: tuple[str, ...]
+    unstaged: tuple[str, ...]
+    untracked: tuple[str, ...]
+
+
+class Page(NamedTuple):
+    items: tuple[str, ...]
+    page: int
+    page_size: int
+    total: int
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.total // self.page_size))
+
+
+EMPTY_SNAPSHOT = StatusSnapshot(0, None, (), (), ())
+
+
+def get_delta(old: StatusSnapshot | None, new: StatusSnapshot) -> dict:
+    if old is None:
+        return {
+            'version': new.version,
+            'reset': True,
+            'commit_id': new.commit_id,
+            'added': {name: list(getattr(new, name)) for name in FILE_LISTS},
+            'removed': {name: [] for name in FILE_LISTS},
+        }
+    added = {}
+    removed = {}
+    for name in FILE_LISTS:
+        old_files = set(getattr(old, name))
+        new_files = set(getattr(new, name))
+        added[name] = sorted(new_files - old_files)
+        removed[name] = sorted(old_files - new_files)
+    return {
+        'version': new.version,
+        'reset': False,
+        'commit_id': new.commit_id,
+        'added': added,
+        'removed': removed,
+    }
+
+
+def get_page(files: tuple[str, ...], page: int = 1, page_size: int = DEFAULT_PAGE_SIZE) -> Page:
+    page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+    page = max(page, 1)
+    start = (page - 1) * page_size
+    return Page(files[start:start + page_size], page, page_size, len(files))
+
+
+def get_change_key(repo: repository.Repository) -> tuple:
+    paths = repo.paths
+    keys = [
+        repository.get_stat_key(file_path)
+        for file_path in (
+            index.get_index_path(paths),
+            paths.references,
+            paths.active,
+            os.path.join(paths.wit_dir, ignore.IGNORE_FILE_NAME),
+        )
+    ]
+    matcher = repo.matcher
+    for directory, directory_names, _ in os.walk(paths.wit_dir):
+        relative_directory = os.path.relpath(directory, paths.wit_dir)
+        directory_names[:] = [
+            name for name in directory_names
+            if os.path.join(directory, name) != paths.wit
+            and not matcher.is_ignored(objects.join_relative(relative_directory, name), True)
+        ]
+        keys.append((relative_directory, repository.get_stat_key(directory)))
+    for relative_path in repo.read_index():
+        keys.append(repository.get_stat_key(os.path.join(paths.wit_dir, relative_path)))
+    return tuple(keys)
+
+
+class StatusCache:
+    def __init__(self, repo: repository.Repository, poll_interval: float = POLL_INTERVAL):
+        self.repo = repo
+        self.poll_interval = poll_interval
+        self.mutex = threading.RLock()
+        self.changed = threading.Condition()
+        self.snapshot = EMPTY_SNAPSHOT
+        self.change_key: tuple | None = None
+        self.history: collections.deque[StatusSnapshot] = collections.deque(maxlen=HISTORY_LENGTH)
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.subscribers = 0
+        self.subscribers_lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+
+    @contextlib.contextmanager
+    def subscribe(self) -> Iterator[None]:
+        with self.subscribers_lock:
+            self.subscribers += 1
+            if self.thread is None:
+                self.stopped.clear()
+                self.thread = threading.Thread(target=self._poll, daemon=True)
+                self.thread.start()
+        try:
+            self.refresh_if_changed()
+            yield
+        finally:
+            with self.subscribers_lock:
+                self.subscribers -= 1
+                if not self.subscribers:
+                    self.wakeup.set()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.wakeup.set()
+        thread = self.thread
+        if thread is not None:
+            thread.join()
+
+    def _poll(self) -> None:
+        while True:
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+            with self.subscribers_lock:
+                if self.stopped.is_set() or not self.subscribers:
+                    log.debug("No status subscribers left, stopping the status poller")
+                    self.thread = None
+                    return
+            self.refresh_if_changed()
+
+    @contextlib.contextmanager
+    def _holding_mutex(self) -> Iterator[None]:
+        if not self.mutex.acquire(timeout=self.repo.locks.timeout):
+            raise errors.RepositoryLockError(self.repo.locks.lock_path, locks.SHARED)
+        try:
+            yield
+        finally:
+            self.mutex.release()
+
+    def refresh_if_changed(self) -> StatusSnapshot:
+        try:
+            with self._holding_mutex(), self.repo.locks.shared():
+                change_key = get_change_key(self.repo)
+                if change_key == self.change_key:
+                    return self.snapshot
+        except (OSError, errors.WitError):
+            log.exception("Checking the repository for changes failed")
+            return self.snapshot
+        return self.refresh(change_key)
+
+    def refresh(self, change_key: tuple | None = None) -> StatusSnapshot:
+        try:
+            with self._holding_mutex(), self.repo.locks.shared():
+                if change_key is None:
+                    change_key = get_change_key(self.repo)
+                current_status = status.status(repo=self.repo)
+                if current_status is not None:
+                    self.change_key = change_key
+        except (OSError, errors.WitError):
+            log.exception("Refreshing the cached status failed")
+            return self.snapshot
+        if current_status is None:
+            return self.snapshot
+        commit_id, to_commit, unstaged, untracked = current_status
+        with self.changed:
+            previous = self.snapshot
+            if (commit_id, tuple(to_commit), tuple(unstaged), tuple(untracked)) == previous[1:]:
+                return previous
+            self.snapshot = StatusSnapshot(
+                previous.version + 1, commit_id, tuple(to_commit), tuple(unstaged), tuple(untracked)
+            )
+            self.history.append(self.snapshot)
+            log.debug("Cached status changed to version %d", self.snapshot.version)
+            self.changed.notify_all()
+            return self.snapshot
+
+    @contextlib.contextmanager
+    def updating(self) -> Iterator[None]:
+        try:
+            with self.repo.locks.exclusive():
+                yield
+        finally:
+            if self.subscribers:
+                self.refresh()
+
+    def get_snapshot(self) -> StatusSnapshot:
+        if self.thread is None:
+            return self.refresh_if_changed()
+        return self.snapshot
+
+    def _find_version(self, version: int) -> StatusSnapshot | None:
+        for snapshot in self.history:
+            if snapshot.version == version:
+                return snapshot
+        return None
+
+    def wait_for_delta(self, version: int | None, timeout: float) -> dict | None:
+        with self.changed:
+            self.changed.wait_for(lambda: self.snapshot.version != version, timeout)
+            snapshot = self.snapshot
+            if snapshot.version == version:
+                return None
+            previous = self._find_version(version) if version is not None else None
+        return get_delta(previous, snapshot)
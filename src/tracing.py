@@ -0,0 +1,128 @@
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+from typing import Iterator, NamedTuple
+
+
+log = logging.getLogger(__name__)
+
+
+TRACE_VARIABLE = 'WIT_TRACE'
+PROFILE_OPTION = '--profile'
+STDERR_DESTINATIONS = ('1', '-', 'stderr')
+
+DISCOVERY = 'discovery'
+WALK = 'walk'
+COMPARE = 'compare'
+COPY = 'copy'
+REF_UPDATE = 'ref_update'
+
+FILES_HASHED = 'files_hashed'
+FILES_COPIED = 'files_copied'
+FILES_SKIPPED = 'files_skipped'
+BYTES_MOVED = 'bytes_moved'
+
+
+class Span(NamedTuple):
+    name: str
+    depth: int
+    start_ns: int
+    duration_ns: int
+
+
+class Trace:
+    def __init__(self, command: str):
+        self.command = command
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: int | None = None
+        self.depth = 0
+        self.spans: list[Span] = []
+        self.counters: dict[str, int] = {}
+
+    def to_dict(self) -> dict:
+        end_ns = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        totals: dict[str, float] = {}
+        for span_record in self.spans:
+            totals[span_record.name] = totals.get(span_record.name, 0) + span_record.duration_ns / 1e6
+        return {
+            'command': self.command,
+            'duration_ms': (end_ns - self.start_ns) / 1e6,
+            'spans': [
+                {
+                    'name': span_record.name,
+                    'depth': span_record.depth,
+                    'start_ms': span_record.start_ns / 1e6,
+                    'duration_ms': span_record.duration_ns / 1e6,
+                }
+                for span_record in sorted(self.spans, key=lambda span_record: span_record.start_ns)
+            ],
+            'totals_ms': totals,
+            'counters': dict(self.counters),
+        }
+
+
+_active: Trace | None = None
+
+
+def is_enabled() -> bool:
+    return _active is not None
+
+
+def start(command: str) -> Trace:
+    global _active
+    _active = Trace(command)
+    return _active
+
+
+def stop() -> Trace | None:
+    global _active
+    stopped, _active = _active, None
+    if stopped is not None:
+        stopped.end_ns = time.perf_counter_ns()
+    return stopped
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[None]:
+    active = _active
+    if active is None:
+        yield
+        return
+    start_ns = time.perf_counter_ns()
+    active.depth += 1
+    try:
+        yield
+    finally:
+        active.depth -= 1
+        active.spans.append(
+            Span(name, active.depth, start_ns - active.start_ns, time.perf_counter_ns() - start_ns)
+        )
+
+
+def count(name: str, amount: int = 1) -> None:
+    if _active is not None:
+        _active.counters[name] = _active.counters.get(name, 0) + amount
+
+
+def get_destination(args: list[str]) -> tuple[str | None, list[str]]:
+    destination = os.environ.get(TRACE_VARIABLE) or None
+    if PROFILE_OPTION in args:
+        args = [arg for arg in args if arg != PROFILE_OPTION]
+        if destination is None:
+            destination = STDERR_DESTINATIONS[0]
+    return destination, args
+
+
+def write_trace(trace_data: dict, destination: str) -> None:
+    output = json.dumps(trace_data, indent=2)
+    if destination in STDERR_DESTINATIONS:
+        sys.stderr.write(output + '\n')
+        return
+    try:
+        with open(destination, 'w') as trace_file:
+            trace_file.write(output + '\n')
+    except OSError:
+        log.exception(f"Unable to write the trace to {destination}")
@@ -1,42 +1,169 @@
+import importlib
+import json
 import logging
+import os
+import socket
 import sys
 
-import add
-import branch
-import checkout
-import commit
-import init
-import status
+import errors
+import locks
+import tracing
 
 
 log = logging.getLogger(__name__)
-log.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-ch.setFormatter(formatter)
-log.addHandler(ch)
 
 
 COMMANDS = {
-    'init': (0, init.init),
-    'add': (1, add.add),
-    'commit': (1, commit.commit),
-    'status': (0, status.run_status),
-    'checkout': (1, checkout.checkout),
-    'branch': (1, branch.branch)
-
+    'init': (0, 'init', 'init'),
+    'add': (1, 'add', 'add'),
+    'commit': (1, 'commit', 'commit'),
+    'status': (range(0, 3), 'status', 'run_status'),
+    'checkout': (range(1, 3), 'checkout', 'run_checkout'),
+    'branch': (range(0, 3), 'branch', 'run_branch'),
+    'gc': (0, 'repack', 'gc'),
+    'log': (range(0, 6), 'history', 'run_log'),
+    'diff': (range(0, 3), 'diff', 'run_diff'),
+    'merge': (1, 'merge', 'run_merge'),
+    'daemon': (range(0, 2), 'daemon', 'run_daemon'),
+}
+COMMAND_LOCKS = {
+    'add': locks.EXCLUSIVE,
+    'commit': locks.EXCLUSIVE,
+    'status': locks.SHARED,
+    'checkout': locks.EXCLUSIVE,
+    'branch': locks.EXCLUSIVE,
+    'gc': locks.EXCLUSIVE,
+    'log': locks.SHARED,
+    'diff': locks.SHARED,
+    'merge': locks.EXCLUSIVE,
+}
+LISTING_LOCKS = {
+    'branch': locks.SHARED,
 }
 NUMBER_OF_ARGS = 0
-FUNCTION = 1
+MODULE = 1
+FUNCTION = 2
+LOG_LEVEL_VARIABLE = 'WIT_LOG_LEVEL'
+DEFAULT_LOG_LEVEL = 'WARNING'
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+NO_DAEMON_VARIABLE = 'WIT_NO_DAEMON'
+DAEMON_SOCKET_NAME = 'daemon.sock'
+
+
+def configure_logging(level: str | None = None) -> None:
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_VARIABLE, DEFAULT_LOG_LEVEL)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root_logger = logging.getLogger()
+    root_logger.addHandler(handler)
+    root_logger.setLevel(level.upper())
+
+
+def _accepted_number_of_args(command: str) -> range:
+    number_of_args = COMMANDS[command][NUMBER_OF_ARGS]
+    if isinstance(number_of_args, range):
+        return number_of_args
+    return range(number_of_args, number_of_args + 1)
+
+
+def get_command_function(command: str):
+    _, module_name, function_name = COMMANDS[command]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def get_command_lock(command: str, args: tuple[str, ...]) -> str | None:
+    if command in LISTING_LOCKS and all(arg.startswith('-') for arg in args):
+        return LISTING_LOCKS[command]
+    return COMMAND_LOCKS.get(command)
+
 
+def main(code_path: str, command: str | None = None, *args: str):
+    if command not in COMMANDS:
+        log.error(f"Unknown command {command}, available commands: {', '.join(COMMANDS)}")
+        return
+    accepted_number_of_args = _accepted_number_of_args(command)
+    if len(args) not in accepted_number_of_args:
+        log.error(
+            f"{command} command takes {accepted_number_of_args.start} to {accepted_number_of_args.stop - 1} "
+            f"arguments, {len(args)} were given."
+        )
+        return
+    function = get_command_function(command)
+    try:
+        with tracing.span(command), locks.lock_repository(os.getcwd(), get_command_lock(command, args)):
+            return function(*args)
+    except errors.RepositoryLockError:
+        log.exception(f"Unable to run {command} while another wit process is using the repository")
+
+
+def get_daemon_socket_path(wit_path: str) -> str:
+    return os.path.join(wit_path, DAEMON_SOCKET_NAME)
+
+
+def find_daemon_socket(path: str) -> str | None:
+    while True:
+        wit_path = os.path.join(path, '.wit')
+        if os.path.isdir(wit_path):
+            socket_path = get_daemon_socket_path(wit_path)
+            return socket_path if os.path.exists(socket_path) else None
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
 
-def main(code_path: str, command: str, *args: str):
-    if len(args) != COMMANDS[command][NUMBER_OF_ARGS]:
-        log.error(f"{command} command takes {COMMANDS[command][NUMBER_OF_ARGS]} arguments, {len(args)} were given.")
+
+def send_daemon_request(socket_path: str, request: dict) -> dict | None:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(socket_path)
+            connection.sendall(json.dumps(request).encode() + b'\n')
+            with connection.makefile('rb') as response:
+                return json.loads(response.readline())
+    except (OSError, ValueError):
+        log.debug(f"No wit daemon answered on {socket_path}")
+        return None
+
+
+def forward_to_daemon(socket_path: str, args: list[str], trace: bool = False) -> dict | None:
+    log.debug(f"Forwarding {' '.join(args)} to the wit daemon on {socket_path}")
+    return send_daemon_request(
+        socket_path,
+        {
+            'cwd': os.getcwd(),
+            'args': args,
+            'log_level': logging.getLevelName(logging.getLogger().getEffectiveLevel()),
+            'trace': trace,
+        },
+    )
+
+
+def run() -> None:
+    configure_logging()
+    trace_destination, args = tracing.get_destination(sys.argv[1:])
+    if args and args[0] in COMMANDS and args[0] != 'daemon' and not os.environ.get(NO_DAEMON_VARIABLE):
+        socket_path = find_daemon_socket(os.getcwd())
+        if socket_path is not None:
+            response = forward_to_daemon(socket_path, args, trace_destination is not None)
+            if response is not None:
+                try:
+                    sys.stdout.write(response['stdout'])
+                    sys.stdout.flush()
+                except BrokenPipeError:
+                    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                sys.stderr.write(response['stderr'])
+                if trace_destination is not None and response.get('trace') is not None:
+                    tracing.write_trace(response['trace'], trace_destination)
+                sys.exit(response.get('exit_code', 0))
+    if trace_destination is None:
+        main(sys.argv[0], *args)
         return
-    COMMANDS[command][FUNCTION](*args)
-    
+    tracing.start(' '.join(args))
+    try:
+        main(sys.argv[0], *args)
+    finally:
+        tracing.write_trace(tracing.stop().to_dict(), trace_destination)
+
 
 if __name__ == '__main__':
-    main(*sys.argv)
+    run()
@@ -14,6 +14,15 @@ import src.commit
 TEMPDIR = Path(tempfile.gettempdir())
 
 
+@pytest.fixture
+def clean_test_dir(request):
+    test_dir = TEMPDIR / request.module.__name__.rpartition('.')[2]
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    test_dir.mkdir(parents=True)
+    return test_dir
+
+
 @pytest.fixture
 def init_wit():
     test_dir = TEMPDIR / 'test_dir'
@@ -0,0 +1,51 @@
+import os
+import pytest
+
+from src import add, ancestry, branch, checkout, commit, commit_graph, init, utils
+
+
+def commit_file(directory, name, message):
+    file_path = os.path.join(directory, name)
+    with open(file_path, 'w') as file:
+        file.write(message)
+    add.add(file_path)
+    return commit.commit(message)
+
+
+@pytest.fixture
+def diverged_repository(clean_test_dir):
+    test_dir = clean_test_dir
+    os.chdir(test_dir)
+    init.init()
+    base_id = commit_file(test_dir, 'base.txt', 'base')
+    branch.branch('feature')
+    checkout.checkout('feature')
+    feature_ids = [commit_file(test_dir, f'feature{number}.txt', f'feature {number}') for number in range(2)]
+    checkout.checkout('master')
+    master_id = commit_file(test_dir, 'master.txt', 'master')
+    return base_id, feature_ids, master_id
+
+
+def test_ancestry_queries(diverged_repository):
+    base_id, feature_ids, master_id = diverged_repository
+    graph = commit_graph.read_commit_graph(utils.get_paths())
+    base, first_feature, feature, master = (
+        graph.find_position(commit_id) for commit_id in [base_id, *feature_ids, master_id]
+    )
+
+    assert ancestry.is_ancestor(graph, base, feature)
+    assert ancestry.is_ancestor(graph, first_feature, feature)
+    assert not ancestry.is_ancestor(graph, feature, base)
+    assert not ancestry.is_ancestor(graph, master, feature)
+    assert ancestry.merge_base(graph, feature, master) == base
+    assert ancestry.merge_base(graph, first_feature, feature) == first_feature
+    assert ancestry.ahead_behind(graph, feature, master) == (2, 1)
+    assert ancestry.ahead_behind(graph, master, master) == (0, 0)
+    graph.close()
+
+
+def test_verbose_branches(diverged_repository):
+    lines = branch.list_branches(verbose=True)
+
+    assert any(line.startswith('* master') for line in lines)
+    assert any('feature' in line and '[ahead 2, behind 1]' in line for line in lines)
@@ -0,0 +1,39 @@
+import pytest
+
+from benchmarks import generate
+from benchmarks import run
+
+
+SPEC = generate.RepositorySpec(files=50, file_size=100, depth=2, fanout=3, churn=0.1, history=3)
+
+
+@pytest.fixture
+def benchmark_dir(clean_test_dir):
+    return clean_test_dir
+
+
+def test_generate_repository(benchmark_dir):
+    written = generate.generate_repository(str(benchmark_dir), SPEC)
+    file_paths = [path for path in benchmark_dir.rglob('*') if path.is_file()]
+    changed = generate.apply_churn(str(benchmark_dir), SPEC, 1)
+
+    assert written == SPEC.files * SPEC.file_size
+    assert len(file_paths) == SPEC.files
+    assert len(changed) == 5
+    assert changed == generate.apply_churn(str(benchmark_dir), SPEC, 1)
+
+
+def test_run_scenario(benchmark_dir):
+    report = run.build_report(SPEC, run.run_scenario(str(benchmark_dir), SPEC))
+
+    assert all(result['returncode'] == 0 for result in report['results'])
+    assert report['summary']['status_dirty']['runs'] == SPEC.history - 1
+    assert {'checkout_old', 'checkout_branch'} <= report['summary'].keys()
+    assert run.compare(report, report) == []
+
+
+def test_compare_reports_regressions():
+    baseline = {'summary': {'status': {'runs': 1, 'seconds': 1.0, 'peak_rss_kb': 1000}}}
+    current = {'summary': {'status': {'runs': 1, 'seconds': 1.5, 'peak_rss_kb': 1100}}}
+
+    assert run.compare(current, baseline) == [run.Regression('status', 'seconds', 1.0, 1.5)]
@@ -1,27 +1,18 @@
 import os 
-from pathlib import Path
 import pytest
-import shutil
-import tempfile
 
 import src
 import src.utils
 
 
-TEMPDIR = Path(tempfile.gettempdir())
-
-
 def create_file(filepath, content):
     with open(filepath, 'w') as file:
         file.write(content)
 
 
 @pytest.fixture
-def testable_repository():
-    test_dir = TEMPDIR / 'test_branch'
-    if os.path.isdir(test_dir):
-        shutil.rmtree(test_dir)
-    test_dir.mkdir(parents=True, exist_ok=True)
+def testable_repository(clean_test_dir):
+    test_dir = clean_test_dir
     os.chdir(test_dir)
     cwd = os.getcwd()
     src.init.init()
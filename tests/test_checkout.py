@@ -1,16 +1,13 @@
 import os
-from pathlib import Path
 import pytest
 import shutil
-import tempfile
 
 
 import src
 import src.checkout
+import src.config
 import src.utils
 
-TEMPDIR = Path(tempfile.gettempdir())
-
 
 def create_file(filepath, content):
     with open(filepath, 'w') as file:
@@ -18,11 +15,8 @@ def create_file(filepath, content):
 
 
 @pytest.fixture
-def testable_repository():
-    test_dir = TEMPDIR / 'test_checkout'
-    if os.path.isdir(test_dir):
-        shutil.rmtree(test_dir)
-    test_dir.mkdir(parents=True, exist_ok=True)
+def testable_repository(clean_test_dir):
+    test_dir = clean_test_dir
     os.chdir(test_dir)
     cwd = os.getcwd()
     src.init.init()
@@ -53,3 +47,92 @@ def test_checkout(testable_repository):
 
     assert os.path.isfile(first_file)
     assert not os.path.isfile(second_file)
+
+
+def test_checkout_skips_unchanged_files(testable_repository):
+    test_dir, first_file, second_file = testable_repository
+    first_file_inode = os.stat(first_file).st_ino
+    src.checkout.checkout('master')
+
+    assert os.stat(first_file).st_ino == first_file_inode
+    assert src.status.status()[1:] == ([], [], [])
+
+
+def test_checkout_abbreviated_commit_id(testable_repository):
+    test_dir, first_file, second_file = testable_repository
+    paths = src.utils.get_paths()
+    master_id = src.utils.get_reference_id(paths, 'master')
+    checked_out_id = src.checkout.checkout(master_id[:7])
+
+    assert checked_out_id == master_id
+    assert src.utils.get_active_branch(paths) == 'None'
+    assert not os.path.isfile(second_file)
+
+
+def test_checkout_unknown_commit_id_keeps_files(testable_repository):
+    test_dir, first_file, second_file = testable_repository
+    paths = src.utils.get_paths()
+    head_id = src.utils.get_reference_id(paths)
+
+    assert src.checkout.checkout('f' * 40) is None
+    assert src.checkout.get_commit_ids(paths, 'f' * 40) is None
+    assert os.path.isfile(first_file)
+    assert os.path.isfile(second_file)
+    assert src.utils.get_reference_id(paths) == head_id
+
+
+def test_checkout_repair_restores_deleted_tracked_files(testable_repository):
+    test_dir, first_file, second_file = testable_repository
+    nested_dir = test_dir / 'd' / 'e'
+    nested_dir.mkdir(parents=True)
+    nested_file = nested_dir / 'f.txt'
+    create_file(nested_file, 'nested')
+    other_file = test_dir / 'd' / 'g.txt'
+    create_file(other_file, 'other')
+    src.add.add(str(test_dir / 'd'))
+    src.commit.commit('nested')
+    src.branch.branch('before_change')
+    create_file(nested_dir / 'added.txt', 'added')
+    src.add.add(str(nested_dir / 'added.txt'))
+    src.commit.commit('nested change')
+    shutil.rmtree(test_dir / 'd')
+    src.checkout.checkout('before_change')
+
+    assert not other_file.exists()
+
+    src.checkout.run_checkout('before_change', '--repair')
+
+    assert not (nested_dir / 'added.txt').exists()
+    assert nested_file.read_text() == 'nested'
+    assert other_file.read_text() == 'other'
+    assert src.status.status()[1:] == ([], [], [])
+
+
+def test_checkout_refuses_to_overwrite_untracked_files(testable_repository):
+    test_dir, first_file, second_file = testable_repository
+    src.checkout.checkout('master')
+    create_file(second_file, 'untracked')
+
+    assert src.checkout.checkout('test_branch') is None
+    assert src.utils.get_active_branch(src.utils.get_paths()) == 'master'
+    with open(second_file) as file:
+        assert file.read() == 'untracked'
+
+
+@pytest.mark.parametrize('storage_mode', [src.config.STORAGE_COPY, src.config.STORAGE_LINK])
+def test_checkout_keeps_executable_mode(testable_repository, storage_mode):
+    test_dir, first_file, second_file = testable_repository
+    paths = src.utils.get_paths()
+    src.config.write_config(paths, {'storage': storage_mode})
+    script = test_dir / 'run.sh'
+    create_file(script, '#!/bin/sh\necho run\n')
+    os.chmod(script, 0o755)
+    src.add.add(str(script))
+    src.commit.commit('add an executable script')
+    src.checkout.checkout('master')
+    assert not script.exists()
+    src.checkout.checkout('test_branch')
+
+    assert os.stat(script).st_mode & 0o111
+    assert not os.stat(first_file).st_mode & 0o111
+    assert src.status.status()[1:] == ([], [], [])
@@ -1,10 +1,6 @@
 import os
-from pathlib import Path
-import pytest
-import shutil
 
-
-from src import commit, utils
+from src import commit, objects, utils
 
 
 class TestCommit:
@@ -13,20 +9,30 @@ class TestCommit:
         commit.commit('testing_commit')
         paths = utils.get_paths(init_wit)
         commit_id = utils.get_reference_id(paths)
-        intended_files = [directory_result[1:] for directory_result in os.walk(paths.staging)]
-        commit_files = [directory_result[1:] for directory_result in os.walk(os.path.join(paths.images, commit_id))]
+        intended_files = {
+            os.path.relpath(os.path.join(path, file), paths.staging)
+            for path, folders, files in os.walk(paths.staging)
+            for file in files
+        }
+        commit_files = set(objects.read_snapshot(paths, commit_id))
 
         assert intended_files == commit_files
 
-    def test_remove_commit_folder(self, init_wit):
+    def test_commit_id_is_meta_data_hash(self, init_wit):
+        commit_id = commit.commit('hashed_commit')
+        paths = utils.get_paths()
+        with open(objects.get_commit_meta_data_path(paths, commit_id), 'r') as commit_file:
+            meta_data = commit_file.read()
+
+        assert commit_id == commit.create_commit_id(meta_data)
+
+    def test_remove_commit(self, init_wit):
         paths = utils.get_paths()
         if os.path.isfile(paths.references):
             os.remove(paths.references)
         assert not os.path.isfile(paths.references)
-        commit_id = commit.create_commit_folder(paths)
-        assert os.path.isdir(os.path.join(paths.images, commit_id))
-        commit.remove_commit_folder(paths, commit_id)
-        assert not os.path.isdir(os.path.join(paths.images, commit_id))
-
-
-
+        tree_id = commit.create_commit_tree(paths)
+        commit_id = commit.create_commit_meta_data(paths, tree_id, 'removed_commit')
+        assert os.path.isfile(objects.get_commit_meta_data_path(paths, commit_id))
+        commit.remove_commit(paths, commit_id)
+        assert not os.path.isfile(objects.get_commit_meta_data_path(paths, commit_id))
@@ -0,0 +1,98 @@
+import os
+
+from src import add, bloom, commit, commit_graph, history, utils
+
+
+class TestCommitGraph:
+
+    def test_incremental_graph_matches_rewrite(self, init_wit):
+        first_id = commit.commit('first_graph_commit')
+        second_id = commit.commit('second_graph_commit')
+        paths = utils.get_paths()
+        graph = commit_graph.read_commit_graph(paths)
+        second = graph.record(graph.find_position(second_id))
+        first = graph.record(graph.find_position(first_id))
+        incremental = [graph.record(position) for position in range(len(graph))]
+        graph.close()
+
+        assert second.parents == (first.position,)
+        assert second.generation == first.generation + 1
+
+        os.remove(commit_graph.get_commit_graph_path(paths))
+        graph = commit_graph.read_commit_graph(paths)
+        rewritten = [graph.record(position) for position in range(len(graph))]
+        graph.close()
+
+        assert {record.commit_id: record.generation for record in rewritten} == {
+            record.commit_id: record.generation for record in incremental
+        }
+
+    def test_find_position_uses_lookup(self, init_wit):
+        commit_ids = [commit.commit(f'lookup_commit_{number}') for number in range(5)]
+        graph = commit_graph.read_commit_graph(utils.get_paths())
+        positions = [graph.find_position(commit_id) for commit_id in commit_ids]
+        missing = graph.find_position('0' * 40)
+        graph.close()
+
+        assert positions == sorted(positions)
+        assert missing is None
+
+    def test_interrupted_append_is_discarded(self, init_wit):
+        first_id = commit.commit('first_append_commit')
+        paths = utils.get_paths()
+        for file_path in (commit_graph.get_messages_path(paths), commit_graph.get_bloom_data_path(paths)):
+            with open(file_path, 'ab') as graph_file:
+                graph_file.write(b'leftover')
+        second_id = commit.commit('second_append_commit')
+        graph = commit_graph.read_commit_graph(paths)
+        first = graph.record(graph.find_position(first_id))
+        second = graph.record(graph.find_position(second_id))
+        messages = [graph.message(first), graph.message(second)]
+        second_filter = graph.bloom_filter(second.position)
+        graph.close()
+
+        assert messages == ['first_append_commit', 'second_append_commit']
+        assert b'leftover' not in second_filter
+
+    def test_mismatched_lookup_is_rewritten(self, init_wit):
+        commit_id = commit.commit('lookup_mismatch_commit')
+        paths = utils.get_paths()
+        with open(commit_graph.get_lookup_path(paths), 'ab') as lookup_file:
+            lookup_file.write(b'x' * commit_graph.LOOKUP_RECORD.size)
+        graph = commit_graph.read_commit_graph(paths)
+        position = graph.find_position(commit_id)
+        graph.close()
+
+        assert position is not None
+
+    def test_history(self, init_wit):
+        commit_ids = [commit.commit(f'log_commit_{number}') for number in range(3)]
+        entries = history.history(max_count=2)
+
+        assert len(entries) == 2
+        assert entries[0].startswith(f'commit {commit_ids[2]}')
+        assert entries[1].startswith(f'commit {commit_ids[1]}')
+        assert 'log_commit_1' in entries[1]
+        assert history.history(commit_ids[0][:8])[0].startswith(f'commit {commit_ids[0]}')
+
+    def test_path_limited_history(self, init_wit):
+        touched = []
+        for number in range(4):
+            file_name = 'bloom_a.txt' if number % 2 == 0 else 'bloom_b.txt'
+            with open(os.path.join(init_wit, file_name), 'w') as file:
+                file.write(str(number))
+            add.add(os.path.join(init_wit, file_name))
+            commit_id = commit.commit(f'bloom_commit_{number}')
+            if file_name == 'bloom_a.txt':
+                touched.append(commit_id)
+        entries = history.history(max_count=2, file_paths=[os.path.join(init_wit, 'bloom_a.txt')])
+
+        assert [entry.split('\n')[0] for entry in entries] == [f'commit {commit_id}' for commit_id in reversed(touched)]
+
+
+def test_bloom_filter():
+    bloom_filter = bloom.create_filter({'a.txt', 'dir', 'dir/b.txt'})
+
+    assert all(bloom.might_contain(bloom_filter, path) for path in ['a.txt', 'dir', 'dir/b.txt'])
+    assert not bloom.might_contain(bloom.create_filter(set()), 'a.txt')
+    assert bloom.might_contain(b'', 'a.txt')
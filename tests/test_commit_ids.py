@@ -0,0 +1,29 @@
+import os
+import pytest
+
+from src import commit_ids, utils
+
+
+class TestCommitIds:
+
+    def create_commit_files(self, paths, ids):
+        os.makedirs(paths.images, exist_ok=True)
+        for commit_id in ids:
+            with open(os.path.join(paths.images, f'{commit_id}.txt'), 'w') as commit_file:
+                commit_file.write('parent=None\n')
+
+    def test_resolve_prefix(self, init_wit, monkeypatch):
+        paths = utils.get_paths()
+        monkeypatch.setattr(commit_ids, 'MAX_UNSORTED_IDS', 2)
+        ids = ['abcd1' + str(number) * 35 for number in range(3)] + ['ffff' + '0' * 36]
+        self.create_commit_files(paths, ids)
+        commit_ids.write_commit_ids(paths, ids[:1])
+        for commit_id in ids[1:]:
+            commit_ids.add_commit_id(paths, commit_id)
+
+        assert commit_ids.resolve_prefix(paths, 'abcd12') == ids[2]
+        assert commit_ids.resolve_prefix(paths, 'FFFF') == ids[3]
+        with pytest.raises(commit_ids.errors.AmbiguousCommitIdError):
+            commit_ids.resolve_prefix(paths, 'abcd1')
+        with pytest.raises(commit_ids.errors.MissingBranchError):
+            commit_ids.resolve_prefix(paths, 'eeee')
@@ -0,0 +1,27 @@
+import os
+
+from src import add, config, objects, utils
+
+
+class TestConfig:
+
+    def test_write_and_read_config(self, init_wit):
+        paths = utils.get_paths()
+        config.write_config(paths, {'storage': config.STORAGE_LINK})
+
+        assert config.read_config(paths)['storage'] == config.STORAGE_LINK
+        os.remove(config.get_config_path(paths))
+        assert config.read_config(paths) == config.DEFAULTS
+
+    def test_link_storage_mode(self, init_wit):
+        paths = utils.get_paths()
+        config.write_config(paths, {'storage': config.STORAGE_LINK})
+        linked_file = init_wit / 'linked.txt'
+        linked_file.write_text('linked content')
+        add.add(linked_file)
+        os.remove(config.get_config_path(paths))
+        staged_file = os.path.join(paths.staging, 'linked.txt')
+        object_path = objects.get_object_path(paths, objects.hash_file(linked_file))
+
+        assert os.stat(staged_file).st_ino == os.stat(object_path).st_ino
+        assert not os.stat(object_path).st_mode & 0o222
@@ -0,0 +1,94 @@
+import os
+from pathlib import Path
+import pytest
+import subprocess
+import sys
+import time
+
+
+SRC_DIR = Path(__file__).resolve().parents[1] / 'src'
+SOCKET_TIMEOUT = 10
+
+
+def run_wit(directory, *args, **environment):
+    return subprocess.run(
+        [sys.executable, str(SRC_DIR / 'wit.py'), *args],
+        cwd=directory,
+        env={**os.environ, **environment},
+        capture_output=True,
+        text=True,
+    )
+
+
+def wait_for(predicate):
+    deadline = time.monotonic() + SOCKET_TIMEOUT
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture
+def daemon_repository(clean_test_dir):
+    test_dir = clean_test_dir
+    run_wit(test_dir, 'init')
+    (test_dir / 'file.txt').write_text('content\n')
+    run_wit(test_dir, 'add', 'file.txt')
+    run_wit(test_dir, 'commit', 'first')
+    socket_path = test_dir / '.wit' / 'daemon.sock'
+    process = subprocess.Popen(
+        [sys.executable, str(SRC_DIR / 'wit.py'), 'daemon'],
+        cwd=test_dir,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    assert wait_for(socket_path.exists)
+    yield test_dir
+    run_wit(test_dir, 'daemon', 'stop')
+    try:
+        process.wait(timeout=SOCKET_TIMEOUT)
+    finally:
+        process.kill()
+    assert not socket_path.exists()
+
+
+def test_daemon_matches_local_status(daemon_repository):
+    (daemon_repository / 'file.txt').write_text('changed\n')
+    (daemon_repository / 'new.txt').write_text('new\n')
+    forwarded = run_wit(daemon_repository, 'status', WIT_LOG_LEVEL='DEBUG')
+    local = run_wit(daemon_repository, 'status', WIT_NO_DAEMON='1')
+
+    assert 'Forwarding status to the wit daemon' in forwarded.stderr
+    assert forwarded.stdout == local.stdout
+    assert 'new.txt' in forwarded.stdout
+
+
+def test_daemon_forwards_errors_and_exit_codes(daemon_repository):
+    forwarded = run_wit(daemon_repository, 'status', '--jobs', 'x')
+    local = run_wit(daemon_repository, 'status', '--jobs', 'x', WIT_NO_DAEMON='1')
+
+    assert forwarded.returncode == local.returncode == 2
+    assert forwarded.stderr == local.stderr
+    assert 'invalid int value' in forwarded.stderr
+
+
+def test_daemon_sees_new_commits(daemon_repository):
+    (daemon_repository / 'second.txt').write_text('second\n')
+    run_wit(daemon_repository, 'add', 'second.txt')
+    run_wit(daemon_repository, 'commit', 'second')
+    forwarded = run_wit(daemon_repository, 'log', '-n', '1')
+
+    assert 'second' in forwarded.stdout
+    assert forwarded.stdout == run_wit(daemon_repository, 'log', '-n', '1', WIT_NO_DAEMON='1').stdout
+
+
+def test_nested_repository_ignores_outer_daemon(daemon_repository):
+    nested = daemon_repository / 'nested'
+    nested.mkdir()
+    run_wit(nested, 'init')
+    (nested / 'inner.txt').write_text('inner\n')
+    forwarded = run_wit(nested, 'status', WIT_LOG_LEVEL='DEBUG')
+
+    assert 'Forwarding status to the wit daemon' not in forwarded.stderr
+    assert 'inner.txt' in forwarded.stdout
@@ -0,0 +1,127 @@
+import difflib
+import os
+from pathlib import Path
+import pytest
+import subprocess
+import sys
+
+from src import add, commit, diff, init
+
+
+SRC_DIR = Path(__file__).resolve().parents[1] / 'src'
+
+
+def write_file(file_path, content):
+    with open(file_path, 'w') as file:
+        file.write(content)
+
+
+@pytest.fixture
+def diff_repository(clean_test_dir):
+    test_dir = clean_test_dir
+    os.chdir(test_dir)
+    init.init()
+    return test_dir
+
+
+class TestDiff:
+
+    def test_working_changes_against_index(self, diff_repository):
+        file_path = os.path.join(diff_repository, 'diffed.txt')
+        write_file(file_path, ''.join(f'line {number}\n' for number in range(20)))
+        add.add(file_path)
+        write_file(file_path, ''.join(f'line {number}\n' for number in range(20) if number != 10) + 'tail')
+        lines = list(diff.diff())
+
+        assert 'diff --wit a/diffed.txt b/diffed.txt' in lines
+        assert '-line 10' in lines
+        assert '+tail' in lines
+        assert '@@ -8,7 +8,6 @@' in lines
+        assert '@@ -18,3 +17,4 @@' in lines
+        assert lines[-1] == '\\ No newline at end of file'
+
+    def test_commits_and_working_directory(self, diff_repository):
+        file_path = os.path.join(diff_repository, 'committed.txt')
+        write_file(file_path, 'first\n')
+        add.add(file_path)
+        first_id = commit.commit('first diffed commit')
+        write_file(file_path, 'second\n')
+        add.add(file_path)
+        second_id = commit.commit('second diffed commit')
+        between_commits = list(diff.diff(first_id, second_id))
+        against_working = list(diff.diff(first_id))
+
+        assert between_commits[-2:] == ['-first', '+second']
+        assert against_working[-2:] == ['-first', '+second']
+        assert list(diff.diff(second_id)) == []
+
+    def test_iter_lines_joins_lines_split_across_blocks(self):
+        blocks = [b'a' * 10] * 5 + [b'\nnext\nlast', b' line']
+
+        assert list(diff.iter_lines(blocks)) == [b'a' * 50 + b'\n', b'next\n', b'last line']
+        assert list(diff.iter_lines([b'end\n', b''])) == [b'end\n']
+
+    def test_closed_output_pipe_exits_quietly(self, diff_repository):
+        file_path = os.path.join(diff_repository, 'piped.txt')
+        write_file(file_path, ''.join(f'line {number}\n' for number in range(20000)))
+        add.add(file_path)
+        write_file(file_path, '')
+        process = subprocess.Popen(
+            [sys.executable, str(SRC_DIR / 'wit.py'), 'diff'],
+            cwd=diff_repository,
+            env={**os.environ, 'WIT_NO_DAEMON': '1'},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        process.stdout.readline()
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.wait()
+
+        assert b'BrokenPipeError' not in stderr
+        assert b'Traceback' not in stderr
+
+    def test_iter_hunks_streams_lines(self):
+        old_lines = iter([b'same\n', b'old\n'])
+        new_lines = iter([b'same\n', b'new\n', b'added\n'])
+
+        assert list(diff.iter_hunks(old_lines, new_lines)) == [
+            '@@ -1,2 +1,3 @@', ' same', '-old', '+new', '+added'
+        ]
+
+    def test_iter_hunks_uses_bounded_windows(self, monkeypatch):
+        monkeypatch.setattr(diff, 'WINDOW_LINES', 64)
+        old_lines = [b'line %d\n' % number for number in range(1000)]
+        new_lines = list(old_lines)
+        new_lines[10:12] = [b'changed early\n']
+        new_lines[500:500] = [b'inserted %d\n' % number for number in range(20)]
+        new_lines[-5] = b'changed late\n'
+        expected = [
+            line.rstrip('\n') for line in difflib.unified_diff(
+                [line.decode() for line in old_lines], [line.decode() for line in new_lines], n=3
+            )
+        ][2:]
+        consumed = []
+
+        def tracked(lines):
+            for line in lines:
+                consumed.append(line)
+                yield line
+
+        hunks = diff.iter_hunks(tracked(old_lines), iter(new_lines))
+        assert next(hunks) == expected[0]
+        assert len(consumed) < 200
+        assert [expected[0]] + list(hunks) == expected
+
+    def test_iter_hunks_splits_changes_larger_than_a_window(self, monkeypatch):
+        monkeypatch.setattr(diff, 'WINDOW_LINES', 64)
+        old_lines = [b'line %d\n' % number for number in range(1000)]
+        new_lines = list(old_lines)
+        new_lines[500:500] = [b'inserted %d\n' % number for number in range(300)]
+        hunks = list(diff.iter_hunks(iter(old_lines), iter(new_lines)))
+        added = [line for line in hunks if line.startswith('+')]
+        removed = [line for line in hunks if line.startswith('-')]
+
+        assert hunks[0].startswith('@@ -498,')
+        assert len(added) - len(removed) == 300
+        assert '+inserted 299' in added
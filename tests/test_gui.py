@@ -0,0 +1,90 @@
+import os
+import pytest
+import threading
+
+flask = pytest.importorskip('flask')
+
+from src import add
+from src import commit
+from src import errors
+from src import gui
+from src import init
+from src import objects
+
+
+@pytest.fixture
+def browsed_repository(clean_test_dir):
+    test_dir = clean_test_dir
+    (test_dir / 'folder').mkdir()
+    os.chdir(test_dir)
+    init.init()
+    for number in range(5):
+        (test_dir / 'folder' / f'file_{number}.txt').write_text(f'file {number}\n')
+    (test_dir / 'large.txt').write_bytes(b'large line\n' * objects.BLOCK_SIZE)
+    add.add(str(test_dir / 'folder'))
+    add.add(str(test_dir / 'large.txt'))
+    commit_id = commit.commit('browsed')
+    gui.repositories.clear()
+    gui.app.config['TESTING'] = True
+    return test_dir, commit_id, gui.app.test_client()
+
+
+def test_browse_lists_directories(browsed_repository):
+    test_dir, commit_id, client = browsed_repository
+    response = client.get(f'/browse/{commit_id}/')
+
+    assert response.status_code == 200
+    assert b'folder/' in response.data
+    assert b'large.txt' in response.data
+    assert client.get(f'/browse/{commit_id}/missing').status_code == 404
+    assert client.get(f'/browse/{"0" * 40}/').status_code == 404
+
+
+def test_browse_pages_listings(browsed_repository):
+    test_dir, commit_id, client = browsed_repository
+    first = client.get(f'/browse/{commit_id}/folder/?page=1&page_size=2')
+    last = client.get(f'/browse/{commit_id}/folder/?page=3&page_size=2')
+
+    assert b'file_0.txt' in first.data and b'file_2.txt' not in first.data
+    assert b'Page 1 of 3 (5 entries)' in first.data
+    assert b'file_4.txt' in last.data and b'file_0.txt' not in last.data
+    assert first.headers['ETag'] != last.headers['ETag']
+
+
+def test_browse_etag_and_streamed_blob(browsed_repository):
+    test_dir, commit_id, client = browsed_repository
+    response = client.get(f'/browse/{commit_id}/large.txt')
+    cached = client.get(f'/browse/{commit_id}/large.txt', headers={'If-None-Match': response.headers['ETag']})
+
+    assert 'Content-Length' not in response.headers
+    assert response.mimetype == 'text/plain'
+    assert response.data == (test_dir / 'large.txt').read_bytes()
+    assert 'max-age' in response.headers['Cache-Control']
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+
+def test_streamed_blob_holds_the_shared_lock(browsed_repository):
+    test_dir, commit_id, client = browsed_repository
+    results = []
+
+    def try_exclusive():
+        try:
+            with gui.get_repository().locks.exclusive(timeout=0.1):
+                results.append(True)
+        except errors.RepositoryLockError:
+            results.append(False)
+
+    def run_writer():
+        writer = threading.Thread(target=try_exclusive)
+        writer.start()
+        writer.join(5)
+
+    response = client.get(f'/browse/{commit_id}/large.txt', buffered=False)
+    run_writer()
+    data = response.get_data()
+    response.close()
+    run_writer()
+
+    assert results == [False, True]
+    assert data == (test_dir / 'large.txt').read_bytes()
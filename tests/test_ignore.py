@@ -0,0 +1,51 @@
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+import src
+import src.ignore
+import src.status
+
+
+TEMPDIR = Path(tempfile.gettempdir())
+
+
+def create_file(filepath, content):
+    with open(filepath, 'w') as file:
+        file.write(content)
+
+
+class TestIgnore:
+    def setup_method(self):
+        self.test_dir = TEMPDIR / 'test_ignore'
+        if os.path.isdir(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir(parents=True)
+        os.chdir(self.test_dir)
+        src.init.init()
+        create_file(self.test_dir / '.witignore', '# build outputs\nnode_modules/\n*.log\n/build/out\n')
+        os.makedirs(self.test_dir / 'node_modules' / 'package')
+        create_file(self.test_dir / 'node_modules' / 'package' / 'index.js', 'ignored')
+        create_file(self.test_dir / 'debug.log', 'ignored')
+        create_file(self.test_dir / 'kept.txt', 'kept')
+
+    def test_matcher(self):
+        matcher = src.ignore.IgnoreMatcher(['node_modules/', '*.log', '/build/out'])
+
+        assert matcher.is_ignored('node_modules', True)
+        assert not matcher.is_ignored('node_modules', False)
+        assert matcher.is_ignored(os.path.join('deep', 'trace.log'))
+        assert matcher.is_ignored(os.path.join('build', 'out'))
+        assert not matcher.is_ignored(os.path.join('src', 'build', 'out.txt'))
+        assert matcher.is_ignored_path(os.path.join('node_modules', 'package', 'index.js'))
+
+    def test_add_and_status_skip_ignored_items(self):
+        src.add.add(str(self.test_dir))
+        current_id, to_commit, not_staged, untracked = src.status.status()
+        paths = src.utils.get_paths()
+
+        assert not os.path.exists(os.path.join(paths.staging, 'node_modules'))
+        assert not os.path.exists(os.path.join(paths.staging, 'debug.log'))
+        assert to_commit == [str(self.test_dir / '.witignore'), str(self.test_dir / 'kept.txt')]
+        assert untracked == []
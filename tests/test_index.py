@@ -0,0 +1,42 @@
+import os
+
+from src import add, index, utils
+
+
+def create_file(filepath, content):
+    with open(filepath, 'w') as file:
+        file.write(content)
+
+
+class TestIndex:
+
+    def test_write_and_read_index(self, init_wit):
+        paths = utils.get_paths()
+        entries = {
+            'first.txt': index.IndexEntry(4, 1000, 7, 'a' * 40),
+            os.path.join('folder', 'second.txt'): index.IndexEntry(9, 2000, 8, 'b' * 40),
+        }
+        index.write_index(paths, entries)
+
+        assert index.read_index(paths) == entries
+
+    def test_add_records_stat_data(self, init_wit):
+        paths = utils.get_paths()
+        indexed_file = init_wit / 'indexed.txt'
+        create_file(indexed_file, 'indexed content')
+        add.add(indexed_file)
+        entry = index.read_index(paths)['indexed.txt']
+        file_stat = os.stat(indexed_file)
+
+        assert entry.size == file_stat.st_size
+        assert entry.mtime_ns == file_stat.st_mtime_ns
+        assert entry.inode == file_stat.st_ino
+
+    def test_racy_entry_is_not_unchanged(self, init_wit):
+        indexed_file = init_wit / 'racy.txt'
+        create_file(indexed_file, 'racy content')
+        file_stat = os.stat(indexed_file)
+        entry = index.create_entry(file_stat, 'c' * 40)
+
+        assert index.is_unchanged(entry, file_stat, file_stat.st_mtime_ns + 1)
+        assert not index.is_unchanged(entry, file_stat, file_stat.st_mtime_ns)
@@ -0,0 +1,105 @@
+import os
+from pathlib import Path
+import pytest
+import subprocess
+import sys
+import threading
+import time
+
+from src import locks
+from src import wit
+
+
+SRC_DIR = Path(__file__).resolve().parents[1] / 'src'
+HOLD_LOCK_CODE = (
+    "import sys, time, locks\n"
+    "with locks.LockManager(sys.argv[1]).acquire(sys.argv[2]):\n"
+    "    print('locked', flush=True)\n"
+    "    time.sleep(float(sys.argv[3]))\n"
+)
+
+
+@pytest.fixture
+def wit_path(clean_test_dir):
+    wit_path = clean_test_dir / '.wit'
+    wit_path.mkdir()
+    return wit_path
+
+
+def hold_lock_in_process(wit_path, mode, seconds):
+    process = subprocess.Popen(
+        [sys.executable, '-c', HOLD_LOCK_CODE, str(wit_path), mode, str(seconds)],
+        env={**os.environ, 'PYTHONPATH': str(SRC_DIR)},
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert process.stdout.readline().strip() == 'locked'
+    return process
+
+
+def test_shared_locks_run_in_parallel(wit_path):
+    manager = locks.LockManager(str(wit_path))
+    inside = threading.Barrier(3, timeout=5)
+
+    def reader():
+        with manager.shared():
+            inside.wait()
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    inside.wait()
+    for thread in readers:
+        thread.join()
+
+
+def test_exclusive_lock_waits_for_readers(wit_path):
+    manager = locks.LockManager(str(wit_path))
+    events = []
+    reader_inside = threading.Event()
+
+    def reader():
+        with manager.shared():
+            reader_inside.set()
+            time.sleep(0.1)
+            events.append('reader')
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    reader_inside.wait()
+    with manager.exclusive():
+        events.append('writer')
+    thread.join()
+
+    assert events == ['reader', 'writer']
+    with pytest.raises(locks.errors.LockUpgradeError):
+        with manager.shared(), manager.exclusive():
+            pass
+    with manager.exclusive(), manager.shared(), manager.exclusive():
+        pass
+
+
+def test_locks_across_processes(wit_path):
+    manager = locks.LockManager(str(wit_path), timeout=0.1)
+    process = hold_lock_in_process(wit_path, locks.SHARED, 1)
+    with manager.shared():
+        pass
+    with pytest.raises(locks.errors.RepositoryLockError):
+        with manager.exclusive():
+            pass
+    process.wait()
+    process = hold_lock_in_process(wit_path, locks.EXCLUSIVE, 1)
+    with pytest.raises(locks.errors.RepositoryLockError):
+        with manager.shared():
+            pass
+    process.wait()
+    with manager.exclusive(timeout=1):
+        pass
+
+
+def test_branch_listing_takes_the_shared_lock():
+    assert wit.get_command_lock('branch', ()) == locks.SHARED
+    assert wit.get_command_lock('branch', ('--verbose',)) == locks.SHARED
+    assert wit.get_command_lock('branch', ('-v',)) == locks.SHARED
+    assert wit.get_command_lock('branch', ('feature',)) == locks.EXCLUSIVE
+    assert wit.get_command_lock('status', ()) == locks.SHARED
@@ -0,0 +1,117 @@
+import os
+import pytest
+
+from src import add, branch, checkout, commit, init, merge, objects, status, utils
+
+
+BASE_LINES = ''.join(f'line {number}\n' for number in range(10))
+
+
+def commit_file(directory, name, content, message):
+    file_path = os.path.join(directory, name)
+    with open(file_path, 'w') as file:
+        file.write(content)
+    add.add(file_path)
+    return commit.commit(message)
+
+
+def read_file(directory, name):
+    with open(os.path.join(directory, name), 'r') as file:
+        return file.read()
+
+
+@pytest.fixture
+def merge_repository(clean_test_dir):
+    test_dir = clean_test_dir
+    os.chdir(test_dir)
+    init.init()
+    os.makedirs(test_dir / 'unchanged')
+    commit_file(test_dir, 'unchanged/kept.txt', 'kept\n', 'unchanged directory')
+    base_id = commit_file(test_dir, 'shared.txt', BASE_LINES, 'base')
+    branch.branch('feature')
+    return test_dir, base_id
+
+
+def test_merge_lines():
+    base = [b'a\n', b'b\n', b'c\n']
+    merged, clean = merge.merge_lines(base, [b'A\n', b'b\n', b'c\n'], [b'a\n', b'b\n', b'C\n'], 'feature')
+
+    assert clean
+    assert merged == [b'A\n', b'b\n', b'C\n']
+
+    merged, clean = merge.merge_lines(base, [b'a\n', b'ours\n', b'c\n'], [b'a\n', b'theirs\n', b'c\n'], 'feature')
+
+    assert not clean
+    assert merged == [
+        b'a\n', b'<<<<<<< HEAD\n', b'ours\n', b'=======\n', b'theirs\n', b'>>>>>>> feature\n', b'c\n'
+    ]
+
+
+def test_fast_forward(merge_repository):
+    test_dir, base_id = merge_repository
+    checkout.checkout('feature')
+    feature_id = commit_file(test_dir, 'feature.txt', 'feature\n', 'feature file')
+    checkout.checkout('master')
+
+    assert merge.merge('feature') == feature_id
+    assert utils.get_reference_id(utils.get_paths(), 'master') == feature_id
+    assert read_file(test_dir, 'feature.txt') == 'feature\n'
+
+
+def test_clean_merge(merge_repository):
+    test_dir, base_id = merge_repository
+    checkout.checkout('feature')
+    feature_id = commit_file(test_dir, 'shared.txt', BASE_LINES.replace('line 1\n', 'feature 1\n'), 'feature edit')
+    checkout.checkout('master')
+    master_id = commit_file(test_dir, 'shared.txt', BASE_LINES.replace('line 8\n', 'master 8\n'), 'master edit')
+    merge_id = merge.merge('feature')
+    paths = utils.get_paths()
+    meta_data = objects.read_commit_meta_data(paths, merge_id)
+
+    assert objects.get_commit_parents(meta_data) == [master_id, feature_id]
+    assert read_file(test_dir, 'shared.txt') == BASE_LINES.replace('line 1\n', 'feature 1\n').replace(
+        'line 8\n', 'master 8\n'
+    )
+    assert not os.path.isfile(commit.get_merge_head_path(paths))
+
+
+def test_conflicting_merge(merge_repository):
+    test_dir, base_id = merge_repository
+    checkout.checkout('feature')
+    feature_id = commit_file(test_dir, 'shared.txt', BASE_LINES.replace('line 5\n', 'feature 5\n'), 'feature edit')
+    checkout.checkout('master')
+    master_id = commit_file(test_dir, 'shared.txt', BASE_LINES.replace('line 5\n', 'master 5\n'), 'master edit')
+
+    assert merge.merge('feature') is None
+    content = read_file(test_dir, 'shared.txt')
+    assert '<<<<<<< HEAD\nmaster 5\n=======\nfeature 5\n>>>>>>> feature\n' in content
+    paths = utils.get_paths()
+    assert read_file(paths.staging, 'shared.txt') == BASE_LINES.replace('line 5\n', 'master 5\n')
+    assert commit.read_merge_conflicts(paths) == ['shared.txt']
+    assert commit.commit('unresolved merge') is None
+
+    merge_id = commit_file(test_dir, 'shared.txt', BASE_LINES, 'resolved merge')
+    meta_data = objects.read_commit_meta_data(utils.get_paths(), merge_id)
+    assert objects.get_commit_parents(meta_data) == [master_id, feature_id]
+
+
+def test_abort_merge(merge_repository):
+    test_dir, base_id = merge_repository
+    checkout.checkout('feature')
+    commit_file(test_dir, 'shared.txt', BASE_LINES.replace('line 5\n', 'feature 5\n'), 'feature edit')
+    commit_file(test_dir, 'added.txt', 'added\n', 'feature addition')
+    checkout.checkout('master')
+    master_lines = BASE_LINES.replace('line 5\n', 'master 5\n')
+    master_id = commit_file(test_dir, 'shared.txt', master_lines, 'master edit')
+
+    assert merge.merge('feature') is None
+    assert os.path.isfile(test_dir / 'added.txt')
+    assert merge.abort_merge()
+    paths = utils.get_paths()
+
+    assert read_file(test_dir, 'shared.txt') == master_lines
+    assert not os.path.exists(test_dir / 'added.txt')
+    assert commit.read_merge_head(paths) is None
+    assert commit.read_merge_conflicts(paths) == []
+    assert status.status() == (master_id, [], [], [])
+    assert merge.abort_merge() is None
@@ -0,0 +1,89 @@
+import os
+import pytest
+
+from src import objects, utils
+
+
+def create_file(filepath, content):
+    with open(filepath, 'w') as file:
+        file.write(content)
+
+
+class TestObjects:
+
+    def test_store_file_deduplicates(self, init_wit):
+        paths = utils.get_paths()
+        first_file = init_wit / 'same1.txt'
+        second_file = init_wit / 'same2.txt'
+        create_file(first_file, 'same content')
+        create_file(second_file, 'same content')
+        first_id = objects.store_file(paths, first_file)
+        second_id = objects.store_file(paths, second_file)
+
+        assert first_id == second_id
+        assert first_id == objects.hash_file(first_file)
+        assert objects.object_exists(paths, first_id)
+
+    def test_export_object(self, init_wit):
+        paths = utils.get_paths()
+        source_file = init_wit / 'exported.txt'
+        create_file(source_file, 'exported content')
+        object_id = objects.store_file(paths, source_file)
+        destination = init_wit / 'export_dir' / 'exported.txt'
+        objects.export_object(paths, object_id, destination)
+
+        assert destination.read_text() == 'exported content'
+
+    def test_identical_trees_share_id(self, init_wit):
+        paths = utils.get_paths()
+        blob_id = objects.store_bytes(paths, b'tree content')
+        first_tree = objects.write_tree(paths, {'b.txt': (objects.BLOB, blob_id), 'a.txt': (objects.BLOB, blob_id)})
+        second_tree = objects.write_tree(paths, {'a.txt': (objects.BLOB, blob_id), 'b.txt': (objects.BLOB, blob_id)})
+
+        assert first_tree == second_tree
+        assert objects.read_tree(paths, first_tree) == {
+            'a.txt': objects.TreeEntry(objects.BLOB, blob_id),
+            'b.txt': objects.TreeEntry(objects.BLOB, blob_id),
+        }
+
+    def test_list_directory(self, init_wit):
+        paths = utils.get_paths()
+        blob_id = objects.store_bytes(paths, b'listed content')
+        inner_tree = objects.write_tree(paths, {'inner.txt': (objects.BLOB, blob_id)})
+        root_tree = objects.write_tree(
+            paths, {'a.txt': (objects.BLOB, blob_id), 'z_dir': (objects.TREE, inner_tree)}
+        )
+
+        assert objects.list_directory(paths, root_tree) == [
+            ('z_dir', objects.TREE, inner_tree),
+            ('a.txt', objects.BLOB, blob_id),
+        ]
+        assert objects.list_directory(paths, root_tree, 'z_dir') == [
+            ('inner.txt', objects.BLOB, blob_id),
+        ]
+        assert objects.list_directory(paths, root_tree, 'a.txt') is None
+        assert objects.list_directory(paths, root_tree, 'missing') is None
+
+    def test_invalidate_tree_cache(self, init_wit):
+        paths = utils.get_paths()
+        tree_cache = {'.': 'root', 'a': 'first', os.path.join('a', 'b'): 'second', 'c': 'third'}
+        objects.write_tree_cache(paths, tree_cache)
+        objects.invalidate_tree_cache(paths, os.path.join('a', 'b', 'file.txt'))
+
+        assert objects.read_tree_cache(paths) == {'c': 'third'}
+
+    @pytest.mark.parametrize('codec_name', [objects.CODEC_ZLIB, objects.CODEC_LZMA])
+    def test_compressed_objects(self, init_wit, codec_name):
+        paths = utils.get_paths()
+        content = '{"key": "value"}\n' * 20000 + codec_name
+        source_file = init_wit / f'compressed_{codec_name}.json'
+        create_file(source_file, content)
+        object_id = objects.store_file(paths, source_file, objects.Codec(codec_name, 6))
+        object_path, stored_codec_name = objects.find_object_path(paths, object_id)
+        destination = init_wit / 'export_dir' / f'compressed_{codec_name}.json'
+        objects.export_object(paths, object_id, destination)
+
+        assert stored_codec_name == codec_name
+        assert os.path.getsize(object_path) < len(content) // 5
+        assert objects.read_object(paths, object_id) == content.encode()
+        assert destination.read_text() == content
@@ -0,0 +1,74 @@
+import os
+import pytest
+import subprocess
+import sys
+import threading
+
+from src import refs, utils
+
+
+class TestRefs:
+    COMMIT_ID = 'a' * 40
+
+    def setup_references(self, init_wit):
+        paths = utils.get_paths()
+        with open(paths.references, 'w') as references_file:
+            references_file.write(f'HEAD={self.COMMIT_ID}\nmaster={self.COMMIT_ID}\n')
+        return refs.RefStore(paths.references)
+
+    def test_exact_lookup(self, init_wit):
+        references = self.setup_references(init_wit)
+
+        assert references.get('master') == self.COMMIT_ID
+        with pytest.raises(refs.errors.MissingBranchError):
+            references.get('ma')
+
+    def test_concurrent_branch_creation(self, init_wit):
+        references = self.setup_references(init_wit)
+        branch_names = [f'branch{number}' for number in range(20)]
+        threads = [
+            threading.Thread(
+                target=refs.RefStore(references.references_path).create_branch,
+                args=(branch_name, self.COMMIT_ID),
+            )
+            for branch_name in branch_names
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        references.reload()
+
+        assert sorted(references.branches()) == sorted(['master'] + branch_names)
+        assert not os.path.exists(references.lock_path)
+
+    def test_lock_timeout(self, init_wit, monkeypatch):
+        references = self.setup_references(init_wit)
+        monkeypatch.setattr(refs, 'LOCK_TIMEOUT', 0.05)
+        with references.lock():
+            assert not refs.RefStore(references.references_path).update('b' * 40, 'master')
+
+        assert references.get('master') == self.COMMIT_ID
+
+    def test_stale_lock_is_broken(self, init_wit):
+        references = self.setup_references(init_wit)
+        finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+        finished.wait()
+        with open(references.lock_path, 'w') as lock_file:
+            lock_file.write(str(finished.pid))
+
+        assert references.update('b' * 40, 'master')
+        assert references.get('master') == 'b' * 40
+        assert not os.path.exists(references.lock_path)
+
+        open(references.lock_path, 'w').close()
+        os.utime(references.lock_path, (0, 0))
+
+        assert references.update('c' * 40, 'master')
+        assert not os.path.exists(references.lock_path)
+
+    def test_lock_records_its_holder(self, init_wit):
+        references = self.setup_references(init_wit)
+        with references.lock():
+            with open(references.lock_path) as lock_file:
+                assert lock_file.read() == str(os.getpid())
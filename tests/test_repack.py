@@ -0,0 +1,68 @@
+import os
+import pytest
+
+import src
+import src.pack
+import src.repack
+import src.utils
+
+
+def create_file(filepath, content):
+    with open(filepath, 'w') as file:
+        file.write(content)
+
+
+@pytest.fixture
+def repository_with_history(clean_test_dir):
+    test_dir = clean_test_dir
+    os.chdir(test_dir)
+    src.init.init()
+    growing_file = test_dir / 'growing.txt'
+    lines = []
+    for version in range(5):
+        lines.extend(f'line {version} {number}\n' for number in range(200))
+        create_file(growing_file, ''.join(lines))
+        src.add.add(growing_file)
+        src.commit.commit(f'version {version}')
+    return test_dir, growing_file
+
+
+def test_delta_round_trip():
+    base = b''.join(b'base line %d\n' % number for number in range(500))
+    target = base[:2000] + b'inserted text\n' + base[2000:]
+    delta = src.pack.create_delta(base, target)
+
+    assert len(delta) < len(target) // 10
+    assert src.pack.apply_delta(base, delta) == target
+
+
+def test_gc(repository_with_history):
+    test_dir, growing_file = repository_with_history
+    paths = src.utils.get_paths()
+    assert src.repack.gc()
+    packs = src.pack.get_packs(paths.objects)
+
+    assert list(src.objects.iter_loose_object_ids(paths)) == []
+    assert len(packs) == 1
+    assert os.path.getsize(packs[0].pack_path) < os.path.getsize(growing_file)
+    assert src.status.status()[1:] == ([], [], [])
+    src.branch.branch('packed')
+    first_commit = src.repack.get_history(paths)[-1]
+    src.checkout.checkout(first_commit)
+    assert growing_file.read_text().count('\n') == 200
+
+
+def test_gc_streams_oversized_objects(repository_with_history, monkeypatch):
+    test_dir, growing_file = repository_with_history
+    paths = src.utils.get_paths()
+    monkeypatch.setattr(src.repack, 'MAX_DELTA_OBJECT_SIZE', 1024)
+    object_id = src.objects.hash_file(growing_file)
+    assert src.objects.object_size_exceeds(paths, object_id, 1024)
+    assert src.repack.gc()
+    packs = src.pack.get_packs(paths.objects)
+
+    assert packs[0].read_entry_header(packs[0].find_offset(object_id))[0] == src.pack.FULL
+    blocks = list(src.pack.iter_packed_object_blocks(paths.objects, object_id, 1024))
+    assert len(blocks) > 1
+    assert b''.join(blocks) == growing_file.read_bytes()
+    assert src.status.status()[1:] == ([], [], [])
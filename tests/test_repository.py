@@ -0,0 +1,35 @@
+import os
+
+from src import add, commit, config, index, repository, status
+
+
+class TestRepository:
+
+    def test_caches_until_files_change(self, init_wit):
+        repo = repository.Repository(str(init_wit))
+        first_references = repo.references
+        first_config = repo.config
+
+        assert repo.references is first_references
+        assert repo.config is first_config
+
+        config.write_config(repo.paths, {'storage': config.STORAGE_LINK})
+
+        assert repo.config is not first_config
+        assert repo.config['storage'] == config.STORAGE_LINK
+        config.write_config(repo.paths, dict(config.DEFAULTS))
+
+    def test_entry_points_share_repository(self, init_wit):
+        repo = repository.Repository(str(init_wit))
+        file_path = os.path.join(init_wit, 'repository_file.txt')
+        with open(file_path, 'w') as file:
+            file.write('cached')
+        add.add(file_path, repo)
+
+        assert 'repository_file.txt' in repo.read_index()
+        assert repo.read_index() == index.read_index(repo.paths)
+
+        commit_id = commit.commit('repository commit', repo)
+
+        assert status.status(repo=repo)[0] == commit_id
+        assert repo.references.get() == commit_id
@@ -0,0 +1,46 @@
+import os
+from pathlib import Path
+import pytest
+import subprocess
+import sys
+
+from src import wit
+
+
+SRC_DIR = Path(__file__).resolve().parents[1] / 'src'
+MODULES_MARKER = 'LOADED_MODULES'
+
+
+@pytest.fixture
+def empty_repository(clean_test_dir):
+    test_dir = clean_test_dir
+    subprocess.run([sys.executable, str(SRC_DIR / 'wit.py'), 'init'], cwd=test_dir, check=True)
+    return test_dir
+
+
+def test_status_loads_only_its_command_module(empty_repository):
+    code = (
+        "import sys, wit\n"
+        "wit.main('wit', 'status')\n"
+        f"print('{MODULES_MARKER}', *sorted(sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=empty_repository,
+        env={**os.environ, 'PYTHONPATH': str(SRC_DIR)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    loaded = set(result.stdout.split(MODULES_MARKER)[-1].split())
+    other_commands = {
+        module_name for _, module_name, _ in wit.COMMANDS.values() if module_name != 'status'
+    }
+
+    assert 'status' in loaded
+    assert not loaded & other_commands
+
+
+def test_unknown_command():
+    assert wit.main('wit', 'unknown') is None
+
@@ -56,4 +56,28 @@ class TestStatus:
         current_status = src.status.status()
         status_message = src.status.status_message(*current_status)
 
-        assert intended_status_message == status_message
\ No newline at end of file
+        assert intended_status_message == status_message
+    def test_status_nested_directories(self):
+        nested_dir = os.path.join(self.sample_dir, 'nested', 'deeper')
+        os.makedirs(nested_dir)
+        nested_file = os.path.join(nested_dir, 'file4.txt')
+        with open(nested_file, 'w') as file:
+            file.write('nested')
+        src.add.add(nested_file)
+        os.remove(nested_file)
+        current_id, to_commit, not_staged, untracked = src.status.status()
+
+        assert to_commit == [self.new_file, nested_file]
+        assert not_staged == [self.changed_file]
+        assert untracked == [self.untracked_file]
+
+    def test_status_parallel_jobs(self):
+        for file_number in range(5, 15):
+            extra_file = os.path.join(self.sample_dir, f'file{file_number}.txt')
+            with open(extra_file, 'w') as file:
+                file.write('test')
+            src.add.add(extra_file)
+            with open(extra_file, 'w') as file:
+                file.write(f'changed {file_number}')
+
+        assert src.status.status(jobs=4) == src.status.status()
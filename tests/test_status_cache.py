@@ -0,0 +1,115 @@
+import os
+import pytest
+import threading
+import time
+
+from src import add
+from src import commit
+from src import init
+from src import repository
+from src import status_cache
+
+
+@pytest.fixture
+def cached_repository(clean_test_dir):
+    test_dir = clean_test_dir
+    os.chdir(test_dir)
+    init.init()
+    (test_dir / 'tracked.txt').write_text('tracked\n')
+    add.add(str(test_dir / 'tracked.txt'))
+    commit.commit('first')
+    cache = status_cache.StatusCache(repository.Repository(str(test_dir)), poll_interval=0.05)
+    yield test_dir, cache
+    cache.stop()
+
+
+def test_refresh_only_versions_changes(cached_repository):
+    test_dir, cache = cached_repository
+    first = cache.refresh()
+    unchanged = cache.refresh()
+    (test_dir / 'new.txt').write_text('new\n')
+    changed = cache.refresh()
+
+    assert unchanged is first
+    assert changed.version == first.version + 1
+    assert changed.untracked == (str(test_dir / 'new.txt'),)
+
+
+def test_background_refresh_pushes_deltas(cached_repository):
+    test_dir, cache = cached_repository
+    with cache.subscribe():
+        snapshot = cache.get_snapshot()
+        initial = cache.wait_for_delta(None, 0)
+        with cache.updating():
+            (test_dir / 'new.txt').write_text('new\n')
+            (test_dir / 'tracked.txt').write_text('changed\n')
+        delta = cache.wait_for_delta(snapshot.version, 5)
+
+    assert initial['reset']
+    assert not delta['reset']
+    assert delta['added']['untracked'] == [str(test_dir / 'new.txt')]
+    assert delta['added']['unstaged'] == [str(test_dir / 'tracked.txt')]
+    assert delta['removed'] == {name: [] for name in status_cache.FILE_LISTS}
+    assert cache.wait_for_delta(delta['version'], 0) is None
+
+
+def test_poll_only_refreshes_changed_repositories(cached_repository, monkeypatch):
+    test_dir, cache = cached_repository
+    calls = []
+    original_status = status_cache.status.status
+
+    def counted_status(*args, **kwargs):
+        calls.append(args)
+        return original_status(*args, **kwargs)
+
+    monkeypatch.setattr(status_cache.status, 'status', counted_status)
+    with cache.subscribe():
+        poller = cache.thread
+        snapshot = cache.get_snapshot()
+        time.sleep(0.3)
+        assert len(calls) == 1
+        (test_dir / 'tracked.txt').write_text('edited in place\n')
+        delta = cache.wait_for_delta(snapshot.version, 5)
+
+    assert delta['added']['unstaged'] == [str(test_dir / 'tracked.txt')]
+    assert len(calls) == 2
+    poller.join(5)
+    assert not poller.is_alive()
+    assert cache.thread is None
+
+
+def test_busy_refresh_times_out(cached_repository, monkeypatch):
+    test_dir, cache = cached_repository
+    monkeypatch.setattr(cache.repo.locks, 'timeout', 0.1)
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold_mutex():
+        with cache.mutex:
+            holding.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_mutex)
+    holder.start()
+    holding.wait(5)
+    try:
+        started = time.monotonic()
+        snapshot = cache.refresh()
+        with cache.updating():
+            (test_dir / 'updated.txt').write_text('updated\n')
+        elapsed = time.monotonic() - started
+    finally:
+        release.set()
+        holder.join(5)
+
+    assert snapshot == status_cache.EMPTY_SNAPSHOT
+    assert elapsed < 2
+
+
+def test_get_page():
+    files = tuple(f"file_{number}" for number in range(25))
+    page = status_cache.get_page(files, 3, 10)
+
+    assert page.items == files[20:]
+    assert (page.page, page.pages, page.total) == (3, 3, 25)
+    assert status_cache.get_page((), 1, 10).pages == 1
@@ -0,0 +1,72 @@
+import json
+import os
+from pathlib import Path
+import pytest
+import subprocess
+import sys
+
+from src import tracing
+
+
+SRC_DIR = Path(__file__).resolve().parents[1] / 'src'
+
+
+def run_wit(directory, *args, **environment):
+    return subprocess.run(
+        [sys.executable, str(SRC_DIR / 'wit.py'), *args],
+        cwd=directory,
+        env={**os.environ, 'WIT_NO_DAEMON': '1', **environment},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+@pytest.fixture
+def traced_repository(clean_test_dir):
+    test_dir = clean_test_dir
+    (test_dir / 'folder').mkdir()
+    run_wit(test_dir, 'init')
+    (test_dir / 'first.txt').write_text('first\n')
+    (test_dir / 'folder' / 'second.txt').write_text('second file\n')
+    return test_dir
+
+
+def test_span_and_count():
+    assert not tracing.is_enabled()
+    tracing.count(tracing.FILES_COPIED)
+    tracing.start('test')
+    with tracing.span(tracing.WALK):
+        with tracing.span(tracing.COMPARE):
+            tracing.count(tracing.FILES_HASHED, 2)
+    trace_data = tracing.stop().to_dict()
+
+    assert not tracing.is_enabled()
+    assert [(span['name'], span['depth']) for span in trace_data['spans']] == [
+        (tracing.WALK, 0),
+        (tracing.COMPARE, 1),
+    ]
+    assert trace_data['counters'] == {tracing.FILES_HASHED: 2}
+
+
+def test_get_destination(monkeypatch):
+    monkeypatch.delenv(tracing.TRACE_VARIABLE, raising=False)
+    assert tracing.get_destination(['status']) == (None, ['status'])
+    assert tracing.get_destination(['status', '--profile']) == ('1', ['status'])
+    monkeypatch.setenv(tracing.TRACE_VARIABLE, 'trace.json')
+    assert tracing.get_destination(['status', '--profile']) == ('trace.json', ['status'])
+
+
+def test_traced_commands(traced_repository):
+    trace_path = traced_repository.parent / 'test_tracing.json'
+    run_wit(traced_repository, 'add', '.', WIT_TRACE=str(trace_path))
+    add_trace = json.loads(trace_path.read_text())
+    run_wit(traced_repository, 'commit', 'first')
+    status_trace = json.loads(run_wit(traced_repository, 'status', '--profile').stderr)
+
+    assert add_trace['command'] == 'add .'
+    assert {tracing.DISCOVERY, tracing.COPY, 'add'} <= add_trace['totals_ms'].keys()
+    assert add_trace['counters'][tracing.FILES_COPIED] == 2
+    assert add_trace['counters'][tracing.BYTES_MOVED] == len('first\n') + len('second file\n')
+    assert {tracing.WALK, tracing.COMPARE} <= status_trace['totals_ms'].keys()
+    assert status_trace['counters'] == {tracing.FILES_SKIPPED: 2}
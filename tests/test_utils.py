@@ -22,6 +22,7 @@ class TestUtils:
             wit = os.path.join(cwd, '.wit'),
             wit_dir = cwd,
             images = os.path.join(cwd, '.wit', 'images'),
+            objects = os.path.join(cwd, '.wit', 'objects'),
             staging = os.path.join(cwd, '.wit', 'staging_area'),
             active = os.path.join(cwd, '.wit', 'activated.txt'),
             references = os.path.join(cwd, '.wit', 'references.txt'),